@@ -17,6 +17,7 @@ sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
 from utils.settings import *
 from utils.utils import colors, get_events, encode_with_signature
+from utils.timestamps import get_block_timestamp, get_block_timestamps
 
 CPUs = 20 #multiprocessing.cpu_count()
 
@@ -69,6 +70,8 @@ def analyze_block(block_range):
             events_per_block[i] = list()
         for event in events:
             events_per_block[event["blockNumber"]].append(event)
+        # Fetch the timestamps of all blocks with messages at once
+        get_block_timestamps(w3, "ethereum", [block_number for block_number in events_per_block if len(events_per_block[block_number]) > 0])
     except Exception as e:
         print(colors.FAIL+str(traceback.format_exc())+colors.END)
         print(colors.FAIL+"Error: "+str(e)+" @ block range: "+str(block_range[0])+"-"+str(block_range[1])+colors.END)
@@ -128,7 +131,7 @@ def analyze_block(block_range):
                     l1_message["block_number"] = event["blockNumber"]
                     l1_message["block_hash"] = event["blockHash"]
                     l1_message["contract_address"] = event["address"]
-                    l1_message["timestamp"] = w3.eth.get_block(l1_message["block_number"])["timestamp"]
+                    l1_message["timestamp"] = get_block_timestamp(w3, "ethereum", l1_message["block_number"])
 
                     deposit_transaction = dict()
                     deposit_transaction["l1_tx_origin"] = l1_tx_origin
@@ -216,7 +219,7 @@ def analyze_block(block_range):
                         l1_message["block_number"] = event["blockNumber"]
                         l1_message["block_hash"] = event["blockHash"]
                         l1_message["contract_address"] = event["address"]
-                        l1_message["timestamp"] = w3.eth.get_block(l1_message["block_number"])["timestamp"]
+                        l1_message["timestamp"] = get_block_timestamp(w3, "ethereum", l1_message["block_number"])
 
                         deposit_transaction = dict()
                         deposit_transaction["from_address"] = from_address
@@ -283,7 +286,7 @@ def analyze_block(block_range):
                     l1_message["block_number"]     = event["blockNumber"]
                     l1_message["block_hash"]       = event["blockHash"]
                     l1_message["contract_address"] = event["address"]
-                    l1_message["timestamp"]        = w3.eth.get_block(l1_message["block_number"])["timestamp"]
+                    l1_message["timestamp"]        = get_block_timestamp(w3, "ethereum", l1_message["block_number"])
 
                     message_num = int(event["topics"][1].replace("0x", ""), 16)
                     data        = event["data"].replace("0x", "")
@@ -442,7 +445,7 @@ def analyze_block(block_range):
                     l1_message["block_number"]     = event["blockNumber"]
                     l1_message["block_hash"]       = event["blockHash"]
                     l1_message["contract_address"] = event["address"]
-                    l1_message["timestamp"]        = w3.eth.get_block(l1_message["block_number"])["timestamp"]
+                    l1_message["timestamp"]        = get_block_timestamp(w3, "ethereum", l1_message["block_number"])
 
                     data                 = event["data"].replace("0x", "")
                     tx_id                = int(data[0:64], 16)
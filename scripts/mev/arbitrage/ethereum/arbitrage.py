@@ -17,7 +17,8 @@ from web3 import Web3
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../..'))
 
-from utils.utils import colors, toSigned256, get_events, get_prices, get_price_from_timestamp
+from utils.utils import colors, toSigned256, get_events, get_prices, get_price_from_timestamp, get_flashbots_transactions
+from utils.classifier import CURVE_COINS_ABIS, call_contract, classify_contract
 from utils.settings import *
 
 CPUs = multiprocessing.cpu_count()
@@ -63,6 +64,7 @@ def analyze_block(block_range):
             events_per_block[i] = list()
         for event in events:
             events_per_block[event["blockNumber"]].append(event)
+        flashbots_transactions_per_block = get_flashbots_transactions(mongo_connection, block_range[0], block_range[1])
     except Exception as e:
         print(colors.FAIL+str(traceback.format_exc())+colors.END)
         print(colors.FAIL+"Error: "+str(e)+" @ block range: "+str(block_range[0])+"-"+str(block_range[1])+colors.END)
@@ -318,27 +320,14 @@ def analyze_block(block_range):
                     _tokens_bought = int(event["data"].replace("0x", "")[3*64:3*64+64], 16)
                     if not event["address"]+":"+str(_sold_id) in cache or not event["address"]+":"+str(_bought_id) in cache:
                         in_token, out_token = None, None
+                        curve_coins = classify_contract(w3, mongo_connection, "ethereum", "curve_coins", CURVE_COINS_ABIS, event["address"], cache, args=[_sold_id])
+                        if curve_coins == None:
+                            continue
                         try:
-                            curve_contract = w3.eth.contract(address=event["address"], abi=[{"name":"coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"int128","name":"arg0"}],"type":"function"}])
-                            in_token = curve_contract.functions.coins(_sold_id).call()
-                            out_token = curve_contract.functions.coins(_bought_id).call()
+                            in_token = call_contract(w3, event["address"], CURVE_COINS_ABIS[curve_coins], [_sold_id])
+                            out_token = call_contract(w3, event["address"], CURVE_COINS_ABIS[curve_coins], [_bought_id])
                         except:
-                            try:
-                                curve_contract = w3.eth.contract(address=event["address"], abi=[{"name":"coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"uint256","name":"arg0"}],"type":"function"}])
-                                in_token = curve_contract.functions.coins(_sold_id).call()
-                                out_token = curve_contract.functions.coins(_bought_id).call()
-                            except:
-                                try:
-                                    curve_contract = w3.eth.contract(address=event["address"], abi=[{"name":"underlying_coins","outputs":[{"type":"address","name":"out"}],"inputs":[{"type":"int128","name":"arg0"}],"type":"function"}])
-                                    in_token = curve_contract.functions.underlying_coins(_sold_id).call()
-                                    out_token = curve_contract.functions.underlying_coins(_bought_id).call()
-                                except:
-                                    try:
-                                        curve_contract = w3.eth.contract(address=event["address"], abi=[{"name":"underlying_coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"uint256","name":"arg0"}],"type":"function"}])
-                                        in_token = curve_contract.functions.underlying_coins(_sold_id).call()
-                                        out_token = curve_contract.functions.underlying_coins(_bought_id).call()
-                                    except:
-                                        continue
+                            continue
                         cache[event["address"]+":"+str(_sold_id)] = in_token
                         cache[event["address"]+":"+str(_bought_id)] = out_token
                     in_token = cache[event["address"]+":"+str(_sold_id)]
@@ -392,7 +381,7 @@ def analyze_block(block_range):
         one_eth_to_usd_price = decimal.Decimal(float(get_price_from_timestamp(block["timestamp"], prices["eth_to_usd"])))
 
         retrieved_flash_loans = False
-        flashbots_transactions = None
+        flashbots_transactions = flashbots_transactions_per_block[block_number]
         try:
             # Search for arbitrage
             for tx_index in swaps:
@@ -546,13 +535,6 @@ def analyze_block(block_range):
                                 intermediary_swaps = list()
                         if valid:
                             print()
-                            if flashbots_transactions == None:
-                                flashbots_block = mongo_connection["flashbots"]["blocks"].find_one({"block_number": block_number})
-                                flashbots_transactions = dict()
-                                if flashbots_block:
-                                    for flashbots_tx in flashbots_block["transactions"]:
-                                        flashbots_transactions[flashbots_tx["transaction_hash"]] = decimal.Decimal(flashbots_tx["coinbase_transfer"]) / 10**18
-
                             if not retrieved_flash_loans:
                                 events = list()
                                 events += get_events(w3, client_version, {"fromBlock": block_number, "toBlock": block_number, "topics": [AAVE_V1_FLASH_LOAN]},  ETHEREUM_PROVIDER, "ethereum")
@@ -854,7 +836,7 @@ def analyze_block(block_range):
                             flashbots_coinbase_transfer = 0.0
                             if tx["hash"].hex() in flashbots_transactions:
                                 flashbots_bundle = True
-                                flashbots_coinbase_transfer = flashbots_transactions[tx["hash"].hex()]
+                                flashbots_coinbase_transfer = flashbots_transactions[tx["hash"].hex()]["coinbase_transfer"]
                                 print(colors.FAIL+"!!! Flashbots Bundle Detected (Coinbase Transfer: "+str(float(flashbots_coinbase_transfer))+" ETH) !!!"+colors.END)
                                 if flashbots_coinbase_transfer >= 0:
                                     total_cost_eth += flashbots_coinbase_transfer
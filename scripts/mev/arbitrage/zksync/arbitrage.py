@@ -19,6 +19,7 @@ from web3.middleware import geth_poa_middleware
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../..'))
 
 from utils.utils import colors, toSigned256, get_events, get_prices, get_price_from_timestamp
+from utils.classifier import CURVE_COINS_ABIS, call_contract, classify_contract
 from utils.settings import *
 
 CPUs = min(10, multiprocessing.cpu_count())
@@ -314,27 +315,14 @@ def analyze_block(block_range):
                     _tokens_bought = int(event["data"].replace("0x", "")[3*64:3*64+64], 16)
                     if not event["address"]+":"+str(_sold_id) in cache or not event["address"]+":"+str(_bought_id) in cache:
                         in_token, out_token = None, None
+                        curve_coins = classify_contract(w3, mongo_connection, "zksync", "curve_coins", CURVE_COINS_ABIS, event["address"], cache, args=[_sold_id])
+                        if curve_coins == None:
+                            continue
                         try:
-                            curve_contract = w3.eth.contract(address=event["address"], abi=[{"name":"coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"int128","name":"arg0"}],"type":"function"}])
-                            in_token = curve_contract.functions.coins(_sold_id).call()
-                            out_token = curve_contract.functions.coins(_bought_id).call()
+                            in_token = call_contract(w3, event["address"], CURVE_COINS_ABIS[curve_coins], [_sold_id])
+                            out_token = call_contract(w3, event["address"], CURVE_COINS_ABIS[curve_coins], [_bought_id])
                         except:
-                            try:
-                                curve_contract = w3.eth.contract(address=event["address"], abi=[{"name":"coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"uint256","name":"arg0"}],"type":"function"}])
-                                in_token = curve_contract.functions.coins(_sold_id).call()
-                                out_token = curve_contract.functions.coins(_bought_id).call()
-                            except:
-                                try:
-                                    curve_contract = w3.eth.contract(address=event["address"], abi=[{"name":"underlying_coins","outputs":[{"type":"address","name":"out"}],"inputs":[{"type":"int128","name":"arg0"}],"type":"function"}])
-                                    in_token = curve_contract.functions.underlying_coins(_sold_id).call()
-                                    out_token = curve_contract.functions.underlying_coins(_bought_id).call()
-                                except:
-                                    try:
-                                        curve_contract = w3.eth.contract(address=event["address"], abi=[{"name":"underlying_coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"uint256","name":"arg0"}],"type":"function"}])
-                                        in_token = curve_contract.functions.underlying_coins(_sold_id).call()
-                                        out_token = curve_contract.functions.underlying_coins(_bought_id).call()
-                                    except:
-                                        continue
+                            continue
                         cache[event["address"]+":"+str(_sold_id)] = in_token
                         cache[event["address"]+":"+str(_bought_id)] = out_token
                     in_token = cache[event["address"]+":"+str(_sold_id)]
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import time
+import json
+import numpy
+import collections
+import decimal
+import bisect
+import hashlib
+import pymongo
+import requests
+import cfscrape
+import traceback
+import multiprocessing
+
+from web3 import Web3
+from web3.middleware import geth_poa_middleware
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+
+from utils.settings import *
+from utils.utils import colors, get_events, get_coin_list, get_prices, get_price_from_timestamp, get_flashbots_transactions
+from utils.classifier import EXCHANGE_ABIS, classify_contract
+from utils.chains import CHAINS
+from utils.follow import follow_blocks
+
+CPUs = multiprocessing.cpu_count()
+
+# Ethereum blocks are analyzed one at a time
+BLOCK_RANGES = {"ethereum": 1, "arbitrum": 100, "optimism": 100, "zksync": 100}
+
+# L2 blocks only hold a handful of transactions, so front-run, victim and back-run are matched across a sliding window of blocks
+WINDOW_SIZES = {"ethereum": 1, "arbitrum": 10, "optimism": 10, "zksync": 10}
+
+DEBUG_MODE = False
+
+TRANSFER = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef" # ERC20 "Transfer"
+
+def analyze_block(block_range):
+    start = time.time()
+    print("Analyzing block range: "+colors.INFO+str(block_range[0])+"-"+str(block_range[1])+colors.END)
+
+    # Get all the events at once (including the blocks preceding the range that fall into its first window) and order them by block
+    events_per_block = dict()
+    analyzed_blocks = set()
+    flashbots_transactions_per_block = dict()
+    try:
+        window_start = max(block_range[0]-WINDOW_SIZE+1, 0)
+        events = list()
+        events += get_events(w3, client_version, {"fromBlock": window_start, "toBlock": block_range[1], "topics": [TRANSFER]},  provider, chain["network"], session)
+        for i in range(window_start, block_range[1]+1):
+            events_per_block[i] = list()
+        for event in events:
+            events_per_block[event["blockNumber"]].append(event)
+        for status in mongo_connection[chain["database"]]["mev_sandwich_status"].find({"block_number": {"$gte": block_range[0], "$lte": block_range[1]}}, {"_id": 0, "block_number": 1}):
+            analyzed_blocks.add(status["block_number"])
+        if chain["flashbots"]:
+            flashbots_transactions_per_block = get_flashbots_transactions(mongo_connection, block_range[0], block_range[1])
+    except Exception as e:
+        print(colors.FAIL+str(traceback.format_exc())+colors.END)
+        print(colors.FAIL+"Error: "+str(e)+" @ block range: "+str(block_range[0])+"-"+str(block_range[1])+colors.END)
+        end = time.time()
+        return end - start, False
+
+    # Rolling transfer indexes over the last WINDOW_SIZE blocks, positions are (block number, transaction index) tuples
+    victim_transactions = set()
+    attackers = set()
+
+    transfer_to = dict()
+    transfer_from = dict()
+    asset_transfers = dict()
+    asset_transfer_indexes = dict()
+    transfers_per_transaction = dict()
+    transfers_per_block = dict()
+
+    for block_number in events_per_block:
+        block_start = time.time()
+        # Blocks preceding the range and blocks that were already analyzed are only indexed
+        analyze = block_number >= block_range[0]
+        if analyze and block_number in analyzed_blocks and not DEBUG_MODE:
+            print("Block "+colors.INFO+str(block_number)+colors.END+" already analyzed!")
+            analyze = False
+
+        # Slide the window by dropping the transfers of the block that fell out of it
+        evicted_position = (block_number-WINDOW_SIZE+1,)
+        for _, _from, _to, _, event in transfers_per_block.pop(block_number-WINDOW_SIZE, []):
+            _token = event["address"]
+            if (_token, _to) in transfer_to:
+                while transfer_to[(_token, _to)] and transfer_to[(_token, _to)][0][0] < evicted_position:
+                    transfer_to[(_token, _to)].popleft()
+                if not transfer_to[(_token, _to)]:
+                    del transfer_to[(_token, _to)]
+            transfer_from.pop((_from, _to, (event["blockNumber"], event["transactionIndex"])), None)
+            if _token in asset_transfers:
+                evicted = bisect.bisect_left(asset_transfer_indexes[_token], evicted_position)
+                del asset_transfers[_token][:evicted]
+                del asset_transfer_indexes[_token][:evicted]
+                if not asset_transfers[_token]:
+                    del asset_transfers[_token]
+                    del asset_transfer_indexes[_token]
+            transfers_per_transaction.pop(event["transactionHash"], None)
+
+        potential_sandwiches = list()
+        sandwiches = list()
+
+        events = events_per_block[block_number]
+        transfers_per_block[block_number] = list()
+        try:
+            for event in events:
+                if event["data"].replace("0x", "") and len(event["topics"]) == 3:
+                    _from  = Web3.toChecksumAddress("0x"+event["topics"][1].replace("0x", "")[24:64])
+                    _to    = Web3.toChecksumAddress("0x"+event["topics"][2].replace("0x", "")[24:64])
+                    _value = int(event["data"].replace("0x", "")[0:64], 16)
+                    _token = event["address"]
+                    _index = (event["blockNumber"], event["transactionIndex"])
+                    transfer = (_index, _from, _to, _value, event)
+                    transfers_per_block[block_number].append(transfer)
+                    if not event["transactionHash"] in transfers_per_transaction:
+                        transfers_per_transaction[event["transactionHash"]] = list()
+                    transfers_per_transaction[event["transactionHash"]].append((_token, _from, _to, _value))
+
+                    if _value > 0 and _from != _to:
+                        transfer_a1 = None
+                        if analyze and _token.lower() != chain["weth"].lower() and (_token, _from) in transfer_to:
+                            transfer_a1 = transfer_to[(_token, _from)][0]
+
+                        if transfer_a1 != None:
+                            _index_a1, _from_a1, _to_a1, _value_a1, event_a1 = transfer_a1
+                            _index_a2, _from_a2, _to_a2, _value_a2, event_a2 = transfer
+
+                            if _from_a1 == _to_a2 and _from_a2 == _to_a1 and _index_a1 < _index_a2 and _value_a1 >= _value_a2:
+                                # Search for victim (latest transfer of the token strictly between both attacker transactions)
+                                transfer_w = None
+                                indexes = asset_transfer_indexes[_token]
+                                lower = bisect.bisect_right(indexes, _index_a1)
+                                upper = bisect.bisect_left(indexes, _index_a2)
+                                for i in range(upper-1, lower-1, -1):
+                                    _, _from_w, _to_w, _value_w, asset_transfer = asset_transfers[_token][i]
+                                    if asset_transfer["transactionHash"] not in attackers and _value_w > 0 and ((_from_a1 == _from_w) or (_to_a1 == _to_w)):
+                                        transfer_w = asset_transfers[_token][i]
+                                        break
+
+                                if transfer_w != None:
+                                    _, _from_w, _to_w, _value_w, event_w = transfer_w
+                                    victim_transactions.add(event_w["transactionHash"])
+
+                                    if event_a1["transactionHash"] not in victim_transactions and event_a2["transactionHash"] not in victim_transactions:
+                                        tx1       = w3.eth.getTransaction(event_a1["transactionHash"])
+                                        victim_tx = w3.eth.getTransaction(event_w["transactionHash"])
+                                        tx2       = w3.eth.getTransaction(event_a2["transactionHash"])
+
+                                        if  tx1["from"] != victim_tx["from"] and tx2["from"] != victim_tx["from"] and \
+                                            (tx1["blockNumber"], tx1["transactionIndex"]) < (victim_tx["blockNumber"], victim_tx["transactionIndex"]) and (victim_tx["blockNumber"], victim_tx["transactionIndex"]) < (tx2["blockNumber"], tx2["transactionIndex"]):
+
+                                            if tx1["to"] == victim_tx["to"] == tx2["to"] and tx1["from"] != tx2["from"]:
+                                                continue
+
+                                            if tx1["to"] == victim_tx["to"] and victim_tx["to"] != tx2["to"]:
+                                                continue
+
+                                            # Get exchange address and name
+                                            exchange_address = None
+                                            exchange_name = None
+                                            if _from_a1 == _from_w:
+                                                exchange_address = _from_w
+                                            if _to_a1 == _to_w:
+                                                exchange_address = _to_w
+
+                                            # Uniswap V2 or Uniswap V3 (classified by runtime bytecode hash)
+                                            if not exchange_address+":exchange_name" in cache:
+                                                exchange_name = classify_contract(w3, mongo_connection, chain["database"], "exchange_name", EXCHANGE_ABIS, exchange_address, cache, block_identifier=block_number)
+                                                if exchange_name != None:
+                                                    cache[exchange_address+":exchange_name"] = exchange_name
+
+                                            if exchange_address+":exchange_name" in cache:
+                                                exchange_name = cache[exchange_address+":exchange_name"]
+                                            else:
+                                                continue
+
+                                            attackers.add(tx1["hash"].hex())
+                                            attackers.add(tx2["hash"].hex())
+
+                                            sandwiches.append(
+                                            (
+                                                (
+                                                    (_from_a1, _to_a1, _value_a1, event_a1),
+                                                    (_from_a2, _to_a2, _value_a2, event_a2)
+                                                ),
+                                                (tx1, tx2, (victim_tx, exchange_address, exchange_name))
+                                            ))
+
+                        # The first transfer to an account within the window is at the front of its queue
+                        if (_token, _to) not in transfer_to:
+                            transfer_to[(_token, _to)] = collections.deque()
+                        transfer_to[(_token, _to)].append(transfer)
+                        if (_from, _to, _index) not in transfer_from:
+                            transfer_from[(_from, _to, _index)] = (_token, event["logIndex"])
+                        # Events are ordered by block and transaction index, hence the per token lists stay sorted for bisect
+                        if _token not in asset_transfers:
+                            asset_transfers[_token] = list()
+                            asset_transfer_indexes[_token] = list()
+                        asset_transfers[_token].append(transfer)
+                        asset_transfer_indexes[_token].append(_index)
+
+            # Filter and compress sandwiches
+            unique_sandwiches = dict()
+            for sandwich in sandwiches:
+                # Filter out sandwiches which do not perform swaps
+                _from_a1, _to_a1, _value_a1, event_a1 = sandwich[0][0]
+                _from_a2, _to_a2, _value_a2, event_a2 = sandwich[0][1]
+
+                # Check if attacker transactions are part of swaps
+                swap_a1_in  = transfer_from.get((_from_a1, _to_a1, (event_a1["blockNumber"], event_a1["transactionIndex"])))
+                swap_a1_out = transfer_from.get((_to_a1, _from_a1, (event_a1["blockNumber"], event_a1["transactionIndex"])))
+                swap_a2_in  = transfer_from.get((_from_a2, _to_a2, (event_a2["blockNumber"], event_a2["transactionIndex"])))
+                swap_a2_out = transfer_from.get((_to_a2, _from_a2, (event_a2["blockNumber"], event_a2["transactionIndex"])))
+                if swap_a1_in == None or swap_a1_out == None:
+                    continue
+                if swap_a1_in[0] == swap_a1_out[0]:
+                    continue
+                if swap_a2_in == None or swap_a2_out == None:
+                    continue
+                if swap_a2_in[0] == swap_a2_out[0]:
+                    continue
+                if swap_a1_in[0] != swap_a2_in[0]:
+                    continue
+                if swap_a1_out[0] != swap_a2_out[0]:
+                    continue
+
+                if not sandwich[1][0]["hash"].hex()+":"+sandwich[1][1]["hash"].hex() in unique_sandwiches:
+                    unique_sandwiches[sandwich[1][0]["hash"].hex()+":"+sandwich[1][1]["hash"].hex()] = {
+                        "attacker_tx_1": sandwich[1][0],
+                        "victims": list(),
+                        "attacker_tx_2": sandwich[1][1],
+                    }
+                if not sandwich[1][2][0]["hash"].hex() in [victim[0]["hash"].hex() for victim in unique_sandwiches[sandwich[1][0]["hash"].hex()+":"+sandwich[1][1]["hash"].hex()]["victims"]]:
+                    unique_sandwiches[sandwich[1][0]["hash"].hex()+":"+sandwich[1][1]["hash"].hex()]["victims"].append(sandwich[1][2])
+
+            # Save sandwiches (attributed to the block of the back-run)
+            if len(unique_sandwiches) > 0:
+                block = w3.eth.getBlock(block_number)
+                one_eth_to_usd_price = decimal.Decimal(float(get_price_from_timestamp(block["timestamp"], prices["eth_to_usd"])))
+            for sandwich in list(unique_sandwiches.values()):
+                tx1 = sandwich["attacker_tx_1"]
+                tx2 = sandwich["attacker_tx_2"]
+                victims = sandwich["victims"]
+
+                receipt1 = w3.eth.getTransactionReceipt(tx1["hash"])
+                cost1 = receipt1["gasUsed"] * tx1["gasPrice"]
+                receipt2 = w3.eth.getTransactionReceipt(tx2["hash"])
+                cost2 = receipt2["gasUsed"] * tx2["gasPrice"]
+                tx_cost = Web3.fromWei(cost1 + cost2, "ether")
+                total_cost_eth = tx_cost
+                total_cost_usd = tx_cost * one_eth_to_usd_price
+
+                # Check if finding is part of a flashbots bundle
+                flashbots_bundle = False
+                flashbots_coinbase_transfer = decimal.Decimal(0.0)
+                if chain["flashbots"]:
+                    flashbots_transactions = flashbots_transactions_per_block[block_number]
+                    victim_hashes = set([victim[0]["hash"].hex() for victim in victims])
+                    if tx1["hash"].hex() in flashbots_transactions and tx2["hash"].hex() in flashbots_transactions and all([victim_hash in flashbots_transactions for victim_hash in victim_hashes]):
+                        flashbots_bundle = True
+                        for tx in flashbots_transactions:
+                            if tx == tx1["hash"].hex() or tx == tx2["hash"].hex() or tx in victim_hashes:
+                                if flashbots_transactions[tx]["coinbase_transfer"] >= 0:
+                                    flashbots_coinbase_transfer += flashbots_transactions[tx]["coinbase_transfer"]
+                                else:
+                                    print(colors.FAIL+"Error: Flashbots coinbase transfer is negative!")
+                        total_cost_eth += flashbots_coinbase_transfer
+                        total_cost_usd += flashbots_coinbase_transfer * one_eth_to_usd_price
+                        print(colors.FAIL+"!!! Flashbots Bundle Detected (Coinbase Transfer: "+str(float(flashbots_coinbase_transfer))+" ETH) !!!"+colors.END)
+
+                total_gain_eth = decimal.Decimal(0.0)
+                total_gain_usd = decimal.Decimal(0.0)
+                token_balance = dict()
+                for tx_hash in [tx1["hash"].hex(), tx2["hash"].hex()]:
+                    for _token, _from_transfer, _to_transfer, _value_transfer in transfers_per_transaction.get(tx_hash, []):
+                        if not _token in token_balance:
+                            token_balance[_token] = dict()
+                        if not _from_transfer in token_balance[_token]:
+                            token_balance[_token][_from_transfer] = 0
+                        if not _to_transfer in token_balance[_token]:
+                            token_balance[_token][_to_transfer] = 0
+                        token_balance[_token][_from_transfer] -= _value_transfer
+                        token_balance[_token][_to_transfer] += _value_transfer
+                victim_accounts = set([victim[1] for victim in victims])
+                for token_address in token_balance:
+                    if token_address == chain["weth"]:
+                        for account in token_balance[token_address]:
+                            if not account in victim_accounts:
+                                amount = token_balance[token_address][account]
+                                total_gain_eth += decimal.Decimal(amount) / 10**18
+                                total_gain_usd += decimal.Decimal(amount) / 10**18 * one_eth_to_usd_price
+                    elif token_address in prices:
+                        for account in token_balance[token_address]:
+                            if not account in victim_accounts:
+                                amount = token_balance[token_address][account]
+                                if token_address in prices and len(prices[token_address]) > 0:
+                                    token_prices = prices[token_address]
+                                    one_token_to_eth_price = decimal.Decimal(float(get_price_from_timestamp(block["timestamp"], token_prices)))
+                                    if not token_address+":decimals" in cache:
+                                        token_contract = w3.eth.contract(address=token_address, abi=[{"inputs":[],"name":"decimals","outputs":[{"internalType":"uint8","name":"","type":"uint8"}],"type":"function"}])
+                                        try:
+                                            cache[token_address+":decimals"] = token_contract.functions.decimals().call(block_identifier=block_number)
+                                        except:
+                                            cache[token_address+":decimals"] = None
+                                            continue
+                                    decimals = cache[token_address+":decimals"]
+                                    total_gain_eth += decimal.Decimal(amount) / 10**decimals * one_token_to_eth_price
+                                    total_gain_usd += decimal.Decimal(amount) / 10**decimals * one_token_to_eth_price  * one_eth_to_usd_price
+
+                print("      Index Block Number Transaction Hash \t\t\t\t\t\t     From \t\t\t\t\t To \t\t\t\t\t     Gas Price \t\t Exchange")
+                print("T_A1: "+str(tx1["transactionIndex"]).ljust(5)+" "+str(tx1["blockNumber"]).ljust(12)+" "+tx1["hash"].hex().ljust(34)+"  "+tx1["from"].ljust(22)+"  "+str(tx1["to"]).ljust(22)+"  "+str(tx1["gasPrice"]))
+                for victim in victims:
+                    print(colors.INFO+"T_V:  "+str(victim[0]["transactionIndex"]).ljust(5)+" "+str(victim[0]["blockNumber"]).ljust(12)+" "+victim[0]["hash"].hex().ljust(34)+"  "+victim[0]["from"].ljust(22)+"  "+str(victim[0]["to"]).ljust(22)+"  "+str(victim[0]["gasPrice"])+" \t "+victim[2]+colors.END)
+                print("T_A2: "+str(tx2["transactionIndex"]).ljust(5)+" "+str(tx2["blockNumber"]).ljust(12)+" "+tx2["hash"].hex().ljust(34)+"  "+tx2["from"].ljust(22)+"  "+str(tx2["to"]).ljust(22)+"  "+str(tx2["gasPrice"]))
+
+                # Compute total profit
+                if total_gain_eth != None and total_cost_eth != None:
+                    total_profit_eth = total_gain_eth - total_cost_eth
+                    total_profit_usd = total_profit_eth * one_eth_to_usd_price
+                else:
+                    total_profit_eth = None
+                    total_profit_usd = None
+
+                print("Transaction cost: "+str(float(tx_cost))+" ETH ("+str(float(tx_cost * one_eth_to_usd_price))+" USD)")
+
+                if total_cost_eth != None:
+                    print("Total cost: "+str(float(total_cost_eth))+" ETH ("+str(float(total_cost_usd))+" USD)")
+                else:
+                    print("Total cost: "+str(None)+" ETH ("+str(None)+" USD)")
+
+                if total_gain_eth != None:
+                    print("Total gain: "+str(float(total_gain_eth))+" ETH ("+str(float(total_gain_usd))+" USD)")
+                else:
+                    print("Total gain: "+str(None)+" ETH ("+str(None)+" USD)")
+
+                if total_profit_eth != None:
+                    if total_profit_eth >= 0:
+                        print(colors.OK+"Total profit: "+str(float(total_profit_eth))+" ETH ("+str(float(total_profit_usd))+" USD)"+colors.END)
+                    else:
+                        print(colors.FAIL+"Total profit: "+str(float(total_profit_eth))+" ETH ("+str(float(total_profit_usd))+" USD)"+colors.END)
+                else:
+                    print("Total profit: "+str(None)+" ETH ("+str(None)+" USD)")
+
+                # Save finding to results
+                tx1 = dict(tx1)
+                del tx1["blockHash"]
+                del tx1["r"]
+                del tx1["s"]
+                del tx1["v"]
+                tx1["value"] = str(tx1["value"])
+                tx1["hash"] = tx1["hash"].hex()
+
+                victim_txs = list()
+                for victim in victims:
+                    victim_tx = dict(victim[0])
+                    del victim_tx["blockHash"]
+                    del victim_tx["r"]
+                    del victim_tx["s"]
+                    del victim_tx["v"]
+                    victim_tx["value"] = str(victim_tx["value"])
+                    victim_tx["hash"] = victim_tx["hash"].hex()
+                    victim_tx["exchange_address"] = victim[1]
+                    victim_tx["exchange_name"] = victim[2]
+                    victim_txs.append(victim_tx)
+
+                tx2 = dict(tx2)
+                del tx2["blockHash"]
+                del tx2["r"]
+                del tx2["s"]
+                del tx2["v"]
+                tx2["value"] = str(tx2["value"])
+                tx2["hash"] = tx2["hash"].hex()
+
+                h = hashlib.sha256()
+                if tx1["blockNumber"] == victim_tx["blockNumber"] == tx2["blockNumber"]:
+                    h.update(str(str(block["number"])+":"+str(tx1["transactionIndex"])+":"+str(victim_tx["transactionIndex"])+":"+str(tx2["transactionIndex"])).encode('utf-8'))
+                else:
+                    h.update(str(str(tx1["blockNumber"])+":"+str(tx1["transactionIndex"])+":"+str(victim_tx["blockNumber"])+":"+str(victim_tx["transactionIndex"])+":"+str(tx2["blockNumber"])+":"+str(tx2["transactionIndex"])).encode('utf-8'))
+
+                finding = {
+                    "id": h.hexdigest(),
+                    "block_number": block_number,
+                    "block_timestamp": block["timestamp"],
+                    "miner": block["miner"],
+                    "attacker_transaction_1": tx1,
+                    "victim_transactions": victim_txs,
+                    "attacker_transaction_2": tx2,
+                    "eth_usd_price": float(one_eth_to_usd_price),
+                    "total_cost_eth": float(total_cost_eth) if total_cost_eth != None else None,
+                    "total_cost_usd": float(total_cost_usd) if total_cost_usd != None else None,
+                    "total_gain_eth": float(total_gain_eth) if total_gain_eth != None else None,
+                    "total_gain_usd": float(total_gain_usd) if total_gain_usd != None else None,
+                    "total_profit_eth": float(total_profit_eth) if total_profit_eth != None else None,
+                    "total_profit_usd": float(total_profit_usd) if total_profit_usd != None else None,
+                    "transaction_cost_eth": float(tx_cost),
+                    "transaction_cost_usd": float(tx_cost * one_eth_to_usd_price),
+                }
+                if chain["flashbots"]:
+                    finding["flashbots_bundle"] = flashbots_bundle
+                    finding["flashbots_coinbase_transfer"] = float(flashbots_coinbase_transfer)
+
+                collection = mongo_connection[chain["database"]]["mev_sandwich_results"]
+                try:
+                    if DEBUG_MODE:
+                        import pprint
+                        pprint.pprint(finding)
+                    collection.insert_one(finding)
+                except pymongo.errors.DuplicateKeyError:
+                    pass
+                # Indexing...
+                if 'id' not in collection.index_information():
+                    collection.create_index('id', unique=True)
+                    collection.create_index('block_number')
+                    collection.create_index('block_timestamp')
+                    collection.create_index('miner')
+                    collection.create_index('attacker_transaction_1.transaction.hash')
+                    collection.create_index('victim_transactions.transaction.hash')
+                    collection.create_index('victim_transactions.exchange_address')
+                    collection.create_index('victim_transactions.exchange_name')
+                    collection.create_index('attacker_transaction_2.transaction.hash')
+                    collection.create_index('eth_usd_price')
+                    collection.create_index('total_cost_eth')
+                    collection.create_index('total_cost_usd')
+                    collection.create_index('total_gain_eth')
+                    collection.create_index('total_gain_usd')
+                    collection.create_index('total_profit_eth')
+                    collection.create_index('total_profit_usd')
+                    collection.create_index('transaction_cost_eth')
+                    collection.create_index('transaction_cost_usd')
+                    if chain["flashbots"]:
+                        collection.create_index('flashbots_bundle')
+                        collection.create_index('flashbots_coinbase_transfer')
+        except Exception as e:
+            print(colors.FAIL+traceback.format_exc()+colors.END)
+            print(colors.FAIL+"Error: "+str(e)+" @ block number: "+str(block_number)+" "+str(provider.endpoint_uri)+colors.END)
+            end = time.time()
+            return end - start, False
+
+        if not analyze:
+            continue
+
+        end = time.time()
+        collection = mongo_connection[chain["database"]]["mev_sandwich_status"]
+        try:
+            collection.insert_one({"block_number": block_number, "execution_time": end-block_start})
+        except pymongo.errors.DuplicateKeyError:
+            pass
+        # Indexing...
+        if 'block_number' not in collection.index_information():
+            collection.create_index('block_number', unique=True)
+
+    # Blocks without a status row (because of an error) are analyzed again by the next run or retried when following the head
+    end = time.time()
+    return end - start, True
+
+
+def rollback_blocks(from_block, to_block):
+    # Findings are attributed to the block of the back-run, so the findings and status rows of orphaned blocks can be dropped by block number
+    for name in ["mev_sandwich_results", "mev_sandwich_status"]:
+        result = mongo_connection[chain["database"]][name].delete_many({"block_number": {"$gte": from_block, "$lte": to_block}})
+        print("Rolled back "+colors.INFO+str(result.deleted_count)+colors.END+" documents of "+name)
+
+
+def init_process(_network, _prices, _coin_list, _cache, _provider_uri=None):
+    global chain
+    global BLOCK_RANGE
+    global WINDOW_SIZE
+    global provider
+    global w3
+    global client_version
+    global prices
+    global coin_list
+    global mongo_connection
+    global cache
+    global session
+
+    chain = CHAINS[_network]
+    if _provider_uri != None:
+        # Local dev chains get their own database, so that rollbacks never touch the findings of the real chain
+        chain = dict(chain)
+        chain["provider"] = Web3.HTTPProvider(_provider_uri, request_kwargs={'timeout': 60})
+        chain["database"] = _network+"_dev"
+    BLOCK_RANGE = BLOCK_RANGES[_network]
+    WINDOW_SIZE = WINDOW_SIZES[_network]
+    provider = chain["provider"]
+    w3 = Web3(provider)
+    if w3.isConnected():
+        client_version = w3.clientVersion
+        print("Connected worker to "+colors.INFO+client_version+" ("+provider.endpoint_uri+")"+colors.END)
+    else:
+        client_version = ""
+        print(colors.FAIL+"Error: Could not connect to "+chain["name"]+" client. Please check the provider!"+colors.END)
+    if chain["poa"]:
+        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    cache = _cache
+    prices = _prices
+    coin_list = _coin_list
+    mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
+    session = requests.Session()
+
+
+def main(network):
+    global CPUs
+    global DEBUG_MODE
+    global chain
+    global BLOCK_RANGE
+    global WINDOW_SIZE
+
+    chain = CHAINS[network]
+    BLOCK_RANGE = BLOCK_RANGES[network]
+    WINDOW_SIZE = WINDOW_SIZES[network]
+
+    if len(sys.argv) in [2, 3] and sys.argv[1] == "--follow":
+        follow(network, sys.argv[2] if len(sys.argv) == 3 else None)
+        return
+
+    if len(sys.argv) != 2:
+        print(colors.FAIL+"Error: Please provide a block range to be analyzed: 'python3 "+sys.argv[0]+" <BLOCK_RANGE_START>:<BLOCK_RANGE_END>' or follow the head: 'python3 "+sys.argv[0]+" --follow [<PROVIDER_URL>]'"+colors.END)
+        sys.exit(-1)
+    if not ":" in sys.argv[1]:
+        print(colors.FAIL+"Error: Please provide a valid block range: 'python3 "+sys.argv[0]+" <BLOCK_RANGE_START>:<BLOCK_RANGE_END>'"+colors.END)
+        sys.exit(-2)
+    block_range_start, block_range_end = sys.argv[1].split(":")[0], sys.argv[1].split(":")[1]
+    if not block_range_start.isnumeric() or not block_range_end.isnumeric():
+        print(colors.FAIL+"Error: Please provide integers as block range: 'python3 "+sys.argv[0]+" <BLOCK_RANGE_START>:<BLOCK_RANGE_END>'"+colors.END)
+        sys.exit(-3)
+    block_range_start, block_range_end = int(block_range_start), int(block_range_end)
+
+    counter = 0
+    block_range = list()
+    block_ranges = list()
+    mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
+    for block in range(block_range_start, block_range_end+1):
+        counter += 1
+        if counter == 1:
+            block_range.append(block)
+        if counter == BLOCK_RANGE or block == block_range_end:
+            block_range.append(block)
+            count = mongo_connection[chain["database"]]["mev_sandwich_status"].count_documents({"block_number": {"$gte": block_range[0], "$lte" : block_range[1]}})
+            if count != block_range[1] - block_range[0] + 1:
+                block_ranges.append(block_range)
+            block_range = list()
+            counter = 0
+
+    manager = multiprocessing.Manager()
+    cache = manager.dict()
+
+    execution_times = []
+    prices, coin_list = get_prices(network, UPDATE_PRICES)
+    if sys.platform.startswith("linux"):
+        multiprocessing.set_start_method("fork", force=True)
+    if DEBUG_MODE:
+        CPUs = 1
+    print("Running detection of sandwiches with "+colors.INFO+str(CPUs)+colors.END+" CPUs")
+    print("Initializing workers...")
+    with multiprocessing.Pool(processes=CPUs, initializer=init_process, initargs=(network, prices, coin_list, cache, )) as pool:
+        start_total = time.time()
+        results = pool.map(analyze_block, block_ranges)
+        execution_times += [execution_time for execution_time, success in results]
+        end_total = time.time()
+        print("Total execution time: "+colors.INFO+str(end_total - start_total)+colors.END)
+        failed = len([success for execution_time, success in results if not success])
+        if failed > 0:
+            print(colors.FAIL+"Failed block ranges: "+str(failed)+" (run the same block range again to retry them)"+colors.END)
+        print()
+        if execution_times:
+            print("Max execution time: "+colors.INFO+str(numpy.max(execution_times))+colors.END)
+            print("Mean execution time: "+colors.INFO+str(numpy.mean(execution_times))+colors.END)
+            print("Median execution time: "+colors.INFO+str(numpy.median(execution_times))+colors.END)
+            print("Min execution time: "+colors.INFO+str(numpy.min(execution_times))+colors.END)
+
+def follow(network, provider_uri=None):
+    prices, coin_list = get_prices(network, UPDATE_PRICES)
+    # Blocks are analyzed one by one as they arrive, so the head is followed in this process without workers
+    init_process(network, prices, coin_list, dict(), provider_uri)
+    print("Following the head of "+colors.INFO+chain["name"]+colors.END+" (database: "+colors.INFO+chain["database"]+colors.END+")")
+    follow_blocks(w3, analyze_block, rollback_blocks)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or not sys.argv[1].lower() in CHAINS:
+        print(colors.FAIL+"Error: Please provide a network and a block range to be analyzed: 'python3 "+sys.argv[0]+" <ethereum|arbitrum|optimism|zksync> <BLOCK_RANGE_START>:<BLOCK_RANGE_END>|--follow [<PROVIDER_URL>]'"+colors.END)
+        sys.exit(-1)
+    network = sys.argv.pop(1).lower()
+    main(network)
@@ -19,7 +19,42 @@ class colors:
     FAIL = '\033[91m'
     END = '\033[0m'
 
+def flatten_transactions(collection, block):
+    transactions = list()
+    for tx in block["transactions"]:
+        transactions.append({
+            "transaction_hash": tx["transaction_hash"],
+            "block_number": block["block_number"],
+            "transaction_index": tx.get("tx_index"),
+            "bundle_index": tx["bundle_index"],
+            "bundle_type": tx.get("bundle_type"),
+            "coinbase_transfer": tx["coinbase_transfer"]
+        })
+    # Indexing...
+    if 'transaction_hash_1' not in collection.index_information():
+        collection.create_index('transaction_hash', unique=True)
+        collection.create_index('block_number')
+    if transactions:
+        try:
+            collection.insert_many(transactions, ordered=False)
+        except pymongo.errors.BulkWriteError:
+            pass
+
+def backfill_transactions(mongo_connection):
+    # Flatten the transactions of blocks that were downloaded before flashbots.transactions existed, without calling the API
+    collection = mongo_connection["flashbots"]["blocks"]
+    transactions_collection = mongo_connection["flashbots"]["transactions"]
+    pbar = tqdm(unit="blocks", total=collection.estimated_document_count())
+    for block in collection.find({}, {"_id": 0, "block_number": 1, "transactions": 1}, no_cursor_timeout=True):
+        flatten_transactions(transactions_collection, block)
+        pbar.update(1)
+    pbar.close()
+
 def main():
+    if len(sys.argv) == 2 and sys.argv[1] == "--backfill":
+        mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
+        backfill_transactions(mongo_connection)
+        return
     if len(sys.argv) != 2:
         print(colors.FAIL+"Error: Please provide a block range to be analyzed: 'python3 "+sys.argv[0]+" <BLOCK_RANGE_START>:<BLOCK_RANGE_END>'"+colors.END)
         sys.exit(-1)
@@ -34,6 +69,7 @@ def main():
 
     mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
     collection = mongo_connection["flashbots"]["blocks"]
+    transactions_collection = mongo_connection["flashbots"]["transactions"]
 
     before_block = block_range_end
 
@@ -63,6 +99,8 @@ def main():
                             collection.create_index('block_number')
                             collection.create_index('fee_recipient')
                             collection.create_index('miner')
+                    # Flattened transactions keyed by hash (also backfills previously downloaded blocks)
+                    flatten_transactions(transactions_collection, block)
                     num_blocks += 1
                     pbar.update(1)
                 before_block = min(block["block_number"] for block in blocks)
@@ -17,7 +17,7 @@ from web3.middleware import geth_poa_middleware
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../.."))
 
-from utils.utils import colors, get_events, get_prices, get_price_from_timestamp, toSigned256
+from utils.utils import colors, get_events, get_prices, get_price_from_timestamp, toSigned256, get_transaction_receipts
 from utils.settings import *
 
 CPUs = multiprocessing.cpu_count()
@@ -46,6 +46,23 @@ WETH = "0x82aF49447D8a07e3bd95BD0d56f35241523fBab1"
 USDC = "0xFF970A61A04b1cA14834A43f5dE4533eBDDB5CC8"
 NULL = "0x0000000000000000000000000000000000000000"
 
+def get_pricing_events(block_range):
+    # Swap and redeem events are only used to price liquidations, index them by block, topic and transaction
+    pricing_events_per_block = dict()
+    pricing_events = list()
+    pricing_events += get_events(w3, client_version, {"fromBlock": block_range[0], "toBlock": block_range[1], "topics": [UNISWAP_V2]},        ARBITRUM_PROVIDER, "arbitrum")
+    pricing_events += get_events(w3, client_version, {"fromBlock": block_range[0], "toBlock": block_range[1], "topics": [UNISWAP_V3]},        ARBITRUM_PROVIDER, "arbitrum")
+    pricing_events += get_events(w3, client_version, {"fromBlock": block_range[0], "toBlock": block_range[1], "topics": [COMPOUND_REDEEM_1]}, ARBITRUM_PROVIDER, "arbitrum")
+    pricing_events += get_events(w3, client_version, {"fromBlock": block_range[0], "toBlock": block_range[1], "topics": [COMPOUND_REDEEM_2]}, ARBITRUM_PROVIDER, "arbitrum")
+    for i in range(block_range[0], block_range[1]+1):
+        pricing_events_per_block[i] = {UNISWAP_V2: dict(), UNISWAP_V3: dict(), COMPOUND_REDEEM_1: dict(), COMPOUND_REDEEM_2: dict()}
+    for event in pricing_events:
+        events_per_transaction = pricing_events_per_block[event["blockNumber"]][event["topics"][0]]
+        if not event["transactionHash"] in events_per_transaction:
+            events_per_transaction[event["transactionHash"]] = list()
+        events_per_transaction[event["transactionHash"]].append(event)
+    return pricing_events_per_block
+
 def analyze_block(block_range):
     start = time.time()
     print("Analyzing block range: "+colors.INFO+str(block_range[0])+"-"+str(block_range[1])+colors.END)
@@ -70,6 +87,8 @@ def analyze_block(block_range):
         end = time.time()
         return end - start
 
+    # Fetched on the first block of the range that is not analyzed yet and has liquidations
+    pricing_events_per_block = None
     execution_time = 0
     for block_number in events_per_block:
         status = mongo_connection["arbitrum"]["mev_liquidation_status"].find_one({"block_number": block_number})
@@ -324,13 +343,21 @@ def analyze_block(block_range):
             return end - start
 
         try:
-            for tx_index in liquidations:
-                block = w3.eth.getBlock(block_number)
+            # Fetch the block header with its transactions once and the receipts of all candidate transactions in one batch
+            candidates = [tx_index for tx_index in liquidations if len(liquidations[tx_index]) > 0]
+            if len(candidates) > 0:
+                if pricing_events_per_block == None:
+                    pricing_events_per_block = get_pricing_events(block_range)
+                block = w3.eth.getBlock(block_number, True)
                 one_eth_to_usd_price = decimal.Decimal(float(get_price_from_timestamp(block["timestamp"], prices["eth_to_usd"])))
-
+                transactions = dict()
+                for transaction in block["transactions"]:
+                    transactions[transaction["hash"].hex()] = transaction
+                receipts = get_transaction_receipts(w3, [transaction_index_to_hash[tx_index] for tx_index in candidates])
+            for tx_index in candidates:
                 # Compute transaction cost
-                tx = w3.eth.getTransaction(transaction_index_to_hash[tx_index])
-                receipt = w3.eth.getTransactionReceipt(tx["hash"])
+                tx = transactions[transaction_index_to_hash[tx_index]]
+                receipt = receipts[transaction_index_to_hash[tx_index]]
                 tx_cost = Web3.fromWei(receipt["gasUsed"] * tx["gasPrice"], "ether")
                 if tx_cost != 0:
                     total_cost_eth = tx_cost
@@ -405,7 +432,7 @@ def analyze_block(block_range):
                                 found_swap = False
                                 # Uniswap V2
                                 if not found_swap and liquidation["debt_token_address"] != "":
-                                    swap_events = get_events(w3, client_version, {"fromBlock": block_number, "toBlock": block_number, "topics": [UNISWAP_V2]}, ARBITRUM_PROVIDER, "arbitrum")
+                                    swap_events = pricing_events_per_block[block_number][UNISWAP_V2].get(tx["hash"].hex(), list())
                                     for swap in swap_events:
                                         if not found_swap and swap["transactionHash"] == tx["hash"].hex():
                                             if int(swap["data"].replace("0x", "")[128:192], 16) == liquidation["debt_token_amount"]:
@@ -424,7 +451,7 @@ def analyze_block(block_range):
                                                     liquidation_cost_usd = liquidation_cost_eth * one_eth_to_usd_price
                                 # Uniswap V3
                                 if not found_swap and liquidation["debt_token_address"] != "":
-                                    swap_events = get_events(w3, client_version, {"fromBlock": block_number, "toBlock": block_number, "topics": [UNISWAP_V3]}, ARBITRUM_PROVIDER, "arbitrum")
+                                    swap_events = pricing_events_per_block[block_number][UNISWAP_V3].get(tx["hash"].hex(), list())
                                     for swap in swap_events:
                                         if swap["transactionHash"] == tx["hash"].hex():
                                             if not found_swap and abs(toSigned256(int(swap["data"].replace("0x", "")[0:64], 16))) == liquidation["debt_token_amount"]:
@@ -471,8 +498,8 @@ def analyze_block(block_range):
                     redeem_amount_does_not_match = False
                     if liquidation["protocol_name"] == "Compound":
                         redeem_events = list()
-                        redeem_events += get_events(w3, client_version, {"fromBlock": block_number, "toBlock": block_number, "topics": [COMPOUND_REDEEM_1]}, ARBITRUM_PROVIDER, "arbitrum")
-                        redeem_events += get_events(w3, client_version, {"fromBlock": block_number, "toBlock": block_number, "topics": [COMPOUND_REDEEM_2]}, ARBITRUM_PROVIDER, "arbitrum")
+                        redeem_events += pricing_events_per_block[block_number][COMPOUND_REDEEM_1].get(tx["hash"].hex(), list())
+                        redeem_events += pricing_events_per_block[block_number][COMPOUND_REDEEM_2].get(tx["hash"].hex(), list())
                         for redeem_event in redeem_events:
                             if redeem_event["transactionHash"] == tx["hash"].hex():
                                 if int("0x"+redeem_event["data"].replace("0x", "")[128:192], 16) == liquidation["received_token_amount"]:
@@ -523,7 +550,7 @@ def analyze_block(block_range):
                             debt_token_amount_equals_received_token_amount = False
                             # Uniswap V2
                             if not found_swap:
-                                swap_events = get_events(w3, client_version, {"fromBlock": block_number, "toBlock": block_number, "topics": [UNISWAP_V2]}, ARBITRUM_PROVIDER, "arbitrum")
+                                swap_events = pricing_events_per_block[block_number][UNISWAP_V2].get(tx["hash"].hex(), list())
                                 for swap in swap_events:
                                     if swap["transactionHash"] == tx["hash"].hex():
                                         if not found_swap and int(swap["data"].replace("0x", "")[0:64], 16) == liquidation["received_token_amount"]:
@@ -546,7 +573,7 @@ def analyze_block(block_range):
                                             debt_token_amount_equals_received_token_amount = True
                             # Uniswap V3
                             if not found_swap:
-                                swap_events = get_events(w3, client_version, {"fromBlock": block_number, "toBlock": block_number, "topics": [UNISWAP_V3]}, ARBITRUM_PROVIDER, "arbitrum")
+                                swap_events = pricing_events_per_block[block_number][UNISWAP_V3].get(tx["hash"].hex(), list())
                                 for swap in swap_events:
                                     if swap["transactionHash"] == tx["hash"].hex():
                                         if not found_swap and abs(toSigned256(int(swap["data"].replace("0x", "")[0:64], 16))) == liquidation["received_token_amount"]:
@@ -12,13 +12,17 @@ from web3 import Web3
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../../..'))
 
-from utils.utils import colors, get_events
+from utils.utils import colors, get_events, imap_cursor, get_oracle_updates, get_flashbots_transactions
+from utils.timestamps import get_block_timestamp
+from utils.timeline import search_first_block
 from utils.settings import *
 
 CPUs = multiprocessing.cpu_count()
 
 BLOCK_RANGE = 100
 
+BATCH_SIZE = 100
+
 DEBUG_MODE = False
 
 CHAINLINK_ANSWER_UPDATED_EVENT  = "0x0559884fd3a460db3073b7fc896cc77986f16e378210ded43186175bf646fc5f"
@@ -27,27 +31,23 @@ def analyze_liquidation(liquidation_transaction):
     start = time.time()
     print("Analyzing liquidation transaction: "+colors.INFO+str(liquidation_transaction["transaction"]["hash"])+colors.END)
 
-    status = mongo_connection["ethereum"]["mev_liquidation_opportunities"].find_one({"id": liquidation_transaction["id"]})
-    if status and not DEBUG_MODE:
-        print("Liquidation transaction "+colors.INFO+str(liquidation_transaction["transaction"]["hash"])+colors.END+" already analyzed!")
-        return
-
     finding = dict()
     finding["id"] = liquidation_transaction["id"]
     finding["opportunities"] = list()
-    events = list()
-    events += get_events(w3, client_version, {"fromBlock": liquidation_transaction["block_number"]-BLOCK_RANGE-1, "toBlock": liquidation_transaction["block_number"], "topics": [CHAINLINK_ANSWER_UPDATED_EVENT]}, ETHEREUM_PROVIDER, "ethereum")
+    # Prefer the precomputed oracle update index and only scan the logs if the window has not been indexed yet
+    oracle_updates = get_oracle_updates(mongo_connection, "ethereum", liquidation_transaction["block_number"]-BLOCK_RANGE-1, liquidation_transaction["block_number"])
+    if oracle_updates == None:
+        oracle_updates = list()
+        events = get_events(w3, client_version, {"fromBlock": liquidation_transaction["block_number"]-BLOCK_RANGE-1, "toBlock": liquidation_transaction["block_number"], "topics": [CHAINLINK_ANSWER_UPDATED_EVENT]}, ETHEREUM_PROVIDER, "ethereum")
+        for event in events:
+            oracle_updates.append({"block_number": event["blockNumber"], "transaction_hash": event["transactionHash"], "transaction_index": event["transactionIndex"]})
     blocks = dict()
-    for event in events:
-        if not event["blockNumber"] in blocks:
-            blocks[event["blockNumber"]] = set()
-        blocks[event["blockNumber"]].add((event["transactionHash"], event["transactionIndex"]))
+    for oracle_update in oracle_updates:
+        if not oracle_update["block_number"] in blocks:
+            blocks[oracle_update["block_number"]] = set()
+        blocks[oracle_update["block_number"]].add((oracle_update["transaction_hash"], oracle_update["transaction_index"]))
     blocks = dict(sorted(blocks.items()))
-    flashbots_block = mongo_connection["flashbots"]["blocks"].find_one({"block_number": liquidation_transaction["block_number"]})
-    flashbots_transactions = dict()
-    if flashbots_block:
-        for tx in flashbots_block["transactions"]:
-            flashbots_transactions[tx["transaction_hash"]] = tx["bundle_index"]
+    flashbots_transactions = get_flashbots_transactions(mongo_connection, liquidation_transaction["block_number"], liquidation_transaction["block_number"])[liquidation_transaction["block_number"]]
     for liquidation in liquidation_transaction["liquidations"]:
         try:
             if "Aave" in liquidation["protocol_name"]:
@@ -81,7 +81,7 @@ def analyze_liquidation(liquidation_transaction):
                 opportunity["oracle_update"]["transactions"] = list()
                 if opportunity["liquidation"]["transaction_hash"] in flashbots_transactions:
                     opportunity["liquidation"]["flashbots_bundle"] = True
-                    opportunity["liquidation"]["flashbots_bundle_index"] = flashbots_transactions[opportunity["liquidation"]["transaction_hash"]]
+                    opportunity["liquidation"]["flashbots_bundle_index"] = flashbots_transactions[opportunity["liquidation"]["transaction_hash"]]["bundle_index"]
                 if contract:
                     opportunity["liquidation"]["health_factor_start_of_block"] = contract.functions.getUserAccountData(liquidation["liquidated_user"]).call(block_identifier=opportunity["liquidation"]["block_number"]-1)[-1] / 1e18
                     opportunity["liquidation"]["health_factor_end_of_block"] = contract.functions.getUserAccountData(liquidation["liquidated_user"]).call(block_identifier=opportunity["liquidation"]["block_number"])[-1] / 1e18
@@ -93,7 +93,7 @@ def analyze_liquidation(liquidation_transaction):
                                     flashbots_bundle_index = None
                                     if tx[0] in flashbots_transactions:
                                         flashbots_bundle = True
-                                        flashbots_bundle_index = flashbots_transactions[tx[0]]
+                                        flashbots_bundle_index = flashbots_transactions[tx[0]]["bundle_index"]
                                     opportunity["oracle_update"]["transactions"].append({
                                         "transaction_hash": tx[0],
                                         "transaction_index": tx[1],
@@ -108,50 +108,41 @@ def analyze_liquidation(liquidation_transaction):
                             opportunity["oracle_update"]["health_factor"] = None
                             opportunity["oracle_update"]["distance"] = 0
                     else:
-                        previous_block = None
-                        previous_health_factor = None
-                        for block in reversed(list(blocks.keys())):
-                            current_health_factor = None
-                            try:
-                                data = contract.functions.getUserAccountData(liquidation["liquidated_user"]).call(block_identifier=block)
-                                current_health_factor = data[-1]
-                            except:
-                                continue
-                            if DEBUG_MODE:
-                                print(block, current_health_factor / 1e18)
-                            if previous_health_factor != None and previous_health_factor < 1e18 and current_health_factor >= 1e18:
-                                for tx in blocks[previous_block]:
-                                    if liquidation_transaction["block_number"] - previous_block == 0:
-                                        flashbots_bundle = False
-                                        flashbots_bundle_index = None
-                                        if tx[0] in flashbots_transactions:
-                                            flashbots_bundle = True
-                                            flashbots_bundle_index = flashbots_transactions[tx[0]]
-                                        if tx[1] <= opportunity["liquidation"]["transaction_index"]:
-                                            opportunity["oracle_update"]["transactions"].append({
-                                                "transaction_hash": tx[0],
-                                                "transaction_index": tx[1],
-                                                "gas_price": w3.eth.get_transaction(tx[0])["gasPrice"],
-                                                "flashbots_bundle": flashbots_bundle,
-                                                "flashbots_bundle_index": flashbots_bundle_index
-                                            })
-                                    else:
+                        # Search the first oracle update after which the position stayed liquidatable
+                        search_blocks = [block for block in blocks if block < liquidation_transaction["block_number"] or opportunity["liquidation"]["health_factor_end_of_block"] < 1.0]
+                        previous_block, previous_health_factor = search_first_block(w3, contract.address, contract.encodeABI(fn_name="getUserAccountData", args=[liquidation["liquidated_user"]]), search_blocks, lambda data: w3.codec.decode_abi(["uint256"]*6, data)[-1], lambda health_factor: health_factor < 1e18)
+                        if DEBUG_MODE:
+                            print(previous_block, previous_health_factor)
+                        if previous_block != None:
+                            for tx in blocks[previous_block]:
+                                if liquidation_transaction["block_number"] - previous_block == 0:
+                                    flashbots_bundle = False
+                                    flashbots_bundle_index = None
+                                    if tx[0] in flashbots_transactions:
+                                        flashbots_bundle = True
+                                        flashbots_bundle_index = flashbots_transactions[tx[0]]["bundle_index"]
+                                    if tx[1] <= opportunity["liquidation"]["transaction_index"]:
                                         opportunity["oracle_update"]["transactions"].append({
                                             "transaction_hash": tx[0],
                                             "transaction_index": tx[1],
                                             "gas_price": w3.eth.get_transaction(tx[0])["gasPrice"],
-                                            "flashbots_bundle": False,
-                                            "flashbots_bundle_index": None
+                                            "flashbots_bundle": flashbots_bundle,
+                                            "flashbots_bundle_index": flashbots_bundle_index
                                         })
-                                if len(opportunity["oracle_update"]["transactions"]) > 0:
-                                    print(colors.OK+"Found liquidation opportunity!"+colors.END, "Block number:", colors.INFO+str(previous_block)+colors.END, "Health factor:", colors.INFO+str(previous_health_factor / 1e18)+colors.END, "Distance:", colors.INFO+str(liquidation_transaction["block_number"] - previous_block)+colors.END)
-                                    opportunity["oracle_update"]["block_number"] = previous_block
-                                    opportunity["oracle_update"]["timestamp"] = w3.eth.get_block(previous_block)["timestamp"]
-                                    opportunity["oracle_update"]["health_factor"] = previous_health_factor / 1e18
-                                    opportunity["oracle_update"]["distance"] = liquidation_transaction["block_number"] - previous_block
-                                break
-                            previous_block = block
-                            previous_health_factor = current_health_factor
+                                else:
+                                    opportunity["oracle_update"]["transactions"].append({
+                                        "transaction_hash": tx[0],
+                                        "transaction_index": tx[1],
+                                        "gas_price": w3.eth.get_transaction(tx[0])["gasPrice"],
+                                        "flashbots_bundle": False,
+                                        "flashbots_bundle_index": None
+                                    })
+                            if len(opportunity["oracle_update"]["transactions"]) > 0:
+                                print(colors.OK+"Found liquidation opportunity!"+colors.END, "Block number:", colors.INFO+str(previous_block)+colors.END, "Health factor:", colors.INFO+str(previous_health_factor / 1e18)+colors.END, "Distance:", colors.INFO+str(liquidation_transaction["block_number"] - previous_block)+colors.END)
+                                opportunity["oracle_update"]["block_number"] = previous_block
+                                opportunity["oracle_update"]["timestamp"] = get_block_timestamp(w3, "ethereum", previous_block)
+                                opportunity["oracle_update"]["health_factor"] = previous_health_factor / 1e18
+                                opportunity["oracle_update"]["distance"] = liquidation_transaction["block_number"] - previous_block
                 if DEBUG_MODE:
                     import pprint
                     pprint.pprint(opportunity)
@@ -211,7 +202,7 @@ def analyze_liquidation(liquidation_transaction):
                 opportunity["oracle_update"]["transactions"] = list()
                 if opportunity["liquidation"]["transaction_hash"] in flashbots_transactions:
                     opportunity["liquidation"]["flashbots_bundle"] = True
-                    opportunity["liquidation"]["flashbots_bundle_index"] = flashbots_transactions[opportunity["liquidation"]["transaction_hash"]]
+                    opportunity["liquidation"]["flashbots_bundle_index"] = flashbots_transactions[opportunity["liquidation"]["transaction_hash"]]["bundle_index"]
                 if contract:
                     opportunity["liquidation"]["shortfall_start_of_block"] = str(contract.functions.getAccountLiquidity(liquidation["liquidated_user"]).call(block_identifier=liquidation_transaction["block_number"]-1)[-1])
                     opportunity["liquidation"]["shortfall_end_of_block"] = str(contract.functions.getAccountLiquidity(liquidation["liquidated_user"]).call(block_identifier=liquidation_transaction["block_number"])[-1])
@@ -223,7 +214,7 @@ def analyze_liquidation(liquidation_transaction):
                                     flashbots_bundle_index = None
                                     if tx[0] in flashbots_transactions:
                                         flashbots_bundle = True
-                                        flashbots_bundle_index = flashbots_transactions[tx[0]]
+                                        flashbots_bundle_index = flashbots_transactions[tx[0]]["bundle_index"]
                                     opportunity["oracle_update"]["transactions"].append({
                                         "transaction_hash": tx[0],
                                         "transaction_index": tx[1],
@@ -238,50 +229,41 @@ def analyze_liquidation(liquidation_transaction):
                             opportunity["oracle_update"]["shortfall"] = None
                             opportunity["oracle_update"]["distance"] = 0
                     else:
-                        previous_block = None
-                        previous_shortfall = None
-                        for block in reversed(list(blocks.keys())):
-                            current_shortfall = None
-                            try:
-                                data = contract.functions.getAccountLiquidity(liquidation["liquidated_user"]).call(block_identifier=block)
-                                current_shortfall = data[-1]
-                            except:
-                                continue
-                            if DEBUG_MODE:
-                                print(block, current_shortfall)
-                            if previous_shortfall != None and previous_shortfall != 0 and current_shortfall == 0:
-                                for tx in blocks[previous_block]:
-                                    if liquidation_transaction["block_number"] - previous_block == 0:
-                                        flashbots_bundle = False
-                                        flashbots_bundle_index = None
-                                        if tx[0] in flashbots_transactions:
-                                            flashbots_bundle = True
-                                            flashbots_bundle_index = flashbots_transactions[tx[0]]
-                                        if tx[1] <= opportunity["liquidation"]["transaction_index"]:
-                                            opportunity["oracle_update"]["transactions"].append({
-                                                "transaction_hash": tx[0],
-                                                "transaction_index": tx[1],
-                                                "gas_price": w3.eth.get_transaction(tx[0])["gasPrice"],
-                                                "flashbots_bundle": flashbots_bundle,
-                                                "flashbots_bundle_index": flashbots_bundle_index
-                                            })
-                                    else:
+                        # Search the first oracle update after which the position stayed liquidatable
+                        search_blocks = [block for block in blocks if block < liquidation_transaction["block_number"] or opportunity["liquidation"]["shortfall_end_of_block"] != "0"]
+                        previous_block, previous_shortfall = search_first_block(w3, contract.address, contract.encodeABI(fn_name="getAccountLiquidity", args=[liquidation["liquidated_user"]]), search_blocks, lambda data: w3.codec.decode_abi(["uint256"]*len(contract.abi[0]["outputs"]), data)[-1], lambda shortfall: shortfall != 0)
+                        if DEBUG_MODE:
+                            print(previous_block, previous_shortfall)
+                        if previous_block != None:
+                            for tx in blocks[previous_block]:
+                                if liquidation_transaction["block_number"] - previous_block == 0:
+                                    flashbots_bundle = False
+                                    flashbots_bundle_index = None
+                                    if tx[0] in flashbots_transactions:
+                                        flashbots_bundle = True
+                                        flashbots_bundle_index = flashbots_transactions[tx[0]]["bundle_index"]
+                                    if tx[1] <= opportunity["liquidation"]["transaction_index"]:
                                         opportunity["oracle_update"]["transactions"].append({
                                             "transaction_hash": tx[0],
                                             "transaction_index": tx[1],
                                             "gas_price": w3.eth.get_transaction(tx[0])["gasPrice"],
-                                            "flashbots_bundle": False,
-                                            "flashbots_bundle_index": None
+                                            "flashbots_bundle": flashbots_bundle,
+                                            "flashbots_bundle_index": flashbots_bundle_index
                                         })
-                                if len(opportunity["oracle_update"]["transactions"]) > 0:
-                                    print(colors.OK+"Found liquidation opportunity!"+colors.END, "Block number:", colors.INFO+str(previous_block)+colors.END, "Shortfall:", colors.INFO+str(previous_shortfall)+colors.END, "Distance:", colors.INFO+str(liquidation_transaction["block_number"] - previous_block)+colors.END)
-                                    opportunity["oracle_update"]["block_number"] = previous_block
-                                    opportunity["oracle_update"]["timestamp"] = w3.eth.get_block(previous_block)["timestamp"]
-                                    opportunity["oracle_update"]["shortfall"] = str(previous_shortfall)
-                                    opportunity["oracle_update"]["distance"] = liquidation_transaction["block_number"] - previous_block
-                                break
-                            previous_block = block
-                            previous_shortfall = current_shortfall
+                                else:
+                                    opportunity["oracle_update"]["transactions"].append({
+                                        "transaction_hash": tx[0],
+                                        "transaction_index": tx[1],
+                                        "gas_price": w3.eth.get_transaction(tx[0])["gasPrice"],
+                                        "flashbots_bundle": False,
+                                        "flashbots_bundle_index": None
+                                    })
+                            if len(opportunity["oracle_update"]["transactions"]) > 0:
+                                print(colors.OK+"Found liquidation opportunity!"+colors.END, "Block number:", colors.INFO+str(previous_block)+colors.END, "Shortfall:", colors.INFO+str(previous_shortfall)+colors.END, "Distance:", colors.INFO+str(liquidation_transaction["block_number"] - previous_block)+colors.END)
+                                opportunity["oracle_update"]["block_number"] = previous_block
+                                opportunity["oracle_update"]["timestamp"] = get_block_timestamp(w3, "ethereum", previous_block)
+                                opportunity["oracle_update"]["shortfall"] = str(previous_shortfall)
+                                opportunity["oracle_update"]["distance"] = liquidation_transaction["block_number"] - previous_block
                 if DEBUG_MODE:
                     import pprint
                     pprint.pprint(opportunity)
@@ -312,6 +294,18 @@ def analyze_liquidation(liquidation_transaction):
             collection.create_index('opportunities.oracle_update.distance')
 
 
+def analyze_liquidations(liquidation_ids):
+    # Load a whole batch of liquidations at once and skip the ones that have already been analyzed
+    ids = [liquidation["id"] for liquidation in liquidation_ids]
+    analyzed = set()
+    if not DEBUG_MODE:
+        analyzed = set([finding["id"] for finding in mongo_connection["ethereum"]["mev_liquidation_opportunities"].find({"id": {"$in": ids}}, {"id": 1, "_id": 0})])
+    for liquidation_transaction in mongo_connection["ethereum"]["mev_liquidation_results"].find({"id": {"$in": ids}}):
+        if liquidation_transaction["id"] in analyzed:
+            print("Liquidation transaction "+colors.INFO+str(liquidation_transaction["transaction"]["hash"])+colors.END+" already analyzed!")
+            continue
+        analyze_liquidation(liquidation_transaction)
+
 def init_process():
     global w3
     global client_version
@@ -332,8 +326,10 @@ def main():
 
     mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
     collection = mongo_connection["ethereum"]["mev_liquidation_results"]
-    liquidations = list(collection.find({}))
-    print("Analyzing", colors.INFO+str(len(liquidations))+colors.END, "liquidations on Ethereum.")
+    query = {}
+    # Only stream the ids, workers load the full documents in batches
+    liquidations = collection.find(query, {"id": 1, "_id": 0}, no_cursor_timeout=True)
+    print("Analyzing", colors.INFO+str(collection.count_documents(query))+colors.END, "liquidations on Ethereum.")
 
     if sys.platform.startswith("linux"):
         multiprocessing.set_start_method("fork")
@@ -343,7 +339,9 @@ def main():
     print("Initializing workers...")
     with multiprocessing.Pool(processes=CPUs, initializer=init_process, initargs=()) as pool:
         start_total = time.time()
-        pool.map(analyze_liquidation, liquidations)
+        for _ in imap_cursor(pool, analyze_liquidations, liquidations, BATCH_SIZE, 4*CPUs):
+            pass
+        liquidations.close()
         end_total = time.time()
         print("Total execution time: "+colors.INFO+str(end_total - start_total)+colors.END)
 
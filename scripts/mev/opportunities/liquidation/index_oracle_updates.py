@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import pymongo
+import traceback
+import multiprocessing
+
+from web3 import Web3
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../..'))
+
+from utils.utils import colors, get_events, toSigned256, ORACLE_UPDATES_BLOCK_RANGE
+from utils.settings import *
+
+CPUs = multiprocessing.cpu_count()
+
+CHAINLINK_ANSWER_UPDATED_EVENT = "0x0559884fd3a460db3073b7fc896cc77986f16e378210ded43186175bf646fc5f"
+
+PROVIDERS = {
+    "ethereum": ETHEREUM_PROVIDER,
+    "arbitrum": ARBITRUM_PROVIDER,
+    "optimism": OPTIMISM_PROVIDER,
+    "zksync":   ZKSYNC_PROVIDER
+}
+
+def index_chunk(chunk):
+    start = time.time()
+    block_range = (chunk * ORACLE_UPDATES_BLOCK_RANGE, (chunk + 1) * ORACLE_UPDATES_BLOCK_RANGE - 1)
+
+    status = mongo_connection[network]["oracle_updates_status"].find_one({"chunk": chunk})
+    if status:
+        print("Block range "+colors.INFO+str(block_range[0])+"-"+str(block_range[1])+colors.END+" already indexed!")
+        return
+
+    try:
+        events = get_events(w3, client_version, {"fromBlock": block_range[0], "toBlock": block_range[1], "topics": [CHAINLINK_ANSWER_UPDATED_EVENT]}, PROVIDERS[network], network)
+        if events == None:
+            raise Exception("Could not retrieve AnswerUpdated events")
+        oracle_updates = list()
+        for event in events:
+            oracle_updates.append({
+                "block_number": event["blockNumber"],
+                "aggregator": event["address"],
+                "transaction_hash": event["transactionHash"],
+                "transaction_index": event["transactionIndex"],
+                "log_index": event["logIndex"],
+                "current": str(toSigned256(int(event["topics"][1], 16))),
+                "round_id": int(event["topics"][2], 16)
+            })
+    except Exception as e:
+        print(colors.FAIL+str(traceback.format_exc())+colors.END)
+        print(colors.FAIL+"Error: "+str(e)+" @ block range: "+str(block_range[0])+"-"+str(block_range[1])+colors.END)
+        return
+
+    collection = mongo_connection[network]["oracle_updates"]
+    if oracle_updates:
+        try:
+            collection.insert_many(oracle_updates, ordered=False)
+        except pymongo.errors.BulkWriteError as e:
+            # Updates of a previous, interrupted run are already stored, any other error leaves the chunk unindexed
+            if any([error["code"] != 11000 for error in e.details["writeErrors"]]) or len(e.details.get("writeConcernErrors", [])) > 0:
+                print(colors.FAIL+"Error: "+str(e)+" @ block range: "+str(block_range[0])+"-"+str(block_range[1])+colors.END)
+                return
+
+    # The chunk is only marked as indexed once all of its events are stored
+    end = time.time()
+    collection = mongo_connection[network]["oracle_updates_status"]
+    try:
+        collection.insert_one({"chunk": chunk, "block_range_start": block_range[0], "block_range_end": block_range[1], "oracle_updates": len(oracle_updates), "execution_time": end-start})
+    except pymongo.errors.DuplicateKeyError:
+        pass
+    print("Indexed "+colors.INFO+str(len(oracle_updates))+colors.END+" oracle updates in block range "+colors.INFO+str(block_range[0])+"-"+str(block_range[1])+colors.END)
+
+def create_indexes(mongo_connection, network):
+    # Indexes are created once before the workers start, so that workers do not race each other
+    collection = mongo_connection[network]["oracle_updates"]
+    # Indexing...
+    if 'block_number_1_aggregator_1' not in collection.index_information():
+        collection.create_index([('block_number', pymongo.ASCENDING), ('aggregator', pymongo.ASCENDING)])
+        collection.create_index([('transaction_hash', pymongo.ASCENDING), ('log_index', pymongo.ASCENDING)], unique=True)
+
+    # A chunk is counted once by get_oracle_updates, hence the status of a chunk has to be unique. Status rows of earlier runs
+    # that marked a chunk more than once are removed before the non-unique index is replaced.
+    collection = mongo_connection[network]["oracle_updates_status"]
+    indexes = collection.index_information()
+    if 'chunk_1' in indexes and indexes['chunk_1'].get('unique', False):
+        return
+    for duplicate in collection.aggregate([{"$group": {"_id": "$chunk", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}}, {"$match": {"count": {"$gt": 1}}}], allowDiskUse=True):
+        collection.delete_many({"_id": {"$in": duplicate["ids"][1:]}})
+    if 'chunk_1' in indexes:
+        collection.drop_index('chunk_1')
+    # Indexing...
+    collection.create_index('chunk', unique=True)
+
+def init_process(_network):
+    global w3
+    global client_version
+    global network
+    global mongo_connection
+
+    network = _network
+    w3 = Web3(PROVIDERS[network])
+    if w3.is_connected():
+        client_version = w3.client_version
+        print("Connected worker to "+colors.INFO+client_version+colors.END)
+    else:
+        client_version = ""
+        print(colors.FAIL+"Error: Could not connect to "+network+" client. Please check the provider!"+colors.END)
+    if network != "ethereum":
+        from web3.middleware import geth_poa_middleware
+        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+    mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
+
+def main():
+    if len(sys.argv) != 3 or not sys.argv[2].lower() in PROVIDERS:
+        print(colors.FAIL+"Error: Please provide a block range and a network: 'python3 "+sys.argv[0]+" <BLOCK_RANGE_START>:<BLOCK_RANGE_END> <ethereum|arbitrum|optimism|zksync>'"+colors.END)
+        sys.exit(-1)
+    if not ":" in sys.argv[1]:
+        print(colors.FAIL+"Error: Please provide a valid block range: 'python3 "+sys.argv[0]+" <BLOCK_RANGE_START>:<BLOCK_RANGE_END> <ethereum|arbitrum|optimism|zksync>'"+colors.END)
+        sys.exit(-2)
+    block_range_start, block_range_end = sys.argv[1].split(":")[0], sys.argv[1].split(":")[1]
+    if not block_range_start.isnumeric() or not block_range_end.isnumeric():
+        print(colors.FAIL+"Error: Please provide integers as block range: 'python3 "+sys.argv[0]+" <BLOCK_RANGE_START>:<BLOCK_RANGE_END> <ethereum|arbitrum|optimism|zksync>'"+colors.END)
+        sys.exit(-3)
+    block_range_start, block_range_end = int(block_range_start), int(block_range_end)
+
+    # Ranges are indexed in aligned chunks, so that scanners can check the coverage of any window
+    chunks = list(range(block_range_start // ORACLE_UPDATES_BLOCK_RANGE, block_range_end // ORACLE_UPDATES_BLOCK_RANGE + 1))
+    print("Indexing oracle updates of block range "+colors.INFO+str(chunks[0] * ORACLE_UPDATES_BLOCK_RANGE)+"-"+str((chunks[-1] + 1) * ORACLE_UPDATES_BLOCK_RANGE - 1)+colors.END+" on "+colors.INFO+sys.argv[2].lower()+colors.END)
+
+    mongo_connection = pymongo.MongoClient("mongodb://"+MONGO_HOST+":"+str(MONGO_PORT), maxPoolSize=None)
+    create_indexes(mongo_connection, sys.argv[2].lower())
+    # MongoClient is not fork-safe, workers open their own connection
+    mongo_connection.close()
+
+    if sys.platform.startswith("linux"):
+        multiprocessing.set_start_method("fork")
+    print("Running oracle update indexing with "+colors.INFO+str(CPUs)+colors.END+" CPUs")
+    print("Initializing workers...")
+    with multiprocessing.Pool(processes=CPUs, initializer=init_process, initargs=(sys.argv[2].lower(),)) as pool:
+        start_total = time.time()
+        pool.map(index_chunk, chunks)
+        end_total = time.time()
+        print("Total execution time: "+colors.INFO+str(end_total - start_total)+colors.END)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from utils.settings import ETHEREUM_PROVIDER, ARBITRUM_PROVIDER, OPTIMISM_PROVIDER, ZKSYNC_PROVIDER
+
+# Chain profiles for the detectors that are written once for all chains, "network" is passed to the RPC helpers and "database" is
+# the Mongo namespace of the chain (dev chains keep the network but get their own database)
+CHAINS = {
+    "ethereum": {
+        "name":      "Ethereum",
+        "network":   "ethereum",
+        "database":  "ethereum",
+        "provider":  ETHEREUM_PROVIDER,
+        "weth":      "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2",
+        "poa":       False,
+        "flashbots": True
+    },
+    "arbitrum": {
+        "name":      "Arbitrum",
+        "network":   "arbitrum",
+        "database":  "arbitrum",
+        "provider":  ARBITRUM_PROVIDER,
+        "weth":      "0x82aF49447D8a07e3bd95BD0d56f35241523fBab1",
+        "poa":       True,
+        "flashbots": False
+    },
+    "optimism": {
+        "name":      "Optimism",
+        "network":   "optimism",
+        "database":  "optimism",
+        "provider":  OPTIMISM_PROVIDER,
+        "weth":      "0x4200000000000000000000000000000000000006",
+        "poa":       True,
+        "flashbots": False
+    },
+    "zksync": {
+        "name":      "zkSync",
+        "network":   "zksync",
+        "database":  "zksync",
+        "provider":  ZKSYNC_PROVIDER,
+        "weth":      "0x5AEa5775959fBC2557Cc8789bC1bf90A239D9a91",
+        "poa":       True,
+        "flashbots": False
+    }
+}
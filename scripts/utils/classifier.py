@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pymongo
+
+from web3 import Web3
+
+# Candidate ABIs are probed in order, the first one that can be called successfully classifies the contract
+EXCHANGE_ABIS = {
+    "Uniswap V2": ("name", [{"inputs":[],"name":"name","outputs":[{"internalType":"string","name":"","type":"string"}],"type":"function"}]),
+    "Uniswap V3": ("feeGrowthGlobal0X128", [{"inputs":[],"name":"feeGrowthGlobal0X128","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"type":"function"}])
+}
+
+CURVE_COINS_ABIS = {
+    "coins(int128)":            ("coins",            [{"name":"coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"int128","name":"arg0"}],"type":"function"}]),
+    "coins(uint256)":           ("coins",            [{"name":"coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"uint256","name":"arg0"}],"type":"function"}]),
+    "underlying_coins(int128)": ("underlying_coins", [{"name":"underlying_coins","outputs":[{"type":"address","name":"out"}],"inputs":[{"type":"int128","name":"arg0"}],"type":"function"}]),
+    "underlying_coins(uint256)":("underlying_coins", [{"name":"underlying_coins","outputs":[{"type":"address","name":""}],"inputs":[{"type":"uint256","name":"arg0"}],"type":"function"}])
+}
+
+# A second function that has to be callable with the same arguments, so that a contract which happens to answer the first probe
+# (e.g. through a fallback function) does not get the wrong ABI cached for every contract with the same bytecode
+CANDIDATE_CHECKS = {
+    "coins(int128)":            ("balances", [{"name":"balances","outputs":[{"type":"uint256","name":""}],"inputs":[{"type":"int128","name":"arg0"}],"type":"function"}]),
+    "coins(uint256)":           ("balances", [{"name":"balances","outputs":[{"type":"uint256","name":""}],"inputs":[{"type":"uint256","name":"arg0"}],"type":"function"}]),
+    "underlying_coins(int128)": ("balances", [{"name":"balances","outputs":[{"type":"uint256","name":""}],"inputs":[{"type":"int128","name":"arg0"}],"type":"function"}]),
+    "underlying_coins(uint256)":("balances", [{"name":"balances","outputs":[{"type":"uint256","name":""}],"inputs":[{"type":"uint256","name":"arg0"}],"type":"function"}])
+}
+
+def call_contract(w3, address, function, args=[], block_identifier="latest"):
+    function_name, abi = function
+    contract = w3.eth.contract(address=address, abi=abi)
+    return getattr(contract.functions, function_name)(*args).call(block_identifier=block_identifier)
+
+def get_code_hash(w3, address, cache, block_identifier="latest"):
+    if not address+":code_hash" in cache:
+        code = w3.eth.get_code(address, block_identifier=block_identifier)
+        if len(code) == 0:
+            # Self-destructed or not yet deployed, do not share a classification across all empty accounts
+            return None
+        cache[address+":code_hash"] = Web3.keccak(code).hex()
+    return cache[address+":code_hash"]
+
+def probe_contract(w3, address, candidate, function, args=[], block_identifier="latest"):
+    try:
+        call_contract(w3, address, function, args, block_identifier)
+        if candidate in CANDIDATE_CHECKS:
+            call_contract(w3, address, CANDIDATE_CHECKS[candidate], args, block_identifier)
+        return True
+    except:
+        return False
+
+def classify_contract(w3, mongo_connection, database, kind, candidates, address, cache, args=[], block_identifier="latest"):
+    # Classifications are persisted per runtime bytecode hash, so every clone of a known contract is classified without extra calls.
+    # Uniswap V3 pools embed immutables (tokens, fee, tick spacing) in their runtime code, hence their entry only serves the same pool.
+    try:
+        code_hash = get_code_hash(w3, address, cache, block_identifier)
+    except:
+        code_hash = None
+    if code_hash != None:
+        if not code_hash+":"+kind in cache:
+            classification = mongo_connection[database]["contract_classifications"].find_one({"code_hash": code_hash, "kind": kind})
+            if classification:
+                cache[code_hash+":"+kind] = classification["label"]
+        if code_hash+":"+kind in cache:
+            return cache[code_hash+":"+kind]
+
+    label = None
+    for candidate in candidates:
+        if probe_contract(w3, address, candidate, candidates[candidate], args, block_identifier):
+            label = candidate
+            break
+
+    # Only successful probes are persisted, a failed call might just be a transient RPC error
+    if code_hash != None and label != None:
+        cache[code_hash+":"+kind] = label
+        collection = mongo_connection[database]["contract_classifications"]
+        # Indexing...
+        if 'code_hash_1_kind_1' not in collection.index_information():
+            collection.create_index([('code_hash', pymongo.ASCENDING), ('kind', pymongo.ASCENDING)], unique=True)
+        try:
+            collection.insert_one({"code_hash": code_hash, "kind": kind, "label": label, "address": address})
+        except pymongo.errors.DuplicateKeyError:
+            pass
+    return label
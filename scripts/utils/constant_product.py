@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+
+from utils.sandwich import optimal_frontrun, sandwich_profit
+
+class ConstantProductPool:
+    # Uniswap V2 style x*y=k pair with a fee of fee/fee_denominator on the input amount. Uniswap V2 forks keep the fee in the
+    # reserves (fee_in_reserves=True), other pairs (e.g., Camelot, Velodrome V1) only add the input after fees to the reserves.
+    __slots__ = ("reserves", "fee", "fee_denominator", "fee_in_reserves")
+
+    def __init__(self, reserves, fee, fee_denominator, fee_in_reserves=True):
+        self.reserves = list(reserves)
+        self.fee = fee
+        self.fee_denominator = fee_denominator
+        self.fee_in_reserves = fee_in_reserves
+
+    def copy(self):
+        return ConstantProductPool(self.reserves, self.fee, self.fee_denominator, self.fee_in_reserves)
+
+    def load(self, pool):
+        self.reserves[0] = pool.reserves[0]
+        self.reserves[1] = pool.reserves[1]
+
+    def swap(self, tokenIndexFrom, tokenIndexTo, dx):
+        reserves = self.reserves
+        if self.fee_in_reserves:
+            dx_with_fee = dx * (self.fee_denominator - self.fee)
+            dy = dx_with_fee * reserves[tokenIndexTo] // (reserves[tokenIndexFrom] * self.fee_denominator + dx_with_fee)
+            reserves[tokenIndexFrom] += dx
+        else:
+            dx = dx - dx * self.fee // self.fee_denominator
+            dy = dx * reserves[tokenIndexTo] // (reserves[tokenIndexFrom] + dx)
+            reserves[tokenIndexFrom] += dx
+        reserves[tokenIndexTo] -= dy
+        return dy
+
+def victim_output(pool, buffer, frontrun_in, victim_in, tokenIndexFrom, tokenIndexTo):
+    buffer.load(pool)
+    buffer.swap(tokenIndexFrom, tokenIndexTo, frontrun_in)
+    return buffer.swap(tokenIndexFrom, tokenIndexTo, victim_in)
+
+def max_frontrun(pool, buffer, victim_in, min_out, tokenIndexFrom=1, tokenIndexTo=0):
+    # Largest front-run after which the victim still receives min_out. With g = 1 - fee and h = g (or 1 if the fee stays in the
+    # reserves) the victim receives g*v*a*b / ((a + g*x) * (a + g*v + h*x)), so the bound is the positive root of a quadratic in x.
+    # The root is computed with integers (scaled by the fee denominator) and then corrected against the integer swap math.
+    a, b = pool.reserves[tokenIndexFrom], pool.reserves[tokenIndexTo]
+    d = pool.fee_denominator
+    g = d - pool.fee
+    h = d if pool.fee_in_reserves else g
+    qa = min_out * g * h
+    qb = min_out * (a * d * h + g * (a * d + g * victim_in))
+    qc = min_out * a * d * (a * d + g * victim_in) - g * victim_in * a * b * d
+    if qc > 0:
+        return 0
+    x = max((math.isqrt(qb * qb - 4 * qa * qc) - qb) // (2 * qa), 0)
+
+    # Rounding of the swaps shifts the bound slightly, search the exact integer bound around the root
+    def feasible(frontrun_in):
+        return victim_output(pool, buffer, frontrun_in, victim_in, tokenIndexFrom, tokenIndexTo) >= min_out
+    step = 1
+    if feasible(x):
+        while feasible(x + step):
+            x += step
+            step *= 2
+        lower, upper = x, x + step
+    else:
+        while x - step > 0 and not feasible(x - step):
+            x -= step
+            step *= 2
+        if x - step <= 0:
+            if not feasible(0):
+                return 0
+            lower, upper = 0, x
+        else:
+            lower, upper = x - step, x
+    while upper - lower > 1:
+        middle = (lower + upper) // 2
+        if feasible(middle):
+            lower = middle
+        else:
+            upper = middle
+    return lower
+
+def optimal_sandwich(pool, victim_in, min_out, budget, tokenIndexFrom=1, tokenIndexTo=0):
+    # Returns the optimal front-run input and the outputs of front-run, victim and back-run. The profit grows with the front-run
+    # until either the victim's slippage or the fees bind, in the first (common) case the optimum is the closed-form bound.
+    buffer = pool.copy()
+    bound = budget
+    if min_out > 0:
+        bound = min(bound, max_frontrun(pool, buffer, victim_in, min_out, tokenIndexFrom, tokenIndexTo))
+    if bound < 1:
+        return 0, 0, 0, 0
+    step = max(bound >> 10, 1)
+    if bound > step and sandwich_profit(pool, buffer, bound, victim_in, min_out, tokenIndexFrom, tokenIndexTo) < sandwich_profit(pool, buffer, bound - step, victim_in, min_out, tokenIndexFrom, tokenIndexTo):
+        # The fees bind before the slippage does, only then the optimum has to be searched
+        frontrun_in = optimal_frontrun(pool, victim_in, min_out, bound, tokenIndexFrom, tokenIndexTo)
+    else:
+        frontrun_in = bound
+    buffer.load(pool)
+    frontrun_out = buffer.swap(tokenIndexFrom, tokenIndexTo, frontrun_in)
+    victim_out = buffer.swap(tokenIndexFrom, tokenIndexTo, victim_in)
+    backrun_out = buffer.swap(tokenIndexTo, tokenIndexFrom, frontrun_out)
+    return frontrun_in, frontrun_out, victim_out, backrun_out
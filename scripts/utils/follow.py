@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import collections
+
+from utils.utils import colors
+
+# Number of block hashes that are kept to detect reorgs, deeper reorgs can only be rolled back up to this depth
+REORG_DEPTH = 64
+
+POLL_INTERVAL = 1
+
+# Number of times a failing block is analyzed again before it is skipped, blocks without a status row are picked up by range runs
+MAX_RETRIES = 3
+
+def get_block(w3, block_number):
+    # While following the head, a block might not be available yet on the node or the node might be unreachable
+    try:
+        return w3.eth.get_block(block_number)
+    except Exception as e:
+        print(colors.FAIL+"Error: "+str(e)+" @ block number: "+str(block_number)+colors.END)
+        return None
+
+def find_orphaned_block(w3, block_hashes, block_number):
+    # Walk back from an orphaned block to the oldest tracked block that is no longer part of the canonical chain
+    while block_number-1 in block_hashes:
+        block = get_block(w3, block_number-1)
+        if block == None:
+            return None
+        if block["hash"] == block_hashes[block_number-1]:
+            break
+        block_number -= 1
+    if not block_number-1 in block_hashes:
+        print(colors.FAIL+"Error: Reorg is deeper than "+str(REORG_DEPTH)+" blocks, only rolling back to block "+str(block_number)+colors.END)
+    return block_number
+
+def follow_blocks(w3, analyze_block, rollback_blocks, from_block=None, depth=REORG_DEPTH, poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES):
+    # Analyze every new head as soon as it is available, on a reorg the orphaned blocks are rolled back and analyzed again.
+    # analyze_block(block_range) returns (execution time, success), failed blocks are retried before the head moves on.
+    block_hashes = collections.OrderedDict()
+    next_block = None if from_block == None else from_block
+    retries = 0
+    while True:
+        try:
+            head = w3.eth.block_number
+        except Exception as e:
+            print(colors.FAIL+"Error: "+str(e)+" @ head"+colors.END)
+            time.sleep(poll_interval)
+            continue
+        if next_block == None:
+            next_block = head
+        if next_block > head:
+            time.sleep(poll_interval)
+            continue
+        block = get_block(w3, next_block)
+        if block == None:
+            time.sleep(poll_interval)
+            continue
+        if next_block-1 in block_hashes and block["parentHash"] != block_hashes[next_block-1]:
+            orphaned_block = find_orphaned_block(w3, block_hashes, next_block-1)
+            if orphaned_block == None:
+                time.sleep(poll_interval)
+                continue
+            print(colors.FAIL+"Reorg detected: rolling back blocks "+str(orphaned_block)+"-"+str(next_block-1)+colors.END)
+            rollback_blocks(orphaned_block, next_block-1)
+            for block_number in range(orphaned_block, next_block):
+                block_hashes.pop(block_number, None)
+            next_block = orphaned_block
+            retries = 0
+            continue
+
+        execution_time, success = analyze_block((next_block, next_block))
+        if not success:
+            retries += 1
+            if retries <= max_retries:
+                print(colors.FAIL+"Analysis of block "+str(next_block)+" failed, retrying ("+str(retries)+"/"+str(max_retries)+")"+colors.END)
+                time.sleep(poll_interval)
+                continue
+            print(colors.FAIL+"Error: Skipping block "+str(next_block)+" after "+str(max_retries)+" retries, it has no status row and is analyzed again by a range run"+colors.END)
+
+        # The block might have been replaced while it was analyzed, in that case its results are from an unknown fork
+        current_block = get_block(w3, next_block)
+        if current_block == None or current_block["hash"] != block["hash"]:
+            print(colors.FAIL+"Block "+str(next_block)+" was replaced during the analysis or could not be checked, rolling it back"+colors.END)
+            rollback_blocks(next_block, next_block)
+            retries = 0
+            continue
+
+        block_hashes[next_block] = block["hash"]
+        while len(block_hashes) > depth:
+            block_hashes.popitem(last=False)
+        next_block += 1
+        retries = 0
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import aiohttp
+import concurrent.futures
+
+from utils.utils import colors
+
+POLL_INTERVAL = 0.002
+
+# Number of pending transactions that are fetched at the same time
+MAX_CONCURRENT_FETCHES = 64
+
+# Backoff in seconds while the pending transaction filter cannot be created, doubled after each failure up to MAX_RETRY_INTERVAL
+RETRY_INTERVAL = 0.1
+MAX_RETRY_INTERVAL = 5
+
+async def rpc_request(session, endpoint_uri, method, params):
+    async with session.post(endpoint_uri, json={"jsonrpc": "2.0", "method": method, "params": params, "id": 1}) as response:
+        data = await response.json(content_type=None)
+    if "error" in data:
+        raise Exception(data["error"]["message"] if isinstance(data["error"], dict) else data["error"])
+    return data["result"]
+
+async def new_pending_transaction_filter(session, endpoint_uri):
+    # Retried until the node is reachable again, hence an outage pauses the attacker instead of stopping it
+    retry_interval = RETRY_INTERVAL
+    while True:
+        try:
+            return await rpc_request(session, endpoint_uri, "eth_newPendingTransactionFilter", [])
+        except Exception as e:
+            print(colors.FAIL+"Error: "+str(e)+", retrying to create a pending transaction filter in "+str(retry_interval)+" seconds"+colors.END)
+            await asyncio.sleep(retry_interval)
+            retry_interval = min(retry_interval * 2, MAX_RETRY_INTERVAL)
+
+def parse_transaction(transaction):
+    # Convert the quantities of a JSON-RPC transaction to integers, addresses are lower case and the input stays a hex string
+    for key in ["gas", "gasPrice", "maxFeePerGas", "maxPriorityFeePerGas", "nonce", "value"]:
+        if key in transaction and transaction[key] != None:
+            transaction[key] = int(transaction[key], 16)
+    for key in ["from", "to"]:
+        if key in transaction and transaction[key] != None:
+            transaction[key] = transaction[key].lower()
+    return transaction
+
+def mark(timings, stage):
+    # Record when a pending transaction reached a stage of the pipeline, only the first time is kept
+    if timings != None and not stage in timings:
+        timings[stage] = time.perf_counter()
+
+def format_timings(timings):
+    return ", ".join([stage+" after "+str(round((timings[stage]-timings["seen"])*1000, 2))+" ms" for stage in timings if stage != "seen"])
+
+async def handle_pending_transaction(session, endpoint_uri, transaction_hash, timings, decode, attack, semaphore, executor):
+    try:
+        async with semaphore:
+            transaction = await rpc_request(session, endpoint_uri, "eth_getTransactionByHash", [transaction_hash])
+        # The transaction might have been dropped or replaced in the meantime
+        if transaction == None:
+            return
+        mark(timings, "fetched")
+        victim = decode(parse_transaction(transaction))
+        if victim == None:
+            return
+        mark(timings, "decoded")
+        await asyncio.get_running_loop().run_in_executor(executor, attack, victim, timings)
+        if "submitted" in timings:
+            print("Pending transaction "+colors.INFO+transaction_hash+colors.END+" seen, "+format_timings(timings))
+    except Exception as e:
+        print(colors.FAIL+"Error: "+str(e)+" @ pending transaction: "+transaction_hash+colors.END)
+
+async def follow_pending_transactions(endpoint_uri, decode, attack, on_filter_created=None, poll_interval=POLL_INTERVAL, max_concurrent_fetches=MAX_CONCURRENT_FETCHES, max_concurrent_attacks=1):
+    # Every new pending transaction is handled in its own task: transactions are fetched concurrently, decode(transaction) runs on
+    # the event loop and has to be cheap, it returns None for transactions that are not of interest. attack(victim, timings) takes
+    # the profitability decision and sends the attack in an executor, hence polling never waits for RPC calls of an attack.
+    # Attacks call mark(timings, stage) (e.g. "decided", "submitted"), timings are relative to when the hash was seen.
+    # on_filter_created is called once the node tracks pending transactions for us, e.g. to send a victim transaction.
+    semaphore = asyncio.Semaphore(max_concurrent_fetches)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent_attacks)
+    tasks = set()
+    async with aiohttp.ClientSession() as session:
+        filter_id = await new_pending_transaction_filter(session, endpoint_uri)
+        if on_filter_created != None:
+            await asyncio.get_running_loop().run_in_executor(None, on_filter_created)
+        while True:
+            try:
+                transaction_hashes = await rpc_request(session, endpoint_uri, "eth_getFilterChanges", [filter_id])
+            except Exception as e:
+                # Nodes remove filters that are not polled for a while, e.g. after a connection loss
+                print(colors.FAIL+"Error: "+str(e)+", creating a new pending transaction filter"+colors.END)
+                filter_id = await new_pending_transaction_filter(session, endpoint_uri)
+                continue
+            seen = time.perf_counter()
+            for transaction_hash in transaction_hashes:
+                task = asyncio.create_task(handle_pending_transaction(session, endpoint_uri, transaction_hash, {"seen": seen}, decode, attack, semaphore, executor))
+                # The event loop only keeps weak references to tasks
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.sleep(poll_interval)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+from utils.utils import colors
+
+# Sync(uint112,uint112) of Uniswap V2 pairs and Sync(uint256,uint256) of Solidly/Velodrome pairs, both log the new reserves
+SYNC_EVENTS = ['0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1', '0xcf2aa50876cdfbb541206f89af0ee78d44a2abf8d328e37fa4917f982149848a']
+
+POLL_INTERVAL = 0.1
+
+class ReserveTracker:
+    # Keeps the reserves of a constant product pair current in memory from its Sync events, which every swap, mint and burn emits,
+    # hence profitability decisions do not need any RPC call. Reserves are tagged with the block they are valid for.
+    def __init__(self, w3, pair, poll_interval=POLL_INTERVAL):
+        self.w3 = w3
+        self.pair = pair
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.reserves = None
+        self.position = None
+        self.filter = None
+        self.sync()
+        threading.Thread(target=self.follow, daemon=True).start()
+
+    def sync(self):
+        # The node would keep an abandoned filter until it times out
+        if self.filter != None:
+            try:
+                self.w3.eth.uninstall_filter(self.filter.filter_id)
+            except Exception:
+                pass
+        # The filter is created before the reserves are read, so that no Sync event in between is missed
+        self.filter = self.w3.eth.filter({"address": self.pair.address, "topics": [SYNC_EVENTS]})
+        block_number = self.w3.eth.block_number
+        reserves = self.pair.functions.getReserves().call(block_identifier=block_number)
+        # The state that was read replaces the tracked one even if it is older, e.g. after a reorg or from a lagging node
+        with self.lock:
+            self.reserves = [reserves[0], reserves[1]]
+            self.position = (block_number, float('inf'))
+
+    def update(self, reserves, position):
+        # Logs might be delivered twice or after a newer state was read, only the latest (block, log index) is kept
+        with self.lock:
+            if self.position == None or position > self.position:
+                self.reserves = reserves
+                self.position = position
+
+    def follow(self):
+        while True:
+            try:
+                reorganized = False
+                for log in self.filter.get_new_entries():
+                    # Logs of blocks that were reorganized out are delivered again with removed set, they must not be applied
+                    if log.get('removed', False):
+                        reorganized = True
+                        continue
+                    data = bytes.fromhex(log['data'][2:]) if isinstance(log['data'], str) else bytes(log['data'])
+                    reserves = [int.from_bytes(data[0:32], 'big'), int.from_bytes(data[32:64], 'big')]
+                    self.update(reserves, (log['blockNumber'], log['logIndex']))
+                # The reserves might stem from a removed log, hence they are read again from the canonical chain
+                if reorganized:
+                    self.sync()
+            except Exception as e:
+                # Nodes remove filters that are not polled for a while, the reserves are read again as events might have been missed
+                print(colors.FAIL+"Error: "+str(e)+", resyncing reserves of "+self.pair.address+colors.END)
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(colors.FAIL+"Error: "+str(e)+" @ pair: "+self.pair.address+colors.END)
+            time.sleep(self.poll_interval)
+
+    def get(self):
+        with self.lock:
+            return list(self.reserves), self.position[0]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+
+# The search stops once the front-run input is known up to this many token units
+SEARCH_PRECISION = 10
+
+def sandwich_profit(pool, buffer, frontrun_in, victim_in, min_out, tokenIndexFrom, tokenIndexTo):
+    # Simulate front-run, victim and back-run on the buffer, the profit is -inf if the victim would revert due to its slippage
+    buffer.load(pool)
+    frontrun_out = buffer.swap(tokenIndexFrom, tokenIndexTo, frontrun_in)
+    if buffer.swap(tokenIndexFrom, tokenIndexTo, victim_in) < min_out:
+        return -math.inf
+    return buffer.swap(tokenIndexTo, tokenIndexFrom, frontrun_out) - frontrun_in
+
+def optimal_frontrun(pool, victim_in, min_out, budget, tokenIndexFrom=1, tokenIndexTo=0):
+    # Integer ternary search over the front-run input in [1, budget]. The pool is never modified, every probe is simulated on the same
+    # preallocated buffer that is reset to the pool state, hence no state is copied per probe.
+    buffer = pool.copy()
+    left, right = 1, budget
+    while abs(left-right) > SEARCH_PRECISION:
+        left_third = (2*left+right)//3
+        right_third = (left+2*right)//3
+        if sandwich_profit(pool, buffer, left_third, victim_in, min_out, tokenIndexFrom, tokenIndexTo) < sandwich_profit(pool, buffer, right_third, victim_in, min_out, tokenIndexFrom, tokenIndexTo):
+            left = left_third
+        else:
+            right = right_third
+    return (left+right)//2
+
+def simulate_budgets(pool, victim_in, min_out, budgets, tokenIndexFrom=1, tokenIndexTo=0):
+    # Optimal sandwich for every budget as (front-run input, victim output, profit). The profit is unimodal in the front-run input,
+    # hence the optimum of a budget is the optimum of the largest budget clamped to that budget. The optimum is searched once and
+    # every distinct front-run is simulated once on the same buffer, which is reset to the pool state before the victim transaction.
+    if len(budgets) == 0:
+        return list()
+    optimum = optimal_frontrun(pool, victim_in, min_out, max(budgets), tokenIndexFrom, tokenIndexTo)
+    buffer = pool.copy()
+    simulations = dict()
+    results = list()
+    for budget in budgets:
+        frontrun_in = min(budget, optimum)
+        if frontrun_in > 10:
+            if not frontrun_in in simulations:
+                buffer.load(pool)
+                frontrun_out = buffer.swap(tokenIndexFrom, tokenIndexTo, frontrun_in)
+                victim_out = buffer.swap(tokenIndexFrom, tokenIndexTo, victim_in)
+                # Standard back-run, it swaps back the output of the front-run
+                backrun_out = buffer.swap(tokenIndexTo, tokenIndexFrom, frontrun_out)
+                simulations[frontrun_in] = (victim_out, backrun_out - frontrun_in)
+            results.append((frontrun_in,) + simulations[frontrun_in])
+        else:
+            results.append((frontrun_in, 0, 0))
+    return results
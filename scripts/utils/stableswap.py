@@ -7,13 +7,20 @@ import datetime
 import time
 from eth_abi import abi
 import math
-import copy
 import os
 import sys
+import pymongo
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
 from utils.settings import *
+from utils.utils import encode_call, multicall
+
+# Hop pools have at most this many tokens
+MAX_TOKENS = 10
+
+# Tokens and decimals of a pool never change, they are cached per process (and in Mongo across runs)
+pool_tokens = dict()
 
 def get_data_swap(w3,hop_contract, block_identifier='latest'):
     tokens = list()
@@ -64,73 +71,69 @@ def get_data_swap(w3,hop_contract, block_identifier='latest'):
 
     return [xp,swapStorage,A_Precise]
 
+def get_data_swap_cached(w3, mongo_connection, network, pool_address, block_number):
+    # Same result as get_data_swap, but the pool state is fetched with a single Multicall3 call and cached. Tokens and decimals are
+    # cached forever, balances, fee and A per (pool, block), so that simulating the same pool state again costs no RPC call.
+    if not pool_address in pool_tokens:
+        pool_tokens[pool_address] = mongo_connection[network]["stableswap_pools"].find_one({"pool": pool_address})
+    static = pool_tokens[pool_address]
+    snapshot = mongo_connection[network]["stableswap_snapshots"].find_one({"pool": pool_address, "block_number": block_number})
 
-def _ternarySearch(left,right,amountMin,victimIn,**kwargs):
-    
-    # return if good enough
-    if abs(left-right) <= 1 * 10**1:
-        return (left+right)//2
-    
-    #calculate the thirds bounds
-    left_third = (2*left+right)//3
-    right_third= (left+2*right)//3
-    
-    #copy original xp once, store
-    xp_copy = kwargs['xp'].copy()
-    kwargs_copy = copy.deepcopy(kwargs)
-
+    if snapshot == None:
+        num_tokens = MAX_TOKENS if static == None else len(static["tokens"])
+        calls  = [(pool_address, encode_call("getToken(uint8)", [i])) for i in range(num_tokens)]
+        calls += [(pool_address, encode_call("getTokenBalance(uint8)", [i])) for i in range(num_tokens)]
+        calls += [(pool_address, encode_call("swapStorage()")), (pool_address, encode_call("getAPrecise()"))]
+        results = multicall(w3, calls, block_number)
 
-    #execute frontrun trade first
-    kwargs['dx'] = left_third
-    l = _calculateSwapWithChanges(**kwargs)
-    
-    #execute victim trade second
-    kwargs['dx'] = victimIn
-    victimOutL = _calculateSwapWithChanges(**kwargs)
-    
-    profitLEFT= -math.inf
-    
-    #only do calulations if we dont split the target too much
-    if victimOutL >= amountMin:
-        #execute backrun transaction
-        kwargs['dx'] = l; kwargs['tokenIndexTo'] = 1; kwargs['tokenIndexFrom'] = 0; kwargs['X_TOKEN_PRECISION'] = kwargs['swapStorage']['tokenPrecisionMultipliers'][0]
-        backrunFinalAmountLeft = _calculateSwapWithChanges(**kwargs)
-        #caclulate profit Left
-        profitLEFT = backrunFinalAmountLeft - left_third
-    
-    
-    #now the same for the right side
-    
-    kwargs = copy.deepcopy(kwargs_copy)
-    
-    #execute frontrun trade first FOR RIGHT VALUE
-    kwargs['dx'] = right_third
-    r = _calculateSwapWithChanges(**kwargs)
-    
-    #execute victim trade second
-    kwargs['dx'] = victimIn
-    victimOutR = _calculateSwapWithChanges(**kwargs)
-    
-    profitRight= -math.inf
-    
-    #only do calulations if we dont split the target too much
-    if victimOutR >= amountMin:
-        #execute backrun transaction
-        kwargs['dx'] = r; kwargs['tokenIndexTo'] = 1; kwargs['tokenIndexFrom'] = 0; kwargs['X_TOKEN_PRECISION'] = kwargs['swapStorage']['tokenPrecisionMultipliers'][0]
-        backrunFinalAmountRight = _calculateSwapWithChanges(**kwargs)
-        
-        #caclulate profit Left
-        profitRight = backrunFinalAmountRight - right_third 
-    
-    
-    kwargs = kwargs_copy
-    
-    if profitLEFT < profitRight:
-        return _ternarySearch(left_third, right,amountMin,victimIn,**kwargs_copy)
-    else:
-        return _ternarySearch(left, right_third,amountMin,victimIn,**kwargs_copy)
+        if static == None:
+            # The pool has as many tokens as getToken calls succeed
+            tokens = list()
+            for result in results[:num_tokens]:
+                if result == "0x":
+                    break
+                tokens.append(Web3.toChecksumAddress("0x"+result[-40:]))
+            tokens_decimals = [int(result, 16) if result != "0x" else 18 for result in multicall(w3, [(token, encode_call("decimals()")) for token in tokens], block_number)]
+            static = {"pool": pool_address, "tokens": tokens, "decimals": tokens_decimals}
+            collection = mongo_connection[network]["stableswap_pools"]
+            try:
+                collection.insert_one(static)
+            except pymongo.errors.DuplicateKeyError:
+                pass
+            # Indexing...
+            if 'pool_1' not in collection.index_information():
+                collection.create_index('pool', unique=True)
+            pool_tokens[pool_address] = static
 
+        balances = results[num_tokens:num_tokens+len(static["tokens"])]
+        if "0x" in balances:
+            return -1
+        if results[-2] == "0x":
+            return -2
+        if results[-1] == "0x":
+            return -3
+        # The public getter of swapStorage returns initialA, futureA, initialATime, futureATime, swapFee, adminFee and lpToken
+        snapshot = {
+            "pool": pool_address,
+            "block_number": block_number,
+            "balances": [str(int(balance, 16)) for balance in balances],
+            "swap_fee": str(int(results[-2].replace("0x", "")[4*64:5*64], 16)),
+            "a_precise": str(int(results[-1], 16))
+        }
+        collection = mongo_connection[network]["stableswap_snapshots"]
+        try:
+            collection.insert_one(snapshot)
+        except pymongo.errors.DuplicateKeyError:
+            pass
+        # Indexing...
+        if 'pool_1_block_number_1' not in collection.index_information():
+            collection.create_index([('pool', pymongo.ASCENDING), ('block_number', pymongo.ASCENDING)], unique=True)
 
+    xp = [int(balance) * (10 ** (18-static["decimals"][i])) for i, balance in enumerate(snapshot["balances"])]
+    swapStorage = dict()
+    swapStorage['swapFee'] = int(snapshot["swap_fee"])
+    swapStorage['tokenPrecisionMultipliers'] = [18-x for x in static["decimals"]]
+    return [xp,swapStorage,int(snapshot["a_precise"])]
 
 
 '''
@@ -191,10 +194,11 @@ def _calculateSwap(swapStorage,tokenIndexFrom,tokenIndexTo,dx,xp,X_TOKEN_PRECISI
     return dy
 
 
-def getY(swapStorage,tokenIndexFrom,tokenIndexTo,x,xp,A_Precise,A_PRECISION):
+def getY(swapStorage,tokenIndexFrom,tokenIndexTo,x,xp,A_Precise,A_PRECISION,d=None):
     numTokens = len(xp)
     a = A_Precise
-    d = getD(xp,a,A_PRECISION)  
+    if d == None:
+        d = getD(xp,a,A_PRECISION)
     c = d
     s = 0
     nA = numTokens * a
@@ -263,3 +267,47 @@ def getD(xp, a, A_PRECISION):
       
     return -1
 
+
+class StableSwapPool:
+    # Simulation state of a Hop (Saddle) StableSwap pool. D only depends on the balances, so it is computed at most once per state
+    # and shared with copies of that state, e.g., every front-run probe starts from the same pre-victim balances.
+    # Swaps use the same integer math as _calculateSwapWithChanges, hence results are identical to the contract.
+    __slots__ = ("xp", "swap_fee", "multipliers", "a", "d")
+
+    def __init__(self, xp, swapStorage, A_Precise):
+        self.xp = list(xp)
+        self.swap_fee = swapStorage['swapFee']
+        self.multipliers = [10 ** precision for precision in swapStorage['tokenPrecisionMultipliers']]
+        self.a = A_Precise
+        self.d = None
+
+    def copy(self):
+        pool = StableSwapPool.__new__(StableSwapPool)
+        pool.xp = self.xp.copy()
+        pool.swap_fee = self.swap_fee
+        pool.multipliers = self.multipliers
+        pool.a = self.a
+        pool.d = self.d
+        return pool
+
+    def load(self, pool):
+        # Reset to the state of another pool without allocating, D of that state is computed there so that it is shared
+        self.xp[:] = pool.xp
+        self.d = pool.get_d()
+
+    def get_d(self):
+        if self.d == None:
+            self.d = getD(self.xp, self.a, 100)
+        return self.d
+
+    def swap(self, tokenIndexFrom, tokenIndexTo, dx):
+        xp = self.xp
+        x = dx * self.multipliers[tokenIndexFrom] + xp[tokenIndexFrom]
+        y = getY(None, tokenIndexFrom, tokenIndexTo, x, xp, self.a, 100, self.get_d())
+        dy = xp[tokenIndexTo] - y - 1
+        dyFee = dy * self.swap_fee // 10**10
+        xp[tokenIndexFrom] = x
+        xp[tokenIndexTo] = y + dyFee + 1
+        # The balances changed, D of the new state is only computed if another swap is simulated on it
+        self.d = None
+        return (dy - dyFee) // self.multipliers[tokenIndexTo]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import requests
+
+from utils.utils import batch_call
+
+# Number of blocks probed per round, each round is sent as a single JSON-RPC batch
+SEARCH_WIDTH = 8
+
+def search_first_block(w3, to, data, blocks, decode, is_match, session=None):
+    # Search the first block of the trailing run of blocks in which is_match holds for the decoded call result.
+    # The run is assumed not to be interrupted, so every round narrows the range between the last non-matching and the
+    # first matching block, which takes O(log(len(blocks))) rounds instead of calling every block.
+    # Returns (None, None) if the newest block does not match or no non-matching block precedes the run.
+    if session == None:
+        session = requests.Session()
+    blocks = sorted(blocks)
+    values = dict()
+    lower, upper = None, None
+    while True:
+        candidates = [block for block in blocks if (lower == None or block > lower) and (upper == None or block < upper)]
+        if len(candidates) == 0:
+            break
+        if len(candidates) <= SEARCH_WIDTH:
+            probes = candidates
+        else:
+            probes = [candidates[int((i+1)*len(candidates)/(SEARCH_WIDTH+1))] for i in range(SEARCH_WIDTH)]
+            # The newest block has to be checked first, there is no run without it
+            if upper == None:
+                probes[-1] = candidates[-1]
+        pending = [block for block in probes if not block in values]
+        results = batch_call(w3, [(to, data, block) for block in pending], session=session)
+        for block, result in zip(pending, results):
+            if result == "0x":
+                blocks.remove(block)
+                continue
+            try:
+                values[block] = decode(bytes.fromhex(result.replace("0x", "")))
+            except:
+                blocks.remove(block)
+        probes = [block for block in probes if block in values]
+        if upper == None:
+            if not candidates[-1] in values:
+                continue
+            if not is_match(values[candidates[-1]]):
+                return None, None
+        for block in probes:
+            if not is_match(values[block]) and (lower == None or block > lower):
+                lower = block
+        for block in probes:
+            if is_match(values[block]) and (lower == None or block > lower) and (upper == None or block < upper):
+                upper = block
+                break
+    if lower == None or upper == None:
+        return None, None
+    return upper, values[upper]
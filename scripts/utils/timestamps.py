@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import fcntl
+import numpy
+import requests
+
+from web3 import Web3
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.utils import colors
+
+TIMESTAMPS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# Tables grow in steps of one million blocks (4 MB), so that they are not remapped for every new block
+GROWTH_STEP = 1000000
+
+BATCH_SIZE = 1000
+
+block_timestamps = dict()
+
+def get_timestamps_path(network):
+    return os.path.join(TIMESTAMPS_DIRECTORY, "block_timestamps_"+network+".bin")
+
+def open_block_timestamps(network, block_number=0):
+    # Timestamps are stored as a dense little-endian uint32 array indexed by block number, unknown blocks are 0
+    path = get_timestamps_path(network)
+    with open(path, "ab") as f:
+        # Workers of the same network share the file, only one of them may grow it at a time
+        fcntl.flock(f, fcntl.LOCK_EX)
+        if os.path.getsize(path) <= block_number*4:
+            os.ftruncate(f.fileno(), (block_number // GROWTH_STEP + 1) * GROWTH_STEP * 4)
+        fcntl.flock(f, fcntl.LOCK_UN)
+    block_timestamps[network] = numpy.memmap(path, dtype=numpy.dtype("<u4"), mode="r+")
+    return block_timestamps[network]
+
+def fetch_block_timestamps(w3, block_numbers, session=None):
+    # Fetch the headers of several blocks with JSON-RPC batch requests
+    timestamps = dict()
+    if session == None:
+        session = requests.Session()
+    for i in range(0, len(block_numbers), BATCH_SIZE):
+        batch = block_numbers[i:i+BATCH_SIZE]
+        try:
+            res = session.post(w3.provider.endpoint_uri, json=[{
+                "jsonrpc": "2.0",
+                "method": "eth_getBlockByNumber",
+                "params": [hex(block_number), False],
+                "id": j
+            } for j, block_number in enumerate(batch)])
+            if res.status_code == 200 and isinstance(res.json(), list):
+                for data in res.json():
+                    if "result" in data and data["result"] != None:
+                        timestamps[batch[data["id"]]] = int(data["result"]["timestamp"], 16)
+        except Exception as e:
+            print(colors.FAIL+"Error: Could not retrieve block headers in batch: "+str(e)+colors.END)
+    # Fall back to single requests for everything the batches did not return (e.g. batching not supported by the provider)
+    for block_number in block_numbers:
+        if not block_number in timestamps:
+            timestamps[block_number] = w3.eth.get_block(block_number)["timestamp"]
+    return timestamps
+
+def get_block_timestamps(w3, network, block_numbers, session=None):
+    if len(block_numbers) == 0:
+        return dict()
+    if not network in block_timestamps or len(block_timestamps[network]) <= max(block_numbers):
+        open_block_timestamps(network, max(block_numbers))
+    table = block_timestamps[network]
+    missing = sorted(set([block_number for block_number in block_numbers if table[block_number] == 0]))
+    if len(missing) > 0:
+        fetched = fetch_block_timestamps(w3, missing, session)
+        for block_number in fetched:
+            table[block_number] = fetched[block_number]
+    return {block_number: int(table[block_number]) for block_number in block_numbers}
+
+def get_block_timestamp(w3, network, block_number, session=None):
+    return get_block_timestamps(w3, network, [block_number], session)[block_number]
+
+def fill_block_timestamps(w3, network, from_block, to_block, session=None):
+    if session == None:
+        session = requests.Session()
+    for block_number in range(from_block, to_block+1, BATCH_SIZE):
+        get_block_timestamps(w3, network, list(range(block_number, min(block_number+BATCH_SIZE-1, to_block)+1)), session)
+    block_timestamps[network].flush()
+
+def main():
+    from utils.settings import ETHEREUM_PROVIDER, ARBITRUM_PROVIDER, OPTIMISM_PROVIDER, ZKSYNC_PROVIDER
+    providers = {"ethereum": ETHEREUM_PROVIDER, "arbitrum": ARBITRUM_PROVIDER, "optimism": OPTIMISM_PROVIDER, "zksync": ZKSYNC_PROVIDER}
+
+    if len(sys.argv) != 3 or not sys.argv[1].lower() in providers:
+        print(colors.FAIL+"Error: Please provide a network and a block range: 'python3 "+sys.argv[0]+" <ethereum|arbitrum|optimism|zksync> <BLOCK_RANGE_START>:<BLOCK_RANGE_END>'"+colors.END)
+        sys.exit(-1)
+    if not ":" in sys.argv[2]:
+        print(colors.FAIL+"Error: Please provide a valid block range: 'python3 "+sys.argv[0]+" <ethereum|arbitrum|optimism|zksync> <BLOCK_RANGE_START>:<BLOCK_RANGE_END>'"+colors.END)
+        sys.exit(-2)
+    network = sys.argv[1].lower()
+    block_range_start, block_range_end = sys.argv[2].split(":")[0], sys.argv[2].split(":")[1]
+    if not block_range_start.isnumeric() or not block_range_end.isnumeric():
+        print(colors.FAIL+"Error: Please provide integers as block range: 'python3 "+sys.argv[0]+" <ethereum|arbitrum|optimism|zksync> <BLOCK_RANGE_START>:<BLOCK_RANGE_END>'"+colors.END)
+        sys.exit(-3)
+    block_range_start, block_range_end = int(block_range_start), int(block_range_end)
+
+    w3 = Web3(providers[network])
+    from web3.middleware import geth_poa_middleware
+    w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+    start = time.time()
+    session = requests.Session()
+    for block_number in range(block_range_start, block_range_end+1, BATCH_SIZE*100):
+        fill_block_timestamps(w3, network, block_number, min(block_number+BATCH_SIZE*100-1, block_range_end), session)
+        print("Filled block timestamps up to block "+colors.INFO+str(min(block_number+BATCH_SIZE*100-1, block_range_end))+colors.END)
+    end = time.time()
+    print("Total execution time: "+colors.INFO+str(end - start)+colors.END)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+
+# Amount that is encoded into templates and replaced at trigger time, it is unlikely to appear anywhere else in the calldata
+AMOUNT_PLACEHOLDER = int("a5"*32, 16)
+
+class NonceManager:
+    # Hands out the nonces of accounts per chain locally, so that sending a transaction does not wait for get_transaction_count
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.providers = dict()
+        self.nonces = dict()
+
+    def track(self, w3, chain_id, address):
+        with self.lock:
+            self.providers[(chain_id, address)] = w3
+            self.nonces[(chain_id, address)] = w3.eth.get_transaction_count(address, 'pending')
+
+    def reserve(self, chain_id, address, count=1):
+        # Returns the first of count consecutive nonces
+        with self.lock:
+            nonce = self.nonces[(chain_id, address)]
+            self.nonces[(chain_id, address)] += count
+        return nonce
+
+    def resync(self):
+        # Reserved nonces of transactions that were never accepted leave a gap, hence the nodes are asked again
+        with self.lock:
+            for (chain_id, address), w3 in self.providers.items():
+                self.nonces[(chain_id, address)] = w3.eth.get_transaction_count(address, 'pending')
+
+class TransactionTemplate:
+    # A transaction that is built once with AMOUNT_PLACEHOLDER as amount, only the amount, the nonce and the gas are filled in later
+    def __init__(self, transaction):
+        self.transaction = dict(transaction)
+        data = self.transaction['data']
+        placeholder = "%064x" % AMOUNT_PLACEHOLDER
+        self.offset = data.find(placeholder)
+        if self.offset == -1 or data.find(placeholder, self.offset+1) != -1:
+            raise Exception("Transaction template has to contain the amount placeholder exactly once")
+
+    def fill(self, amount, nonce, gas, gas_price):
+        transaction = dict(self.transaction)
+        data = transaction['data']
+        transaction['data'] = data[:self.offset] + "%064x" % amount + data[self.offset+64:]
+        transaction['nonce'] = nonce
+        transaction['gas'] = gas
+        transaction['gasPrice'] = gas_price
+        return transaction
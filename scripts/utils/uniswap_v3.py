@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import eth_abi
+import pymongo
+import requests
+
+from web3 import Web3
+
+from utils.utils import batch_call, encode_call, toSigned256
+
+'''
+Uniswap V3 swap simulation with the integer math of the core contracts (TickMath, SqrtPriceMath, SwapMath and TickBitmap),
+hence simulated amounts are identical to the amounts of the pool. Only exact input swaps are simulated, protocol fees are ignored
+as they do not change the amounts of a swap.
+'''
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+Q96 = 1 << 96
+MAX_UINT256 = (1 << 256) - 1
+FEE_DENOMINATOR = 10**6
+
+TICK_RATIOS = [
+    0xfff97272373d413259a46990580e213a,
+    0xfff2e50f5f656932ef12357cf3c7fdcc,
+    0xffe5caca7e10e4e61c3624eaa0941cd0,
+    0xffcb9843d60f6159c9db58835c926644,
+    0xff973b41fa98c081472e6896dfb254c0,
+    0xff2ea16466c96a3843ec78b326b52861,
+    0xfe5dee046a99a2a811c461f1969c3053,
+    0xfcbe86c7900a88aedcffc83b479aa3a4,
+    0xf987a7253ac413176f2b074cf7815e54,
+    0xf3392b0822b70005940c7a398e4b70f3,
+    0xe7159475a2c29b7443b29c7fa6e889d9,
+    0xd097f3bdfd2022b8845ad8f792aa5825,
+    0xa9f746462d870fdf8a65dc1f90e061e5,
+    0x70d869a156d2a1b890bb3df62baf32f7,
+    0x31be135f97d08fd981231505542fcfa6,
+    0x9aa508b5b7a84e1c677de54f3e99bc9,
+    0x5d6af8dedb81196699c329225ee604,
+    0x2216e584f5fa1ea926041bedfe98,
+    0x48a170391f7dc42444e8fa2
+]
+
+# Exact input swaps of the Uniswap V3 routers on a single pool. exactInputSingle takes a static struct of (tokenIn, tokenOut, fee, ...),
+# given as number of words and index of amountOutMinimum. exactInput takes a path, only paths of a single pool are decoded, since
+# the minimum output of a longer path bounds the output of its last pool.
+EXACT_INPUT_SINGLE = {
+    "414bf389": (8, 6), # SwapRouter exactInputSingle((address,address,uint24,address,uint256,uint256,uint256,uint160))
+    "04e45aaf": (7, 5)  # SwapRouter02 exactInputSingle((address,address,uint24,address,uint256,uint256,uint160))
+}
+EXACT_INPUT = {
+    "c04b8d59": "(bytes,address,uint256,uint256,uint256)", # SwapRouter exactInput((bytes,address,uint256,uint256,uint256))
+    "b858183f": "(bytes,address,uint256,uint256)"          # SwapRouter02 exactInput((bytes,address,uint256,uint256))
+}
+
+def mulDivRoundingUp(a, b, denominator):
+    result = a * b // denominator
+    if a * b % denominator > 0:
+        result += 1
+    return result
+
+def divRoundingUp(x, y):
+    return x // y + (1 if x % y > 0 else 0)
+
+def getSqrtRatioAtTick(tick):
+    absTick = abs(tick)
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if absTick & 0x1 != 0 else 0x100000000000000000000000000000000
+    for i, tick_ratio in enumerate(TICK_RATIOS):
+        if absTick & (0x2 << i) != 0:
+            ratio = (ratio * tick_ratio) >> 128
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+def getTickAtSqrtRatio(sqrtPriceX96):
+    # Greatest tick whose ratio is less than or equal to the price, the contract computes the same tick with a log2 approximation
+    lower, upper = MIN_TICK, MAX_TICK
+    while lower < upper:
+        middle = (lower + upper + 1) // 2
+        if getSqrtRatioAtTick(middle) <= sqrtPriceX96:
+            lower = middle
+        else:
+            upper = middle - 1
+    return lower
+
+def getAmount0Delta(sqrtRatioAX96, sqrtRatioBX96, liquidity, roundUp):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = sqrtRatioBX96, sqrtRatioAX96
+    numerator1 = liquidity << 96
+    numerator2 = sqrtRatioBX96 - sqrtRatioAX96
+    if roundUp:
+        return divRoundingUp(mulDivRoundingUp(numerator1, numerator2, sqrtRatioBX96), sqrtRatioAX96)
+    return numerator1 * numerator2 // sqrtRatioBX96 // sqrtRatioAX96
+
+def getAmount1Delta(sqrtRatioAX96, sqrtRatioBX96, liquidity, roundUp):
+    if sqrtRatioAX96 > sqrtRatioBX96:
+        sqrtRatioAX96, sqrtRatioBX96 = sqrtRatioBX96, sqrtRatioAX96
+    if roundUp:
+        return mulDivRoundingUp(liquidity, sqrtRatioBX96 - sqrtRatioAX96, Q96)
+    return liquidity * (sqrtRatioBX96 - sqrtRatioAX96) // Q96
+
+def getNextSqrtPriceFromInput(sqrtPX96, liquidity, amountIn, zeroForOne):
+    if amountIn == 0:
+        return sqrtPX96
+    if zeroForOne:
+        # Rounding up, the contract falls back to a less precise formula if the product overflows
+        numerator1 = liquidity << 96
+        product = amountIn * sqrtPX96
+        if product <= MAX_UINT256 and numerator1 + product <= MAX_UINT256:
+            return mulDivRoundingUp(numerator1, sqrtPX96, numerator1 + product)
+        return divRoundingUp(numerator1, numerator1 // sqrtPX96 + amountIn)
+    # Rounding down
+    return sqrtPX96 + (amountIn << 96) // liquidity
+
+def computeSwapStep(sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, amountRemaining, feePips):
+    zeroForOne = sqrtRatioCurrentX96 >= sqrtRatioTargetX96
+    amountRemainingLessFee = amountRemaining * (FEE_DENOMINATOR - feePips) // FEE_DENOMINATOR
+    if zeroForOne:
+        amountIn = getAmount0Delta(sqrtRatioTargetX96, sqrtRatioCurrentX96, liquidity, True)
+    else:
+        amountIn = getAmount1Delta(sqrtRatioCurrentX96, sqrtRatioTargetX96, liquidity, True)
+    if amountRemainingLessFee >= amountIn:
+        sqrtRatioNextX96 = sqrtRatioTargetX96
+    else:
+        sqrtRatioNextX96 = getNextSqrtPriceFromInput(sqrtRatioCurrentX96, liquidity, amountRemainingLessFee, zeroForOne)
+    reached_target = sqrtRatioTargetX96 == sqrtRatioNextX96
+    if zeroForOne:
+        if not reached_target:
+            amountIn = getAmount0Delta(sqrtRatioNextX96, sqrtRatioCurrentX96, liquidity, True)
+        amountOut = getAmount1Delta(sqrtRatioNextX96, sqrtRatioCurrentX96, liquidity, False)
+    else:
+        if not reached_target:
+            amountIn = getAmount1Delta(sqrtRatioCurrentX96, sqrtRatioNextX96, liquidity, True)
+        amountOut = getAmount0Delta(sqrtRatioCurrentX96, sqrtRatioNextX96, liquidity, False)
+    if sqrtRatioNextX96 != sqrtRatioTargetX96:
+        # The remaining amount is exhausted, the rest of it is taken as fee
+        feeAmount = amountRemaining - amountIn
+    else:
+        feeAmount = mulDivRoundingUp(amountIn, feePips, FEE_DENOMINATOR - feePips)
+    return sqrtRatioNextX96, amountIn, amountOut, feeAmount
+
+def nextInitializedTickWithinOneWord(tick_bitmap, tick, tickSpacing, lte):
+    compressed = tick // tickSpacing
+    if lte:
+        wordPos, bitPos = compressed >> 8, compressed & 0xff
+        masked = tick_bitmap.get(wordPos, 0) & ((1 << bitPos) - 1 + (1 << bitPos))
+        initialized = masked != 0
+        if initialized:
+            return (compressed - (bitPos - (masked.bit_length() - 1))) * tickSpacing, True
+        return (compressed - bitPos) * tickSpacing, False
+    wordPos, bitPos = (compressed + 1) >> 8, (compressed + 1) & 0xff
+    masked = tick_bitmap.get(wordPos, 0) & (MAX_UINT256 ^ ((1 << bitPos) - 1))
+    initialized = masked != 0
+    if initialized:
+        return (compressed + 1 + ((masked & -masked).bit_length() - 1 - bitPos)) * tickSpacing, True
+    return (compressed + 1 + (0xff - bitPos)) * tickSpacing, False
+
+def get_complete_word_range(tick_spacing):
+    # Words of the tick bitmap that contain the ticks from MIN_TICK to MAX_TICK
+    return [(MIN_TICK // tick_spacing) >> 8, (MAX_TICK // tick_spacing) >> 8]
+
+class UniswapV3Pool:
+    # Simulation state of a Uniswap V3 pool. Only price, tick and active liquidity change during swaps, the tick bitmap, the net
+    # liquidity of the initialized ticks and the tokens with their decimals are shared between copies of a pool.
+    # The state might only contain the words of the tick bitmap in word_range, swaps then stop at the first tick outside of them.
+    __slots__ = ("sqrt_price_x96", "tick", "liquidity", "fee", "tick_spacing", "tick_bitmap", "liquidity_net", "tokens", "decimals", "word_range", "sqrt_price_limits_x96")
+
+    def __init__(self, snapshot):
+        # The snapshot is returned by get_data_uniswap_v3 or snapshot, numbers might be strings (e.g., ticks as keys of liquidity_net)
+        self.sqrt_price_x96 = int(snapshot["sqrt_price_x96"])
+        self.tick = int(snapshot["tick"])
+        self.liquidity = int(snapshot["liquidity"])
+        self.fee = int(snapshot["fee"])
+        self.tick_spacing = int(snapshot["tick_spacing"])
+        self.tokens = list(snapshot["tokens"])
+        self.decimals = [int(decimals) for decimals in snapshot["decimals"]]
+        self.liquidity_net = dict()
+        self.tick_bitmap = dict()
+        # Snapshots without a word range contain the complete tick bitmap
+        word_range = snapshot["word_range"] if "word_range" in snapshot else get_complete_word_range(self.tick_spacing)
+        self.add_words([int(word) for word in word_range], {int(tick): int(liquidity_net) for tick, liquidity_net in snapshot["liquidity_net"].items()})
+
+    def add_words(self, word_range, liquidity_net):
+        # Extend the state by the initialized ticks of the words that were read in addition, word_range includes the words read before
+        for tick in liquidity_net:
+            compressed = tick // self.tick_spacing
+            self.tick_bitmap[compressed >> 8] = self.tick_bitmap.get(compressed >> 8, 0) | (1 << (compressed & 0xff))
+            self.liquidity_net[tick] = liquidity_net[tick]
+        self.word_range = word_range
+        self.sqrt_price_limits_x96 = (
+            max(MIN_SQRT_RATIO + 1, getSqrtRatioAtTick(max(MIN_TICK, (word_range[0] << 8) * self.tick_spacing))),
+            min(MAX_SQRT_RATIO - 1, getSqrtRatioAtTick(min(MAX_TICK, ((word_range[1] + 1) << 8) * self.tick_spacing)))
+        )
+
+    def covers(self, tokenIndexFrom, amount_in=None):
+        # True if a swap of amount_in does not reach a tick outside of the words that were read, without amount_in the tick bitmap
+        # has to be complete in the direction of the swap
+        if self.word_range[tokenIndexFrom] == get_complete_word_range(self.tick_spacing)[tokenIndexFrom]:
+            return True
+        if amount_in == None:
+            return False
+        pool = self.copy()
+        pool.swap(tokenIndexFrom, 1 - tokenIndexFrom, amount_in)
+        return pool.sqrt_price_x96 != self.sqrt_price_limits_x96[tokenIndexFrom]
+
+    def snapshot(self):
+        return {
+            "sqrt_price_x96": str(self.sqrt_price_x96),
+            "tick": self.tick,
+            "liquidity": str(self.liquidity),
+            "fee": self.fee,
+            "tick_spacing": self.tick_spacing,
+            "liquidity_net": {str(tick): str(liquidity_net) for tick, liquidity_net in sorted(self.liquidity_net.items())},
+            "tokens": self.tokens,
+            "decimals": self.decimals,
+            "word_range": self.word_range
+        }
+
+    def copy(self):
+        pool = UniswapV3Pool.__new__(UniswapV3Pool)
+        pool.sqrt_price_x96 = self.sqrt_price_x96
+        pool.tick = self.tick
+        pool.liquidity = self.liquidity
+        pool.fee = self.fee
+        pool.tick_spacing = self.tick_spacing
+        pool.tick_bitmap = self.tick_bitmap
+        pool.liquidity_net = self.liquidity_net
+        pool.tokens = self.tokens
+        pool.decimals = self.decimals
+        pool.word_range = self.word_range
+        pool.sqrt_price_limits_x96 = self.sqrt_price_limits_x96
+        return pool
+
+    def load(self, pool):
+        self.sqrt_price_x96 = pool.sqrt_price_x96
+        self.tick = pool.tick
+        self.liquidity = pool.liquidity
+
+    def swap(self, tokenIndexFrom, tokenIndexTo, dx):
+        # Exact input swap without a price limit, once the price reaches the limit of the pool (or of the words that were read) the
+        # rest of the input is not swapped
+        zeroForOne = tokenIndexFrom == 0
+        sqrtPriceLimitX96 = self.sqrt_price_limits_x96[0 if zeroForOne else 1]
+        amountRemaining, amountOut = dx, 0
+        sqrtPriceX96, tick, liquidity = self.sqrt_price_x96, self.tick, self.liquidity
+        while amountRemaining != 0 and sqrtPriceX96 != sqrtPriceLimitX96:
+            sqrtPriceStartX96 = sqrtPriceX96
+            tickNext, initialized = nextInitializedTickWithinOneWord(self.tick_bitmap, tick, self.tick_spacing, zeroForOne)
+            tickNext = min(max(tickNext, MIN_TICK), MAX_TICK)
+            sqrtPriceNextX96 = getSqrtRatioAtTick(tickNext)
+            if (zeroForOne and sqrtPriceNextX96 < sqrtPriceLimitX96) or (not zeroForOne and sqrtPriceNextX96 > sqrtPriceLimitX96):
+                sqrtPriceTargetX96 = sqrtPriceLimitX96
+            else:
+                sqrtPriceTargetX96 = sqrtPriceNextX96
+            sqrtPriceX96, stepAmountIn, stepAmountOut, feeAmount = computeSwapStep(sqrtPriceX96, sqrtPriceTargetX96, liquidity, amountRemaining, self.fee)
+            amountRemaining -= stepAmountIn + feeAmount
+            amountOut += stepAmountOut
+            if sqrtPriceX96 == sqrtPriceNextX96:
+                # Crossing an initialized tick changes the active liquidity
+                if initialized:
+                    liquidity += -self.liquidity_net[tickNext] if zeroForOne else self.liquidity_net[tickNext]
+                tick = tickNext - 1 if zeroForOne else tickNext
+            elif sqrtPriceX96 != sqrtPriceStartX96:
+                tick = getTickAtSqrtRatio(sqrtPriceX96)
+        self.sqrt_price_x96, self.tick, self.liquidity = sqrtPriceX96, tick, liquidity
+        return amountOut
+
+def read_tick_bitmap(w3, pool_address, pool, block_identifier='latest', amounts_in=None, session=None):
+    # Read the words of the tick bitmap outward from the word of the current tick into the pool, the distance is doubled every round
+    # until the pool covers swaps of amounts_in = [amount of token0, amount of token1]. Without amounts_in the complete tick bitmap
+    # is read at once. Returns None, or an error code if a call failed.
+    complete_word_range = get_complete_word_range(pool.tick_spacing)
+    current_word = (pool.tick // pool.tick_spacing) >> 8
+    while True:
+        lower, upper = pool.word_range
+        if lower > upper:
+            # Nothing was read yet
+            distance = 0 if amounts_in != None else complete_word_range[1] - complete_word_range[0]
+        else:
+            distance = max(1, 2 * max(current_word - lower, upper - current_word))
+        new_lower = lower if lower <= upper and pool.covers(0, None if amounts_in == None else amounts_in[0]) else max(complete_word_range[0], min(lower, current_word - distance))
+        new_upper = upper if lower <= upper and pool.covers(1, None if amounts_in == None else amounts_in[1]) else min(complete_word_range[1], max(upper, current_word + distance))
+        if lower <= upper and new_lower == lower and new_upper == upper:
+            return None
+        words = list(range(new_lower, lower)) + list(range(upper+1, new_upper+1))
+
+        results = batch_call(w3, [(pool_address, encode_call("tickBitmap(int16)", [word])) for word in words], block_identifier, session)
+        ticks = list()
+        for word, result in zip(words, results):
+            if result == "0x":
+                return -2
+            bitmap = int(result, 16)
+            while bitmap != 0:
+                bit = (bitmap & -bitmap).bit_length() - 1
+                ticks.append(((word << 8) + bit) * pool.tick_spacing)
+                bitmap ^= 1 << bit
+
+        liquidity_net = dict()
+        results = batch_call(w3, [(pool_address, encode_call("ticks(int24)", [tick])) for tick in ticks], block_identifier, session)
+        for tick, result in zip(ticks, results):
+            if result == "0x":
+                return -3
+            liquidity_net[tick] = toSigned256(int(result.replace("0x", "")[64:128], 16))
+        pool.add_words([new_lower, new_upper], liquidity_net)
+
+def get_data_uniswap_v3(w3, pool_address, block_identifier='latest', amounts_in=None, session=None):
+    # Snapshot of a pool at a block in the JSON representation of UniswapV3Pool.snapshot: price, tick, active liquidity, fee, tick
+    # spacing, the tokens with their decimals and the net liquidity of the initialized ticks in the words of the tick bitmap that
+    # swaps of amounts_in need (see read_tick_bitmap). Every step is a single batch of calls.
+    if session == None:
+        session = requests.Session()
+    selectors = ["slot0()", "liquidity()", "fee()", "tickSpacing()", "token0()", "token1()"]
+    results = batch_call(w3, [(pool_address, encode_call(selector)) for selector in selectors], block_identifier, session)
+    if "0x" in results:
+        return -1
+    slot0, liquidity, fee, tick_spacing, token0, token1 = [result.replace("0x", "") for result in results]
+    tick_spacing = toSigned256(int(tick_spacing, 16))
+    tick = toSigned256(int(slot0[64:128], 16))
+    tokens = [Web3.toChecksumAddress("0x"+token0[24:64]), Web3.toChecksumAddress("0x"+token1[24:64])]
+
+    decimals = list()
+    for result in batch_call(w3, [(token, encode_call("decimals()")) for token in tokens], block_identifier, session):
+        decimals.append(int(result, 16) if result != "0x" else 18)
+
+    current_word = (tick // tick_spacing) >> 8
+    pool = UniswapV3Pool({
+        "sqrt_price_x96": int(slot0[0:64], 16),
+        "tick": tick,
+        "liquidity": int(liquidity, 16),
+        "fee": int(fee, 16),
+        "tick_spacing": tick_spacing,
+        "liquidity_net": dict(),
+        "tokens": tokens,
+        "decimals": decimals,
+        # No word is read yet
+        "word_range": [current_word + 1, current_word]
+    })
+    error = read_tick_bitmap(w3, pool_address, pool, block_identifier, amounts_in, session)
+    if error != None:
+        return error
+    return pool.snapshot()
+
+def get_data_uniswap_v3_cached(w3, mongo_connection, network, pool_address, block_number, amounts_in=None):
+    # Same result as get_data_uniswap_v3, but cached per (pool, block). A cached snapshot that does not cover amounts_in is read further
+    # outward and replaced, so that simulating the same pool state again costs no RPC call.
+    collection = mongo_connection[network]["uniswap_v3_snapshots"]
+    snapshot = collection.find_one({"pool": pool_address, "block_number": block_number}, {"_id": 0, "pool": 0, "block_number": 0})
+    if snapshot != None:
+        pool = UniswapV3Pool(snapshot)
+        if pool.covers(0, None if amounts_in == None else amounts_in[0]) and pool.covers(1, None if amounts_in == None else amounts_in[1]):
+            return snapshot
+        error = read_tick_bitmap(w3, pool_address, pool, block_number, amounts_in)
+        if error != None:
+            return error
+        snapshot = pool.snapshot()
+    else:
+        snapshot = get_data_uniswap_v3(w3, pool_address, block_number, amounts_in)
+        if not isinstance(snapshot, dict):
+            return snapshot
+    try:
+        collection.replace_one({"pool": pool_address, "block_number": block_number}, dict(snapshot, pool=pool_address, block_number=block_number), upsert=True)
+    except pymongo.errors.DuplicateKeyError:
+        pass
+    # Indexing...
+    if 'pool_1_block_number_1' not in collection.index_information():
+        collection.create_index([('pool', pymongo.ASCENDING), ('block_number', pymongo.ASCENDING)], unique=True)
+    return snapshot
+
+def get_amount_out_minimum(data, tokens, fee, tokenIndexFrom):
+    # Minimum output of a swap on a pool, decoded from a router call anywhere in the calldata (e.g., wrapped in a multicall or in a
+    # cross-domain message). Returns None if the calldata contains no exact input swap of tokens[tokenIndexFrom] on the pool.
+    data = bytes.fromhex(data.replace("0x", "")) if isinstance(data, str) else bytes(data)
+    token_in, token_out = bytes.fromhex(tokens[tokenIndexFrom].replace("0x", "")), bytes.fromhex(tokens[1-tokenIndexFrom].replace("0x", ""))
+    for selector in EXACT_INPUT_SINGLE:
+        words, index = EXACT_INPUT_SINGLE[selector]
+        position = data.find(bytes.fromhex(selector))
+        while position != -1:
+            args = data[position+4:position+4+words*32]
+            if len(args) == words*32 and args[12:32] == token_in and args[44:64] == token_out and int.from_bytes(args[64:96], 'big') == fee:
+                return int.from_bytes(args[index*32:(index+1)*32], 'big')
+            position = data.find(bytes.fromhex(selector), position+1)
+    for selector in EXACT_INPUT:
+        position = data.find(bytes.fromhex(selector))
+        while position != -1:
+            try:
+                params = eth_abi.decode([EXACT_INPUT[selector]], data[position+4:])[0]
+                path = params[0]
+                if len(path) == 43 and path[0:20] == token_in and int.from_bytes(path[20:23], 'big') == fee and path[23:43] == token_out:
+                    return params[-1]
+            except:
+                pass
+            position = data.find(bytes.fromhex(selector), position+1)
+    return None
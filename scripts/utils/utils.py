@@ -5,8 +5,10 @@ import re
 import os
 import time
 import json
+import decimal
 import eth_abi
 import requests
+import threading
 import traceback
 
 from web3 import Web3
@@ -14,6 +16,15 @@ from web3 import Web3
 OP_WETH = "0x4200000000000000000000000000000000000006"
 OP_VELODROME_V1 = "0x3c8B650257cFb5f272f799F5e2b4e65093a11a05"
 
+# Chainlink oracle updates are indexed in chunks of this many blocks
+ORACLE_UPDATES_BLOCK_RANGE = 1000
+
+# Number of eth_calls that are sent in a single JSON-RPC batch request by batch_call
+BATCH_CALL_SIZE = 100
+
+# Multicall3 has the same address on Ethereum, Arbitrum and Optimism
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
 class colors:
     INFO = '\033[94m'
     OK = '\033[92m'
@@ -96,6 +107,113 @@ def get_events(w3, client_version, params, provider, network="ethereum", session
         print(colors.FAIL+"Error: Client/Network is not supported! Supported clients are Geth and Erigon! Supported networks are Ethereum, Optimism, Arbitrum, and zkSync! Client version: "+client_version+colors.END)
         return None
 
+def get_events_window(w3, client_version, window, topic, from_block, to_block, provider, network="ethereum"):
+    # Keep the logs of a topic for a sliding block window and only request the blocks that were not fetched before
+    if not topic in window or from_block < window[topic]["from_block"] or from_block > window[topic]["to_block"]:
+        window[topic] = {"from_block": from_block, "to_block": from_block-1, "events_per_block": dict()}
+    topic_window = window[topic]
+    if to_block > topic_window["to_block"]:
+        events = get_events(w3, client_version, {"fromBlock": topic_window["to_block"]+1, "toBlock": to_block, "topics": [topic]}, provider, network)
+        if events == None:
+            raise Exception("Could not retrieve events for topic "+topic+" from block "+str(topic_window["to_block"]+1)+" to block "+str(to_block))
+        for block_number in range(topic_window["to_block"]+1, to_block+1):
+            topic_window["events_per_block"][block_number] = list()
+        for event in events:
+            topic_window["events_per_block"][event["blockNumber"]].append(event)
+        topic_window["to_block"] = to_block
+    for block_number in range(topic_window["from_block"], from_block):
+        del topic_window["events_per_block"][block_number]
+    topic_window["from_block"] = from_block
+    return [event for block_number in range(from_block, min(to_block, topic_window["to_block"])+1) for event in topic_window["events_per_block"][block_number]]
+
+def get_transaction_receipts(w3, transaction_hashes, session=None):
+    # Fetch the receipts of several transactions with a single JSON-RPC batch request
+    receipts = dict()
+    if len(transaction_hashes) == 0:
+        return receipts
+    if session == None:
+        session = requests.Session()
+    try:
+        res = session.post(w3.provider.endpoint_uri, json=[{
+            "jsonrpc": "2.0",
+            "method": "eth_getTransactionReceipt",
+            "params": [transaction_hash],
+            "id": i
+        } for i, transaction_hash in enumerate(transaction_hashes)])
+        if res.status_code == 200 and isinstance(res.json(), list):
+            for data in res.json():
+                if "result" in data and data["result"] != None:
+                    receipt = data["result"]
+                    for key in ["blockNumber", "transactionIndex", "gasUsed", "cumulativeGasUsed", "effectiveGasPrice", "status"]:
+                        if key in receipt and receipt[key] != None:
+                            receipt[key] = int(receipt[key], 16)
+                    receipts[transaction_hashes[data["id"]]] = receipt
+    except Exception as e:
+        print(colors.FAIL+"Error: Could not retrieve receipts in batch: "+str(e)+colors.END)
+    # Fall back to single requests for everything the batch did not return (e.g. batching not supported by the provider)
+    for transaction_hash in transaction_hashes:
+        if not transaction_hash in receipts:
+            receipts[transaction_hash] = w3.eth.get_transaction_receipt(transaction_hash)
+    return receipts
+
+def get_flashbots_transactions(mongo_connection, block_range_start, block_range_end):
+    # Load the flattened Flashbots transactions of a whole block range with a single query (and a second one for unflattened blocks)
+    flashbots_transactions = dict()
+    for block_number in range(block_range_start, block_range_end+1):
+        flashbots_transactions[block_number] = dict()
+    cursor = mongo_connection["flashbots"]["transactions"].find(
+        {"block_number": {"$gte": block_range_start, "$lte": block_range_end}},
+        {"_id": 0, "transaction_hash": 1, "block_number": 1, "bundle_index": 1, "coinbase_transfer": 1}
+    )
+    for flashbots_tx in cursor:
+        flashbots_transactions[flashbots_tx["block_number"]][flashbots_tx["transaction_hash"]] = {
+            "bundle_index": flashbots_tx["bundle_index"],
+            "coinbase_transfer": decimal.Decimal(int(flashbots_tx["coinbase_transfer"])) / 10**18
+        }
+    # Blocks might not be flattened (yet), e.g. databases downloaded before flashbots.transactions existed or an interrupted
+    # backfill (see download_flashbots_data.py --backfill), hence blocks without any row are looked up in flashbots.blocks
+    missing_blocks = [block_number for block_number in flashbots_transactions if len(flashbots_transactions[block_number]) == 0]
+    if len(missing_blocks) > 0:
+        cursor = mongo_connection["flashbots"]["blocks"].find(
+            {"block_number": {"$in": missing_blocks}},
+            {"_id": 0, "block_number": 1, "transactions.transaction_hash": 1, "transactions.bundle_index": 1, "transactions.coinbase_transfer": 1}
+        )
+        for flashbots_block in cursor:
+            for flashbots_tx in flashbots_block["transactions"]:
+                flashbots_transactions[flashbots_block["block_number"]][flashbots_tx["transaction_hash"]] = {
+                    "bundle_index": flashbots_tx["bundle_index"],
+                    "coinbase_transfer": decimal.Decimal(int(flashbots_tx["coinbase_transfer"])) / 10**18
+                }
+    return flashbots_transactions
+
+def get_oracle_updates(mongo_connection, network, block_range_start, block_range_end):
+    # Read the indexed Chainlink AnswerUpdated events of a block range, returns None if the range has not been indexed yet
+    chunks = list(range(block_range_start // ORACLE_UPDATES_BLOCK_RANGE, block_range_end // ORACLE_UPDATES_BLOCK_RANGE + 1))
+    if mongo_connection[network]["oracle_updates_status"].count_documents({"chunk": {"$in": chunks}}) != len(chunks):
+        return None
+    return list(mongo_connection[network]["oracle_updates"].find(
+        {"block_number": {"$gte": block_range_start, "$lte": block_range_end}},
+        {"_id": 0}
+    ).sort([("block_number", 1), ("log_index", 1)]))
+
+def imap_cursor(pool, function, cursor, batch_size, max_pending_batches):
+    # Stream a (projected) cursor to a pool in batches, at most max_pending_batches are queued so that memory stays constant
+    semaphore = threading.BoundedSemaphore(max_pending_batches)
+    def get_batches():
+        batch = list()
+        for document in cursor:
+            batch.append(document)
+            if len(batch) == batch_size:
+                semaphore.acquire()
+                yield batch
+                batch = list()
+        if len(batch) > 0:
+            semaphore.acquire()
+            yield batch
+    for result in pool.imap_unordered(function, get_batches()):
+        semaphore.release()
+        yield result
+
 def get_coin_list(platform, update_prices=False):
     path = os.path.dirname(__file__)
     if update_prices or not os.path.exists(path+"/coin_list_"+platform+".json"):
@@ -210,6 +328,59 @@ def encode_with_signature(function_signature, args):
     encoded_args = eth_abi.encode(arg_types, args)
     return function_selector + encoded_args
 
+def encode_call(function_signature, args=[]):
+    data = Web3.keccak(text=function_signature)[:4]
+    if len(args) > 0:
+        data += eth_abi.encode(function_signature[function_signature.find("(")+1:function_signature.rfind(")")].split(","), args)
+    return "0x"+bytes(data).hex()
+
+def multicall(w3, calls, block_identifier='latest'):
+    # Execute several calls given as (to, data) with a single Multicall3 aggregate3 call, hence all results are from the same state.
+    # Results are returned as hex strings in the same order, failed calls return "0x".
+    try:
+        data = encode_call("aggregate3((address,bool,bytes)[])", [[(to, True, bytes.fromhex(data.replace("0x", ""))) for to, data in calls]])
+        result = w3.eth.call({"to": MULTICALL3_ADDRESS, "data": data}, block_identifier)
+        return ["0x"+bytes(return_data).hex() if success else "0x" for success, return_data in eth_abi.decode(["(bool,bytes)[]"], bytes(result))[0]]
+    except:
+        # Multicall3 was not deployed yet at this block, fall back to single calls
+        results = list()
+        for to, data in calls:
+            try:
+                results.append("0x"+bytes(w3.eth.call({"to": to, "data": data}, block_identifier)).hex())
+            except:
+                results.append("0x")
+        return results
+
+def batch_call(w3, calls, block_identifier='latest', session=None):
+    # Execute several eth_calls given as (to, data) or (to, data, block_identifier) with JSON-RPC batch requests of BATCH_CALL_SIZE calls,
+    # unlike multicall the calls can be at different blocks. Results are returned as hex strings in the same order, failed calls return "0x".
+    results = [None] * len(calls)
+    blocks = [call[2] if len(call) > 2 else block_identifier for call in calls]
+    if session == None:
+        session = requests.Session()
+    for i in range(0, len(calls), BATCH_CALL_SIZE):
+        try:
+            res = session.post(w3.provider.endpoint_uri, json=[{
+                "jsonrpc": "2.0",
+                "method": "eth_call",
+                "params": [{"to": calls[j][0], "data": calls[j][1]}, hex(blocks[j]) if isinstance(blocks[j], int) else blocks[j]],
+                "id": j
+            } for j in range(i, min(i+BATCH_CALL_SIZE, len(calls)))])
+            if res.status_code == 200 and isinstance(res.json(), list):
+                for data in res.json():
+                    if "result" in data and data["result"] != None:
+                        results[data["id"]] = data["result"]
+        except Exception as e:
+            print(colors.FAIL+"Error: Could not execute calls in batch: "+str(e)+colors.END)
+    # Fall back to single requests for everything the batches did not return (e.g. batching not supported by the provider)
+    for i in range(len(calls)):
+        if results[i] == None:
+            try:
+                results[i] = "0x"+bytes(w3.eth.call({"to": calls[i][0], "data": calls[i][1]}, blocks[i])).hex()
+            except:
+                results[i] = "0x"
+    return results
+
 def toSigned256(n):
     n = n & 0xffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff
     return (n ^ 0x8000000000000000000000000000000000000000000000000000000000000000) - 0x8000000000000000000000000000000000000000000000000000000000000000